@@ -0,0 +1,227 @@
+"""
+Vectorized N-Round AES
+NumPy versions of the aes_operations.py transformations that work on whole
+arrays of states at once.
+
+A batch of states is an (N, 16) uint8 array in the byte order of
+state_to_hex(): byte 4 * col + row holds state[row][col].
+
+Requires NumPy.
+"""
+
+import numpy as np
+
+from aes_engine import round_constants
+from aes_tables import MIX_COLUMNS_MATRIX
+from derived_tables import get_store
+
+
+# ShiftRows as a gather: new[4c + r] = old[4((c + r) % 4) + r]
+SHIFT_ROWS_INDEX = np.array([4 * ((c + r) % 4) + r for c in range(4) for r in range(4)])
+INV_SHIFT_ROWS_INDEX = np.argsort(SHIFT_ROWS_INDEX)
+
+_arrays = None
+
+
+def gf_mul_table(coefficient, exp_table, log_table):
+    """
+    Return the 256-entry table of coefficient * x in GF(2^8).
+
+    Args:
+        coefficient (int): Constant multiplier
+        exp_table (numpy.ndarray): GF(2^8) exponent table
+        log_table (numpy.ndarray): GF(2^8) logarithm table
+
+    Returns:
+        numpy.ndarray: uint8 products
+    """
+    x = np.arange(256)
+    if coefficient == 0:
+        return np.zeros(256, dtype=np.uint8)
+    products = exp_table[(log_table[x].astype(np.intp) + int(log_table[coefficient])) % 255]
+    products = products.astype(np.uint8)
+    products[0] = 0
+    return products
+
+
+def load_arrays():
+    """
+    Return the AES lookup tables as NumPy arrays, loading them on first use.
+
+    Returns:
+        dict: 'sbox', 'inv_sbox', 'mix' (4x4 grid of product tables for
+            MixColumns) and 'inv_mix' (the same for InvMixColumns)
+    """
+    global _arrays
+    if _arrays is None:
+        store = get_store()
+        exp_table = store.array('gf_exp')
+        log_table = store.array('gf_log')
+        # Recover the InvMixColumns coefficients from entry 1 of each aes_imc table
+        # (the products with 1)
+        imc = store.array('aes_imc')
+        inv_matrix = [[int(imc[j][1] >> np.uint32(24 - 8 * r)) & 0xFF for j in range(4)]
+                      for r in range(4)]
+        _arrays = {
+            'sbox': store.array('aes_sbox'),
+            'inv_sbox': store.array('aes_inv_sbox'),
+            'mix': [[gf_mul_table(c, exp_table, log_table) for c in row]
+                    for row in MIX_COLUMNS_MATRIX],
+            'inv_mix': [[gf_mul_table(c, exp_table, log_table) for c in row]
+                        for row in inv_matrix],
+        }
+    return _arrays
+
+
+def reset_arrays():
+    """Drop the loaded arrays so the next load_arrays() reads the current table store."""
+    global _arrays
+    _arrays = None
+
+
+def sub_bytes(states):
+    """Apply SubBytes to an (N, 16) batch."""
+    return load_arrays()['sbox'][states]
+
+
+def inv_sub_bytes(states):
+    """Apply InvSubBytes to an (N, 16) batch."""
+    return load_arrays()['inv_sbox'][states]
+
+
+def shift_rows(states):
+    """Apply ShiftRows to an (N, 16) batch."""
+    return states[:, SHIFT_ROWS_INDEX]
+
+
+def inv_shift_rows(states):
+    """Apply InvShiftRows to an (N, 16) batch."""
+    return states[:, INV_SHIFT_ROWS_INDEX]
+
+
+def _mix(states, tables):
+    cols = states.reshape(-1, 4, 4)
+    out = np.empty_like(cols)
+    for r in range(4):
+        acc = tables[r][0][cols[:, :, 0]]
+        for i in range(1, 4):
+            acc = acc ^ tables[r][i][cols[:, :, i]]
+        out[:, :, r] = acc
+    return out.reshape(-1, 16)
+
+
+def mix_columns(states):
+    """Apply MixColumns to an (N, 16) batch."""
+    return _mix(states, load_arrays()['mix'])
+
+
+def inv_mix_columns(states):
+    """Apply InvMixColumns to an (N, 16) batch."""
+    return _mix(states, load_arrays()['inv_mix'])
+
+
+def add_round_key(states, round_key):
+    """XOR a (16,) round key, or (N, 16) per-state round keys, into a batch."""
+    return states ^ round_key
+
+
+def round_key_bytes(round_keys):
+    """
+    Convert aes_engine.expand_key() output to an array of round key bytes.
+
+    Args:
+        round_keys (list): Round keys as lists of four column words
+
+    Returns:
+        numpy.ndarray: (rounds + 1, 16) uint8 array
+    """
+    words = np.array(round_keys, dtype='>u4')
+    return words.view(np.uint8).reshape(len(round_keys), 16)
+
+
+def expand_keys(keys, rounds=10):
+    """
+    Run the AES-128 key schedule for many keys at once.
+
+    Args:
+        keys (numpy.ndarray): (N, 16) uint8 cipher keys
+        rounds (int): Number of rounds
+
+    Returns:
+        numpy.ndarray: (rounds + 1, N, 16) uint8 per-key round keys, as
+            accepted by aes_encrypt_array()
+    """
+    keys = np.asarray(keys, dtype=np.uint8).reshape(-1, 16)
+    sbox = load_arrays()['sbox']
+    # Key schedule words as (N, 4) byte arrays
+    words = [keys[:, 4 * i:4 * i + 4] for i in range(4)]
+    for rcon in round_constants(rounds):
+        # RotWord, SubWord, Rcon
+        temp = sbox[words[-1][:, [1, 2, 3, 0]]]
+        temp[:, 0] ^= rcon
+        for _ in range(4):
+            temp = temp ^ words[-4]
+            words.append(temp)
+    out = np.stack(words).reshape(rounds + 1, 4, len(keys), 4)
+    return np.ascontiguousarray(out.transpose(0, 2, 1, 3)).reshape(rounds + 1, len(keys), 16)
+
+
+def ints_to_states(blocks):
+    """Convert an iterable of 128-bit ints to an (N, 16) uint8 batch."""
+    data = b''.join(block.to_bytes(16, 'big') for block in blocks)
+    return np.frombuffer(data, dtype=np.uint8).reshape(-1, 16).copy()
+
+
+def states_to_ints(states):
+    """Convert an (N, 16) uint8 batch to a list of 128-bit ints."""
+    raw = np.ascontiguousarray(states, dtype=np.uint8).tobytes()
+    return [int.from_bytes(raw[i:i + 16], 'big') for i in range(0, len(raw), 16)]
+
+
+def aes_encrypt_array(states, key_bytes):
+    """
+    Encrypt an (N, 16) batch with N-round AES.
+
+    Args:
+        states (numpy.ndarray): (N, 16) uint8 plaintexts
+        key_bytes (numpy.ndarray): (rounds + 1, 16) round keys from
+            round_key_bytes(), or (rounds + 1, N, 16) round keys from
+            expand_keys() giving each state its own key
+
+    Returns:
+        numpy.ndarray: (N, 16) uint8 ciphertexts
+    """
+    rounds = len(key_bytes) - 1
+    states = add_round_key(states, key_bytes[0])
+    for r in range(1, rounds + 1):
+        states = shift_rows(sub_bytes(states))
+        if r != rounds:
+            states = mix_columns(states)
+        states = add_round_key(states, key_bytes[r])
+    return states
+
+
+def aes_decrypt_array(states, key_bytes):
+    """
+    Decrypt an (N, 16) batch with N-round AES.
+
+    Args:
+        states (numpy.ndarray): (N, 16) uint8 ciphertexts
+        key_bytes (numpy.ndarray): Encryption round keys as for aes_encrypt_array(),
+            shared or one schedule per state from expand_keys()
+
+    Returns:
+        numpy.ndarray: (N, 16) uint8 plaintexts
+    """
+    rounds = len(key_bytes) - 1
+    for r in range(rounds, 0, -1):
+        states = add_round_key(states, key_bytes[r])
+        if r != rounds:
+            states = inv_mix_columns(states)
+        states = inv_sub_bytes(inv_shift_rows(states))
+    return add_round_key(states, key_bytes[0])
+
+
+def random_states(rng, count):
+    """Draw an (N, 16) batch of uniformly random states."""
+    return rng.integers(0, 256, size=(count, 16), dtype=np.uint8)
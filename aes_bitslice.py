@@ -0,0 +1,430 @@
+"""
+Bitsliced N-Round AES
+AES encryption of a batch of W blocks held as 128 bit-planes: plane
+(byte, bit) has bit j set when that bit of block j is set. A plane is
+either one W-bit Python int or an array of W / 64 uint64 lanes.
+
+- SubBytes is the depth-16 Boyar-Peralta Boolean circuit for the AES S-box
+  (34 AND, 90 XOR, 4 XNOR), evaluated once for all 16 bytes: every gate is
+  one operation on a (16,) array of planes.
+- ShiftRows only re-indexes planes.
+- MixColumns is xtime() and XORs of planes: out_r = a_r ^ t ^ xtime(a_r ^ a_r+1)
+  with t the XOR of the column.
+- AddRoundKey XORs all-zero or all-one planes, or the planes of per-block
+  round keys.
+
+The cost of a round is a fixed number of plane operations whatever W is, so
+it grows with the circuit size rather than with 16 table lookups per block.
+Only the standard S-box has a circuit, so the tables of aes_tables.py are
+assumed; there is no decryption.
+
+A batch of states is an (N, 16) uint8 array in the byte order of
+aes_batch.py; to_planes() and from_planes() transpose it to and from planes.
+
+Usage:
+
+    ciphertexts = aes_encrypt_array(states, key_bytes, lanes='int')
+
+    python aes_bitslice.py
+
+Requires NumPy.
+"""
+
+import time
+
+import numpy as np
+
+import aes_batch
+import aes_engine
+from aes_tables import AES_POLYNOMIAL
+
+
+LANES = ('numpy', 'int')
+
+# xtime(): state bits (most significant first) that take the XOR of the carried-out bit
+REDUCTION_BITS = [k for k in range(8) if (AES_POLYNOMIAL >> (7 - k)) & 1]
+
+# All-one plane of each lane type
+_ONES = {'numpy': np.uint64(0xFFFFFFFFFFFFFFFF), 'int': -1}
+
+
+def _lanes(planes):
+    return 'int' if planes.dtype == object else 'numpy'
+
+
+def _transpose64(rows):
+    """
+    Transpose 64x64 bit matrices by recursive block swaps.
+
+    Args:
+        rows (numpy.ndarray): (64, M) uint64; rows[r, m] is row r of matrix
+            m, column 0 in the most significant bit
+
+    Returns:
+        numpy.ndarray: (64, M) uint64 transposed matrices
+    """
+    rows = rows.copy()
+    width = 32
+    mask = np.uint64(0x00000000FFFFFFFF)
+    while width:
+        pairs = rows.reshape(64 // (2 * width), 2, width, -1)
+        upper, lower = pairs[:, 0], pairs[:, 1]
+        swap = (upper ^ (lower >> np.uint64(width))) & mask
+        upper ^= swap
+        lower ^= swap << np.uint64(width)
+        width >>= 1
+        mask ^= mask << np.uint64(width)
+    return rows
+
+
+def to_planes(states, lanes='numpy'):
+    """
+    Transpose a batch of states to bit-planes.
+
+    Args:
+        states (numpy.ndarray): (N, 16) uint8 states
+        lanes (str): 'numpy' for uint64 lanes, 'int' for one Python int per plane
+
+    Returns:
+        numpy.ndarray: (16, 8, ceil(N / 64)) uint64 planes, or a (16, 8)
+            object array of N-bit ints; bit 0 is the most significant bit
+            of a byte
+    """
+    if lanes not in LANES:
+        raise ValueError(f"Unknown lanes {lanes!r}")
+    count = len(states)
+    groups = -(-count // 64)
+    padded = np.zeros((64 * groups, 16), dtype=np.uint8)
+    padded[:count] = states
+    words = padded.view('>u8').astype(np.uint64).reshape(groups, 64, 2)
+    # Row 63 - j of each matrix is block j, so block j lands in bit j of a plane
+    rows = np.ascontiguousarray(words[:, ::-1].transpose(1, 0, 2)).reshape(64, -1)
+    planes = _transpose64(rows).reshape(64, groups, 2).transpose(2, 0, 1).reshape(128, groups)
+    if lanes == 'numpy':
+        return np.ascontiguousarray(planes).reshape(16, 8, groups)
+    out = np.empty(128, dtype=object)
+    for i, plane in enumerate(planes):
+        out[i] = int.from_bytes(plane.astype('<u8').tobytes(), 'little')
+    return out.reshape(16, 8)
+
+
+def from_planes(planes, count):
+    """
+    Transpose bit-planes back to a batch of states.
+
+    Args:
+        planes (numpy.ndarray): Planes from to_planes()
+        count (int): Number of blocks N
+
+    Returns:
+        numpy.ndarray: (N, 16) uint8 states
+    """
+    groups = -(-count // 64)
+    if _lanes(planes) == 'numpy':
+        planes = planes.reshape(128, groups)
+    else:
+        mask = (1 << (64 * groups)) - 1
+        planes = np.frombuffer(b''.join((int(p) & mask).to_bytes(8 * groups, 'little')
+                                        for p in planes.reshape(128)),
+                               dtype='<u8').astype(np.uint64).reshape(128, groups)
+    rows = np.ascontiguousarray(planes.reshape(2, 64, groups).transpose(1, 2, 0)).reshape(64, -1)
+    words = _transpose64(rows).reshape(64, groups, 2).transpose(1, 0, 2)[:, ::-1]
+    return words.reshape(-1, 2).astype('>u8').view(np.uint8).reshape(-1, 16)[:count]
+
+
+def key_planes(key_bytes, lanes='numpy'):
+    """
+    Turn round keys into planes that can be XORed into a state.
+
+    Args:
+        key_bytes (numpy.ndarray): (rounds + 1, 16) round keys from
+            aes_batch.round_key_bytes(), or (rounds + 1, N, 16) per-block round keys
+        lanes (str): 'numpy' or 'int'
+
+    Returns:
+        list: One planes array per round key, broadcastable against the state
+    """
+    key_bytes = np.asarray(key_bytes, dtype=np.uint8)
+    if key_bytes.ndim == 3:
+        return [to_planes(k, lanes) for k in key_bytes]
+    out = []
+    for k in key_bytes:
+        bits = np.unpackbits(k).reshape(16, 8).astype(bool)
+        if lanes == 'numpy':
+            out.append(np.where(bits, _ONES['numpy'], np.uint64(0))[:, :, None])
+        else:
+            planes = np.zeros((16, 8), dtype=object)
+            planes[bits] = -1
+            out.append(planes)
+    return out
+
+
+def sbox_circuit(u, one):
+    """
+    Evaluate the Boyar-Peralta AES S-box circuit.
+
+    Args:
+        u (list): Eight input planes (or arrays of planes), most significant bit first
+        one: All-one plane, for the XNOR gates
+
+    Returns:
+        list: Eight output planes, most significant bit first
+    """
+    u0, u1, u2, u3, u4, u5, u6, u7 = u
+    # Top linear layer
+    t1 = u0 ^ u3
+    t2 = u0 ^ u5
+    t3 = u0 ^ u6
+    t4 = u3 ^ u5
+    t5 = u4 ^ u6
+    t6 = t1 ^ t5
+    t7 = u1 ^ u2
+    t8 = u7 ^ t6
+    t9 = u7 ^ t7
+    t10 = t6 ^ t7
+    t11 = u1 ^ u5
+    t12 = u2 ^ u5
+    t13 = t3 ^ t4
+    t14 = t6 ^ t11
+    t15 = t5 ^ t11
+    t16 = t5 ^ t12
+    t17 = t9 ^ t16
+    t18 = u3 ^ u7
+    t19 = t7 ^ t18
+    t20 = t1 ^ t19
+    t21 = u6 ^ u7
+    t22 = t7 ^ t21
+    t23 = t2 ^ t22
+    t24 = t2 ^ t10
+    t25 = t20 ^ t17
+    t26 = t3 ^ t16
+    t27 = t1 ^ t12
+
+    # Nonlinear middle: inversion in GF(2^4)^2
+    m1 = t13 & t6
+    m2 = t23 & t8
+    m3 = t14 ^ m1
+    m4 = t19 & u7
+    m5 = m4 ^ m1
+    m6 = t3 & t16
+    m7 = t22 & t9
+    m8 = t26 ^ m6
+    m9 = t20 & t17
+    m10 = m9 ^ m6
+    m11 = t1 & t15
+    m12 = t4 & t27
+    m13 = m12 ^ m11
+    m14 = t2 & t10
+    m15 = m14 ^ m11
+    m16 = m3 ^ m2
+    m17 = m5 ^ t24
+    m18 = m8 ^ m7
+    m19 = m10 ^ m15
+    m20 = m16 ^ m13
+    m21 = m17 ^ m15
+    m22 = m18 ^ m13
+    m23 = m19 ^ t25
+    m24 = m22 ^ m23
+    m25 = m22 & m20
+    m26 = m21 ^ m25
+    m27 = m20 ^ m21
+    m28 = m23 ^ m25
+    m29 = m28 & m27
+    m30 = m26 & m24
+    m31 = m20 & m23
+    m32 = m27 & m31
+    m33 = m27 ^ m25
+    m34 = m21 & m22
+    m35 = m24 & m34
+    m36 = m24 ^ m25
+    m37 = m21 ^ m29
+    m38 = m32 ^ m33
+    m39 = m23 ^ m30
+    m40 = m35 ^ m36
+    m41 = m38 ^ m40
+    m42 = m37 ^ m39
+    m43 = m37 ^ m38
+    m44 = m39 ^ m40
+    m45 = m42 ^ m41
+    m46 = m44 & t6
+    m47 = m40 & t8
+    m48 = m39 & u7
+    m49 = m43 & t16
+    m50 = m38 & t9
+    m51 = m37 & t17
+    m52 = m42 & t15
+    m53 = m45 & t27
+    m54 = m41 & t10
+    m55 = m44 & t13
+    m56 = m40 & t23
+    m57 = m39 & t19
+    m58 = m43 & t3
+    m59 = m38 & t22
+    m60 = m37 & t20
+    m61 = m42 & t1
+    m62 = m45 & t4
+    m63 = m41 & t2
+
+    # Bottom linear layer, with the affine constant 0x63 as XNORs
+    l0 = m61 ^ m62
+    l1 = m50 ^ m56
+    l2 = m46 ^ m48
+    l3 = m47 ^ m55
+    l4 = m54 ^ m58
+    l5 = m49 ^ m61
+    l6 = m62 ^ l5
+    l7 = m46 ^ l3
+    l8 = m51 ^ m59
+    l9 = m52 ^ m53
+    l10 = m53 ^ l4
+    l11 = m60 ^ l2
+    l12 = m48 ^ m51
+    l13 = m50 ^ l0
+    l14 = m52 ^ m61
+    l15 = m55 ^ l1
+    l16 = m56 ^ l0
+    l17 = m57 ^ l1
+    l18 = m58 ^ l8
+    l19 = m63 ^ l4
+    l20 = l0 ^ l1
+    l21 = l1 ^ l7
+    l22 = l3 ^ l12
+    l23 = l18 ^ l2
+    l24 = l15 ^ l9
+    l25 = l6 ^ l10
+    l26 = l7 ^ l9
+    l27 = l8 ^ l10
+    l28 = l11 ^ l14
+    l29 = l11 ^ l17
+    return [l6 ^ l24,
+            l16 ^ l26 ^ one,
+            l19 ^ l28 ^ one,
+            l6 ^ l21,
+            l20 ^ l22,
+            l25 ^ l29,
+            l13 ^ l27 ^ one,
+            l6 ^ l23 ^ one]
+
+
+def sub_bytes(planes):
+    """Apply SubBytes to all 16 bytes of a bitsliced state."""
+    out = sbox_circuit([planes[:, k] for k in range(8)], _ONES[_lanes(planes)])
+    return np.stack(out, axis=1)
+
+
+def shift_rows(planes):
+    """Apply ShiftRows (a re-indexing of byte planes)."""
+    return planes[aes_batch.SHIFT_ROWS_INDEX]
+
+
+def mix_columns(planes):
+    """Apply MixColumns with XORs of bit-planes."""
+    # (column, row, bit, lanes)
+    a = planes.reshape((4, 4) + planes.shape[1:])
+    x = a ^ np.roll(a, -1, axis=1)
+    carry = x[:, :, :1]
+    doubled = np.concatenate((x[:, :, 1:], np.zeros_like(carry)), axis=2)
+    doubled[:, :, REDUCTION_BITS] ^= carry
+    column = a[:, 0] ^ a[:, 1] ^ a[:, 2] ^ a[:, 3]
+    return (a ^ column[:, None] ^ doubled).reshape(planes.shape)
+
+
+def aes_encrypt_planes(planes, round_key_planes):
+    """
+    Encrypt a bitsliced batch with N-round AES.
+
+    Args:
+        planes (numpy.ndarray): State planes from to_planes()
+        round_key_planes (list): (rounds + 1) planes arrays from key_planes()
+
+    Returns:
+        numpy.ndarray: Ciphertext planes
+    """
+    rounds = len(round_key_planes) - 1
+    planes = planes ^ round_key_planes[0]
+    for r in range(1, rounds + 1):
+        planes = shift_rows(sub_bytes(planes))
+        if r != rounds:
+            planes = mix_columns(planes)
+        planes = planes ^ round_key_planes[r]
+    return planes
+
+
+def aes_encrypt_array(states, key_bytes, lanes='numpy'):
+    """
+    Encrypt an (N, 16) batch with bitsliced N-round AES.
+
+    Args:
+        states (numpy.ndarray): (N, 16) uint8 plaintexts
+        key_bytes (numpy.ndarray): (rounds + 1, 16) round keys from
+            aes_batch.round_key_bytes(), or (rounds + 1, N, 16) per-state round keys
+        lanes (str): 'numpy' or 'int'
+
+    Returns:
+        numpy.ndarray: (N, 16) uint8 ciphertexts
+    """
+    planes = to_planes(states, lanes)
+    keys = key_planes(key_bytes, lanes)
+    return from_planes(aes_encrypt_planes(planes, keys), len(states))
+
+
+def main():
+    """Check the bitsliced engine against aes_batch and compare throughput."""
+    rng = np.random.default_rng(0)
+    key = int.from_bytes(rng.bytes(16), 'big')
+
+    print("\n" + "="*80)
+    print("BITSLICED AES")
+    print("="*80)
+
+    fips_key = 0x000102030405060708090A0B0C0D0E0F
+    fips_plain = aes_batch.ints_to_states([0x00112233445566778899AABBCCDDEEFF])
+    fips_keys = aes_batch.round_key_bytes(aes_engine.expand_key(fips_key, 10))
+    for lanes in LANES:
+        cipher = aes_batch.states_to_ints(aes_encrypt_array(fips_plain, fips_keys, lanes))[0]
+        print(f"FIPS-197 C.1 ({lanes} lanes): {cipher:032X} "
+              f"{'✓' if cipher == 0x69C4E0D86A7B0430D8CDB78070B4C55A else '✗'}")
+
+    states = aes_batch.random_states(rng, 1000)
+    ok = True
+    for rounds in (1, 2, 4, 10):
+        key_bytes = aes_batch.round_key_bytes(aes_engine.expand_key(key, rounds))
+        expected = aes_batch.aes_encrypt_array(states, key_bytes)
+        for lanes in LANES:
+            ok &= np.array_equal(aes_encrypt_array(states, key_bytes, lanes), expected)
+    per_block = aes_batch.expand_keys(aes_batch.random_states(rng, len(states)), 4)
+    expected = aes_batch.aes_encrypt_array(states, per_block)
+    for lanes in LANES:
+        ok &= np.array_equal(aes_encrypt_array(states, per_block, lanes), expected)
+    print(f"Matches aes_batch (1, 2, 4, 10 rounds, shared and per-block keys): "
+          f"{'✓' if ok else '✗'}")
+
+    print("\nBlocks per second, excluding transposition:")
+    print(f"\n{'Rounds':<8} {'Blocks':<10} {'aes_batch':<12} {'numpy lanes':<14} {'int lanes':<12}")
+    print("-" * 80)
+    for rounds in (1, 10):
+        key_bytes = aes_batch.round_key_bytes(aes_engine.expand_key(key, rounds))
+        for count in (1 << 12, 1 << 16, 1 << 18):
+            states = aes_batch.random_states(rng, count)
+            start = time.perf_counter()
+            aes_batch.aes_encrypt_array(states, key_bytes)
+            rates = [count / (time.perf_counter() - start)]
+            for lanes in LANES:
+                planes = to_planes(states, lanes)
+                keys = key_planes(key_bytes, lanes)
+                start = time.perf_counter()
+                aes_encrypt_planes(planes, keys)
+                rates.append(count / (time.perf_counter() - start))
+            print(f"{rounds:<8} {count:<10} {rates[0]:<12.0f} {rates[1]:<14.0f} {rates[2]:<12.0f}")
+
+    print()
+    for lanes in LANES:
+        start = time.perf_counter()
+        from_planes(to_planes(states, lanes), count)
+        print(f"Transposition round trip, {count} blocks, {lanes} lanes: "
+              f"{(time.perf_counter() - start) * 1000:.1f} ms")
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -11,24 +11,6 @@ from aes_operations import (
 )
 
 
-def compare_binary_strings(bin1, bin2):
-    """
-    Compare two binary strings and return difference information.
-    
-    Args:
-        bin1 (str): First binary string
-        bin2 (str): Second binary string
-    
-    Returns:
-        tuple: (number_of_differences, list_of_positions)
-    """
-    differences = []
-    for i, (b1, b2) in enumerate(zip(bin1, bin2)):
-        if b1 != b2:
-            differences.append(i + 1)  # 1-indexed position
-    return len(differences), differences
-
-
 def hex_to_binary(hex_str):
     """
     Convert hex string to binary string.
@@ -8,15 +8,7 @@ from aes_operations import (
     sub_bytes, shift_rows, mix_columns, add_round_key,
     format_state_matrix
 )
-
-
-def compare_binary_strings(bin1, bin2):
-    """Compare two binary strings and return difference information."""
-    differences = []
-    for i, (b1, b2) in enumerate(zip(bin1, bin2)):
-        if b1 != b2:
-            differences.append(i + 1)  # 1-indexed position
-    return len(differences), differences
+from hamming import compare_binary_strings
 
 
 def hex_to_binary(hex_str):
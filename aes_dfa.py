@@ -0,0 +1,269 @@
+"""
+Differential Fault Analysis of the Last AES Rounds
+Simulates single-byte faults injected before the last MixColumns of N-round
+AES (the Piret-Quisquater fault model) and recovers the last round key from
+(correct, faulty) ciphertext pairs.
+
+A fault f in row r of column c of the state entering the last MixColumns
+changes that column by (m0r f, m1r f, m2r f, m3r f), where m is the
+MixColumns matrix. The final round (SubBytes, ShiftRows, AddRoundKey) maps
+the column to four ciphertext bytes, so for the right four bytes of the last
+round key
+
+    InvSubBytes(C[j] ^ K[j]) ^ InvSubBytes(C'[j] ^ K[j]) = m_jr * f
+
+for every row j. Instead of testing all 2^32 key-column hypotheses, each
+pair is filtered per byte: the (4, 256) table of differences for every key
+byte guess is compared at once with the (4, 255) expected differences for
+every fault value, and only fault values matched in all four rows expand
+into candidate columns (about 2^10 per pair). Two pairs per column usually
+leave one candidate. The four columns are filtered in parallel and the
+cipher key is recovered by running the key schedule backwards.
+
+The fault simulator uses the aes_batch.py round functions, so large batches
+of faulty encryptions are one set of array operations.
+
+Usage:
+
+    python aes_dfa.py --rounds 10 --trials 20 --workers 4
+
+Requires NumPy.
+"""
+
+import argparse
+import time
+from multiprocessing import Pool
+
+import numpy as np
+
+import aes_batch
+import aes_engine
+
+
+# Ciphertext byte positions reached by each state column of the last MixColumns
+COLUMN_POSITIONS = [[4 * ((c - j) % 4) + j for j in range(4)] for c in range(4)]
+
+
+def encrypt_with_faults(states, key_bytes, positions, values):
+    """
+    Encrypt a batch, injecting one byte fault per state before the last MixColumns.
+
+    Args:
+        states (numpy.ndarray): (N, 16) uint8 plaintexts
+        key_bytes (numpy.ndarray): (rounds + 1, 16) round keys from
+            aes_batch.round_key_bytes(), with rounds >= 2
+        positions (numpy.ndarray): (N,) faulted state byte (4 * col + row)
+        values (numpy.ndarray): (N,) uint8 nonzero fault values (XORed in)
+
+    Returns:
+        numpy.ndarray: (N, 16) uint8 faulty ciphertexts
+    """
+    rounds = len(key_bytes) - 1
+    if rounds < 2:
+        raise ValueError("Fault model needs at least 2 rounds")
+    states = aes_batch.add_round_key(states, key_bytes[0])
+    for r in range(1, rounds + 1):
+        states = aes_batch.shift_rows(aes_batch.sub_bytes(states))
+        if r == rounds - 1:
+            states[np.arange(len(states)), positions] ^= values
+        if r != rounds:
+            states = aes_batch.mix_columns(states)
+        states = aes_batch.add_round_key(states, key_bytes[r])
+    return states
+
+
+def random_faults(rng, count):
+    """
+    Draw random fault positions and nonzero values.
+
+    Returns:
+        tuple: ((count,) positions, (count,) uint8 values)
+    """
+    positions = rng.integers(0, 16, size=count)
+    values = rng.integers(1, 256, size=count, dtype=np.uint8)
+    return positions, values
+
+
+def column_candidates(correct, faulty):
+    """
+    Key-column hypotheses consistent with one pair faulted in that column.
+
+    Args:
+        correct (numpy.ndarray): (4,) uint8 ciphertext bytes at COLUMN_POSITIONS[c]
+        faulty (numpy.ndarray): (4,) uint8 faulty ciphertext bytes, same positions
+
+    Returns:
+        numpy.ndarray: Sorted uint32 candidates k0 << 24 | k1 << 16 | k2 << 8 | k3
+    """
+    arrays = aes_batch.load_arrays()
+    inv_sbox, mix = arrays['inv_sbox'], arrays['mix']
+    guesses = np.arange(256, dtype=np.uint8)
+    fault_values = np.arange(1, 256)
+    # (4 rows, 256 key guesses)
+    delta = inv_sbox[correct[:, None] ^ guesses] ^ inv_sbox[faulty[:, None] ^ guesses]
+
+    found = []
+    for r in range(4):
+        expected = np.stack([mix[j][r][fault_values] for j in range(4)])
+        # (4 rows, 255 fault values, 256 key guesses)
+        match = delta[:, None, :] == expected[:, :, None]
+        for f in np.nonzero(match.any(axis=2).all(axis=0))[0]:
+            k0, k1, k2, k3 = np.meshgrid(*(np.nonzero(match[j, f])[0] for j in range(4)),
+                                         indexing='ij')
+            found.append(((k0 << 24) | (k1 << 16) | (k2 << 8) | k3).ravel())
+    if not found:
+        return np.empty(0, dtype=np.uint32)
+    return np.unique(np.concatenate(found)).astype(np.uint32)
+
+
+def recover_column(args):
+    """
+    Filter one key column with its pairs until a single candidate remains.
+
+    Args:
+        args (tuple): (correct, faulty) (M, 4) uint8 arrays of the column's pairs
+
+    Returns:
+        tuple: (candidates array, pairs used)
+    """
+    correct, faulty = args
+    candidates = None
+    used = 0
+    for c, f in zip(correct, faulty):
+        found = column_candidates(c, f)
+        candidates = found if candidates is None else np.intersect1d(candidates, found)
+        used += 1
+        if len(candidates) <= 1:
+            break
+    if candidates is None:
+        candidates = np.empty(0, dtype=np.uint32)
+    return candidates, used
+
+
+def recover_last_round_key(correct, faulty, rounds=10, pool=None):
+    """
+    Recover the last round key (and cipher key) from fault pairs.
+
+    Args:
+        correct (numpy.ndarray): (N, 16) uint8 correct ciphertexts
+        faulty (numpy.ndarray): (N, 16) uint8 faulty ciphertexts of the same plaintexts
+        rounds (int): Number of rounds
+        pool (multiprocessing.Pool): Filters the four columns in parallel if given
+
+    Returns:
+        dict: 'key' (int, or None if some column is not unique),
+            'last_round_key' (hex or None), 'pairs_used' (per column),
+            'pairs_needed' (length of the pair stream prefix that was used),
+            'remaining' (candidates left per column) and 'elapsed'
+    """
+    start = time.perf_counter()
+    changed = correct != faulty
+    jobs = []
+    indices = []
+    for c in range(4):
+        pattern = np.zeros(16, dtype=bool)
+        pattern[COLUMN_POSITIONS[c]] = True
+        rows = np.nonzero((changed == pattern).all(axis=1))[0]
+        indices.append(rows)
+        jobs.append((correct[rows][:, COLUMN_POSITIONS[c]], faulty[rows][:, COLUMN_POSITIONS[c]]))
+
+    results = (pool.map if pool is not None else map)(recover_column, jobs)
+
+    last = bytearray(16)
+    remaining = []
+    pairs_used = []
+    pairs_needed = 0
+    for c, (candidates, used) in enumerate(results):
+        remaining.append(len(candidates))
+        pairs_used.append(used)
+        if used:
+            pairs_needed = max(pairs_needed, int(indices[c][used - 1]) + 1)
+        if len(candidates) == 1:
+            for j, position in enumerate(COLUMN_POSITIONS[c]):
+                last[position] = (int(candidates[0]) >> (24 - 8 * j)) & 0xFF
+
+    key = None
+    last_round_key = None
+    if all(n == 1 for n in remaining):
+        last_round_key = bytes(last).hex().upper()
+        key = aes_engine.invert_key_schedule(
+            aes_engine.block_to_words(aes_engine.bytes_to_int(last)), rounds)
+    return {
+        'key': key,
+        'last_round_key': last_round_key,
+        'pairs_used': pairs_used,
+        'pairs_needed': pairs_needed,
+        'remaining': remaining,
+        'elapsed': time.perf_counter() - start,
+    }
+
+
+def run_trial(rng, rounds=10, batch=64, pool=None):
+    """
+    Fault a batch of encryptions under a random key and recover the key.
+
+    Args:
+        rng (numpy.random.Generator): Random generator
+        rounds (int): Number of rounds
+        batch (int): Encryptions faulted (one random byte fault each)
+        pool (multiprocessing.Pool): Passed to recover_last_round_key()
+
+    Returns:
+        dict: recover_last_round_key() result plus 'secret' and 'success'
+    """
+    secret = int.from_bytes(rng.bytes(16), 'big')
+    key_bytes = aes_batch.round_key_bytes(aes_engine.expand_key(secret, rounds))
+    plaintexts = aes_batch.random_states(rng, batch)
+    positions, values = random_faults(rng, batch)
+    correct = aes_batch.aes_encrypt_array(plaintexts, key_bytes)
+    faulty = encrypt_with_faults(plaintexts, key_bytes, positions, values)
+    result = recover_last_round_key(correct, faulty, rounds, pool)
+    result['secret'] = secret
+    result['success'] = result['key'] == secret
+    return result
+
+
+def main():
+    """Run repeated fault attacks and report how many pairs each needed."""
+    parser = argparse.ArgumentParser(description="AES differential fault analysis")
+    parser.add_argument('--rounds', type=int, default=10)
+    parser.add_argument('--trials', type=int, default=20)
+    parser.add_argument('--batch', type=int, default=64, help="Faulty encryptions per trial")
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    pool = Pool(args.workers) if args.workers > 1 else None
+
+    print("\n" + "="*80)
+    print(f"DIFFERENTIAL FAULT ANALYSIS - {args.rounds}-ROUND AES, "
+          f"FAULTS BEFORE THE LAST MIXCOLUMNS")
+    print("="*80)
+    print(f"\n{'Trial':<7} {'Pairs needed':<14} {'Pairs per column':<20} {'ms':<9} {'Key':<6}")
+    print("-" * 80)
+
+    needed = []
+    successes = 0
+    try:
+        for trial in range(args.trials):
+            result = run_trial(rng, args.rounds, args.batch, pool)
+            successes += result['success']
+            if result['success']:
+                needed.append(result['pairs_needed'])
+            print(f"{trial:<7} {result['pairs_needed']:<14} {str(result['pairs_used']):<20} "
+                  f"{result['elapsed'] * 1000:<9.1f} {'✓' if result['success'] else '✗':<6}")
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    print(f"\nRecovered: {successes}/{args.trials}")
+    if needed:
+        print(f"Faulty pairs needed: mean {np.mean(needed):.1f}, "
+              f"min {min(needed)}, max {max(needed)}")
+    print()
+
+
+if __name__ == "__main__":
+    main()
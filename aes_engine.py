@@ -0,0 +1,271 @@
+"""
+Fast N-Round AES Engine
+T-table AES-128 with a configurable number of rounds, driven by the lookup
+tables in derived_tables.py.
+
+N-round AES follows the standard structure: an initial AddRoundKey, N - 1 full
+rounds and a final round without MixColumns, with round keys from the AES-128
+key schedule. With N = 10 this is standard AES-128.
+
+Blocks and keys are 128-bit Python ints (first byte most significant), and the
+state is held as four 32-bit column words in the byte order of state_to_hex().
+"""
+
+from derived_tables import get_store
+
+
+MASK_32 = (1 << 32) - 1
+
+_tables = None
+
+
+def load_tables():
+    """
+    Return the AES lookup tables as Python lists, loading them on first use.
+
+    Returns:
+        tuple: (sbox, inv_sbox, te, td, imc) from the derived store
+    """
+    global _tables
+    if _tables is None:
+        store = get_store()
+        _tables = tuple(store.rows(name) for name in
+                        ('aes_sbox', 'aes_inv_sbox', 'aes_te', 'aes_td', 'aes_imc'))
+    return _tables
+
+
+def bytes_to_int(data):
+    """Convert a 16-byte block to a 128-bit int."""
+    return int.from_bytes(data, 'big')
+
+
+def int_to_bytes(value):
+    """Convert a 128-bit int to a 16-byte block."""
+    return value.to_bytes(16, 'big')
+
+
+def block_to_words(block):
+    """Split a 128-bit block into four 32-bit column words."""
+    return [(block >> 96) & MASK_32, (block >> 64) & MASK_32,
+            (block >> 32) & MASK_32, block & MASK_32]
+
+
+def words_to_block(words):
+    """Join four 32-bit column words into a 128-bit block."""
+    return (words[0] << 96) | (words[1] << 64) | (words[2] << 32) | words[3]
+
+
+def round_constants(count, polynomial=0x11b):
+    """
+    Return the key schedule round constants Rcon[1..count].
+
+    Args:
+        count (int): Number of constants
+        polynomial (int): Field polynomial the doubling reduces by
+
+    Returns:
+        list: Round constants as bytes (ints)
+    """
+    rcon = []
+    value = 1
+    for _ in range(count):
+        rcon.append(value)
+        value <<= 1
+        if value & 0x100:
+            value ^= polynomial
+    return rcon
+
+
+def expand_key(key_128, rounds=10, tables=None, polynomial=0x11b):
+    """
+    Expand a 128-bit key into N + 1 round keys using the AES-128 schedule.
+
+    Args:
+        key_128 (int): 128-bit cipher key
+        rounds (int): Number of rounds
+        tables (tuple): Tables in the load_tables() layout (defaults to the store)
+        polynomial (int): Field polynomial for the round constants
+
+    Returns:
+        list: rounds + 1 round keys, each a list of four column words
+    """
+    sbox = (tables or load_tables())[0]
+    words = block_to_words(key_128)
+    for rcon in round_constants(rounds, polynomial):
+        last = words[-1]
+        # RotWord, SubWord, Rcon
+        temp = ((sbox[(last >> 16) & 0xFF] << 24) | (sbox[(last >> 8) & 0xFF] << 16)
+                | (sbox[last & 0xFF] << 8) | sbox[last >> 24]) ^ (rcon << 24)
+        for _ in range(4):
+            temp ^= words[-4]
+            words.append(temp)
+            temp = words[-1]
+    return [words[i:i + 4] for i in range(0, len(words), 4)]
+
+
+def invert_key_schedule(round_key, round_index):
+    """
+    Recover the cipher key from one AES-128 round key.
+
+    Args:
+        round_key (list): Four column words of round key number round_index
+        round_index (int): Which round key this is (0 is the cipher key)
+
+    Returns:
+        int: 128-bit cipher key
+    """
+    sbox = load_tables()[0]
+    words = list(round_key)
+    for rcon in reversed(round_constants(round_index)):
+        # w[i-4] = w[i] ^ w[i-1] for the last three words of the previous key
+        prev = [0, 0, 0, 0]
+        for j in range(3, 0, -1):
+            prev[j] = words[j] ^ words[j - 1]
+        last = prev[3]
+        temp = ((sbox[(last >> 16) & 0xFF] << 24) | (sbox[(last >> 8) & 0xFF] << 16)
+                | (sbox[last & 0xFF] << 8) | sbox[last >> 24]) ^ (rcon << 24)
+        prev[0] = words[0] ^ temp
+        words = prev
+    return words_to_block(words)
+
+
+def inv_mix_column_word(word, tables=None):
+    """Apply InvMixColumns to a single column word."""
+    imc = (tables or load_tables())[4]
+    return (imc[0][word >> 24] ^ imc[1][(word >> 16) & 0xFF]
+            ^ imc[2][(word >> 8) & 0xFF] ^ imc[3][word & 0xFF])
+
+
+def decryption_round_keys(round_keys, tables=None):
+    """
+    Derive the equivalent inverse cipher key schedule.
+
+    Args:
+        round_keys (list): Encryption round keys from expand_key()
+        tables (tuple): Tables in the load_tables() layout (defaults to the store)
+
+    Returns:
+        list: Round keys in decryption order with InvMixColumns applied to the
+            inner keys
+    """
+    rounds = len(round_keys) - 1
+    dec = [list(round_keys[rounds])]
+    for i in range(rounds - 1, 0, -1):
+        dec.append([inv_mix_column_word(w, tables) for w in round_keys[i]])
+    dec.append(list(round_keys[0]))
+    return dec
+
+
+def aes_encrypt_blocks(blocks, round_keys, tables=None):
+    """
+    Encrypt many 128-bit blocks under one expanded key.
+
+    Args:
+        blocks (iterable): 128-bit plaintext blocks as ints
+        round_keys (list): Round keys from expand_key()
+        tables (tuple): Tables in the load_tables() layout (defaults to the store)
+
+    Returns:
+        list: 128-bit ciphertext blocks as ints
+    """
+    sbox, _, te, _, _ = tables or load_tables()
+    te0, te1, te2, te3 = te
+    k0 = round_keys[0]
+    inner = round_keys[1:-1]
+    kf0, kf1, kf2, kf3 = round_keys[-1]
+
+    out = []
+    for block in blocks:
+        s0 = ((block >> 96) & MASK_32) ^ k0[0]
+        s1 = ((block >> 64) & MASK_32) ^ k0[1]
+        s2 = ((block >> 32) & MASK_32) ^ k0[2]
+        s3 = (block & MASK_32) ^ k0[3]
+        for k in inner:
+            s0, s1, s2, s3 = (
+                te0[s0 >> 24] ^ te1[(s1 >> 16) & 0xFF] ^ te2[(s2 >> 8) & 0xFF] ^ te3[s3 & 0xFF] ^ k[0],
+                te0[s1 >> 24] ^ te1[(s2 >> 16) & 0xFF] ^ te2[(s3 >> 8) & 0xFF] ^ te3[s0 & 0xFF] ^ k[1],
+                te0[s2 >> 24] ^ te1[(s3 >> 16) & 0xFF] ^ te2[(s0 >> 8) & 0xFF] ^ te3[s1 & 0xFF] ^ k[2],
+                te0[s3 >> 24] ^ te1[(s0 >> 16) & 0xFF] ^ te2[(s1 >> 8) & 0xFF] ^ te3[s2 & 0xFF] ^ k[3],
+            )
+        # Final round: SubBytes and ShiftRows without MixColumns
+        t0 = ((sbox[s0 >> 24] << 24) | (sbox[(s1 >> 16) & 0xFF] << 16)
+              | (sbox[(s2 >> 8) & 0xFF] << 8) | sbox[s3 & 0xFF]) ^ kf0
+        t1 = ((sbox[s1 >> 24] << 24) | (sbox[(s2 >> 16) & 0xFF] << 16)
+              | (sbox[(s3 >> 8) & 0xFF] << 8) | sbox[s0 & 0xFF]) ^ kf1
+        t2 = ((sbox[s2 >> 24] << 24) | (sbox[(s3 >> 16) & 0xFF] << 16)
+              | (sbox[(s0 >> 8) & 0xFF] << 8) | sbox[s1 & 0xFF]) ^ kf2
+        t3 = ((sbox[s3 >> 24] << 24) | (sbox[(s0 >> 16) & 0xFF] << 16)
+              | (sbox[(s1 >> 8) & 0xFF] << 8) | sbox[s2 & 0xFF]) ^ kf3
+        out.append((t0 << 96) | (t1 << 64) | (t2 << 32) | t3)
+    return out
+
+
+def aes_decrypt_blocks(blocks, round_keys, tables=None):
+    """
+    Decrypt many 128-bit blocks under one expanded key.
+
+    Args:
+        blocks (iterable): 128-bit ciphertext blocks as ints
+        round_keys (list): Encryption round keys from expand_key()
+        tables (tuple): Tables in the load_tables() layout (defaults to the store)
+
+    Returns:
+        list: 128-bit plaintext blocks as ints
+    """
+    _, inv_sbox, _, td, _ = tables or load_tables()
+    td0, td1, td2, td3 = td
+    dec = decryption_round_keys(round_keys, tables)
+    k0 = dec[0]
+    inner = dec[1:-1]
+    kf0, kf1, kf2, kf3 = dec[-1]
+
+    out = []
+    for block in blocks:
+        s0 = ((block >> 96) & MASK_32) ^ k0[0]
+        s1 = ((block >> 64) & MASK_32) ^ k0[1]
+        s2 = ((block >> 32) & MASK_32) ^ k0[2]
+        s3 = (block & MASK_32) ^ k0[3]
+        for k in inner:
+            s0, s1, s2, s3 = (
+                td0[s0 >> 24] ^ td1[(s3 >> 16) & 0xFF] ^ td2[(s2 >> 8) & 0xFF] ^ td3[s1 & 0xFF] ^ k[0],
+                td0[s1 >> 24] ^ td1[(s0 >> 16) & 0xFF] ^ td2[(s3 >> 8) & 0xFF] ^ td3[s2 & 0xFF] ^ k[1],
+                td0[s2 >> 24] ^ td1[(s1 >> 16) & 0xFF] ^ td2[(s0 >> 8) & 0xFF] ^ td3[s3 & 0xFF] ^ k[2],
+                td0[s3 >> 24] ^ td1[(s2 >> 16) & 0xFF] ^ td2[(s1 >> 8) & 0xFF] ^ td3[s0 & 0xFF] ^ k[3],
+            )
+        # Final round: InvShiftRows and InvSubBytes
+        t0 = ((inv_sbox[s0 >> 24] << 24) | (inv_sbox[(s3 >> 16) & 0xFF] << 16)
+              | (inv_sbox[(s2 >> 8) & 0xFF] << 8) | inv_sbox[s1 & 0xFF]) ^ kf0
+        t1 = ((inv_sbox[s1 >> 24] << 24) | (inv_sbox[(s0 >> 16) & 0xFF] << 16)
+              | (inv_sbox[(s3 >> 8) & 0xFF] << 8) | inv_sbox[s2 & 0xFF]) ^ kf1
+        t2 = ((inv_sbox[s2 >> 24] << 24) | (inv_sbox[(s1 >> 16) & 0xFF] << 16)
+              | (inv_sbox[(s0 >> 8) & 0xFF] << 8) | inv_sbox[s3 & 0xFF]) ^ kf2
+        t3 = ((inv_sbox[s3 >> 24] << 24) | (inv_sbox[(s2 >> 16) & 0xFF] << 16)
+              | (inv_sbox[(s1 >> 8) & 0xFF] << 8) | inv_sbox[s0 & 0xFF]) ^ kf3
+        out.append((t0 << 96) | (t1 << 64) | (t2 << 32) | t3)
+    return out
+
+
+def aes_encrypt_block(block, round_keys):
+    """Encrypt a single 128-bit block (int) under the given round keys."""
+    return aes_encrypt_blocks((block,), round_keys)[0]
+
+
+def aes_decrypt_block(block, round_keys):
+    """Decrypt a single 128-bit block (int) under the given round keys."""
+    return aes_decrypt_blocks((block,), round_keys)[0]
+
+
+def aes_encrypt(plaintext_hex, key_hex, rounds=10):
+    """
+    Encrypt a hex-string block with N-round AES.
+
+    Args:
+        plaintext_hex (str): 32-character hex plaintext
+        key_hex (str): 32-character hex key
+        rounds (int): Number of rounds
+
+    Returns:
+        str: 32-character hex ciphertext (uppercase, as state_to_hex())
+    """
+    round_keys = expand_key(int(key_hex, 16), rounds)
+    return format(aes_encrypt_block(int(plaintext_hex, 16), round_keys), '032X')
@@ -0,0 +1,468 @@
+"""
+AES-GCM
+Authenticated encryption (NIST SP 800-38D) on N-round AES: counter mode
+through aes_batch.py for the encryption, GHASH in GF(2^128) for the tag.
+
+GHASH multiplies by the hash key H with Shoup-style tables: multiplication
+by a fixed H is linear, so X * H is the XOR of one table entry per 4-bit or
+8-bit piece of X (32 tables of 16 entries or 16 tables of 256). Tables are
+also built for the powers H^2 .. H^STRIDE, so STRIDE blocks are hashed at
+once as
+
+    Y' = Y * H^s ^ X_1 * H^s ^ X_2 * H^(s-1) ^ ... ^ X_s * H
+
+where the sum over the blocks is one NumPy gather and XOR reduction for a
+whole run of STRIDE-block groups, and only Y * H^s is done block group by
+block group in Python.
+
+Counter blocks are encrypted in batches by aes_batch.aes_encrypt_array();
+given a multiprocessing pool, large batches are split across the workers.
+Messages can be processed incrementally with update(), after any number of
+update_aad() calls.
+
+Usage:
+
+    gcm = AESGCM(key)
+    ciphertext, tag = gcm.encrypt(iv, plaintext, aad)
+    plaintext = gcm.decrypt(iv, ciphertext, tag, aad)
+
+    stream = gcm.encryptor(iv, aad)
+    for chunk in chunks:
+        out.write(stream.update(chunk))
+    tag = stream.finalize()
+
+    python aes_gcm.py --megabytes 4 --workers 4
+
+Requires NumPy.
+"""
+
+import argparse
+import hmac
+import time
+from multiprocessing import Pool
+
+import numpy as np
+
+import aes_batch
+import aes_engine
+from aes_operations import GF128_REDUCTION, gf128_mult
+
+
+MASK_64 = (1 << 64) - 1
+
+# Powers of H with tables: blocks hashed per group
+STRIDE = 32
+
+# Block groups gathered per NumPy call (bounds the temporary arrays)
+GROUPS_PER_CALL = 128
+
+# Counter blocks per pool job
+JOB_BLOCKS = 1 << 14
+
+
+def build_tables(values, table_bits=8):
+    """
+    Build Shoup-style multiplication tables.
+
+    Args:
+        values (list): 128-bit multipliers
+        table_bits (int): 4 or 8 bits of the other operand per table
+
+    Returns:
+        numpy.ndarray: (len(values), 128 / table_bits, 2^table_bits, 2)
+            uint64; entry [v, p, n] is (n at piece p) * values[v] as
+            (high, low) words, piece 0 being the most significant
+    """
+    if table_bits not in (4, 8):
+        raise ValueError("table_bits must be 4 or 8")
+    # basis[v, i] = values[v] * x^i
+    basis = []
+    for value in values:
+        for _ in range(128):
+            basis.append((value >> 64, value & MASK_64))
+            value = (value >> 1) ^ (GF128_REDUCTION if value & 1 else 0)
+    basis = np.array(basis, dtype=np.uint64).reshape(len(values), 128, 2)
+
+    pieces = 128 // table_bits
+    tables = np.zeros((len(values), pieces, 1 << table_bits, 2), dtype=np.uint64)
+    starts = np.arange(pieces) * table_bits
+    for s in range(table_bits):
+        # Bit s of a piece is coefficient table_bits * p + table_bits - 1 - s
+        tables[:, :, 1 << s:2 << s] = (tables[:, :, :1 << s]
+                                       ^ basis[:, starts + table_bits - 1 - s][:, :, None])
+    return tables
+
+
+class GHash:
+    """
+    GHASH under one hash key.
+
+    Args:
+        h (int): Hash key H = E_K(0^128)
+        table_bits (int): 4 or 8
+        stride (int): Blocks hashed per group (powers of H with tables)
+    """
+
+    def __init__(self, h, table_bits=8, stride=STRIDE):
+        self.table_bits = table_bits
+        self.stride = stride
+        powers = [h]
+        for _ in range(stride - 1):
+            powers.append(gf128_mult(powers[-1], h))
+        # tables[j] multiplies by H^(stride - j), the power block j of a group needs
+        self.tables = build_tables(powers[::-1], table_bits)
+        self._h_rows = self._rows(stride - 1)
+        self._stride_rows = self._rows(0)
+        # Flat high and low words, and the offset of each (power, piece) table in them
+        self._high = np.ascontiguousarray(self.tables[..., 0]).ravel()
+        self._low = np.ascontiguousarray(self.tables[..., 1]).ravel()
+        self._offsets = (np.arange(stride * (128 // table_bits), dtype=np.intp)
+                         << table_bits).reshape(stride, -1)
+
+    def _rows(self, index):
+        """Return one power's tables as lists of Python ints."""
+        return [[(hi << 64) | lo for hi, lo in piece] for piece in self.tables[index].tolist()]
+
+    def _multiply(self, rows, x):
+        bits = self.table_bits
+        mask = (1 << bits) - 1
+        z = 0
+        shift = 128 - bits
+        for row in rows:
+            z ^= row[(x >> shift) & mask]
+            shift -= bits
+        return z
+
+    def multiply(self, x):
+        """Return x * H."""
+        return self._multiply(self._h_rows, x)
+
+    def update(self, y, data):
+        """
+        Hash whole blocks into a GHASH state.
+
+        Args:
+            y (int): Current state (0 to start)
+            data (bytes): A whole number of 16-byte blocks
+
+        Returns:
+            int: New state
+        """
+        count = len(data) // 16
+        grouped = count - count % self.stride
+        group_bytes = 16 * self.stride
+        for start in range(0, grouped * 16, group_bytes * GROUPS_PER_CALL):
+            chunk = np.frombuffer(data, dtype=np.uint8, offset=start,
+                                  count=min(group_bytes * GROUPS_PER_CALL, grouped * 16 - start))
+            blocks = chunk.reshape(-1, self.stride, 16)
+            if self.table_bits == 4:
+                blocks = np.stack((blocks >> 4, blocks & 0x0F), axis=-1).reshape(
+                    len(blocks), self.stride, 32)
+            # One table entry per piece of every block, XORed over each group
+            index = (self._offsets + blocks).reshape(len(blocks), -1)
+            high = np.bitwise_xor.reduce(np.take(self._high, index), axis=1)
+            low = np.bitwise_xor.reduce(np.take(self._low, index), axis=1)
+            for hi, lo in zip(high.tolist(), low.tolist()):
+                y = self._multiply(self._stride_rows, y) ^ (hi << 64) ^ lo
+        for i in range(grouped * 16, count * 16, 16):
+            y = self._multiply(self._h_rows, y ^ int.from_bytes(data[i:i + 16], 'big'))
+        return y
+
+
+def _keystream_job(args):
+    """Encrypt count counter blocks inc32^start(J0) ... (also run on pool workers)."""
+    key_bytes, j0, start, count = args
+    low = np.uint64(j0 & 0xFFFFFFFF) + np.uint64(start) + np.arange(count, dtype=np.uint64)
+    states = np.empty((count, 16), dtype=np.uint8)
+    states[:, :12] = np.frombuffer((j0 >> 32).to_bytes(12, 'big'), dtype=np.uint8)
+    states[:, 12:] = (low & np.uint64(0xFFFFFFFF)).astype('>u4').view(np.uint8).reshape(-1, 4)
+    return aes_batch.aes_encrypt_array(states, key_bytes)
+
+
+class AESGCM:
+    """
+    AES-GCM under one key.
+
+    Args:
+        key (int): 128-bit AES key
+        rounds (int): Number of AES rounds
+        table_bits (int): GHASH table width, 4 or 8
+        tag_length (int): Tag bytes, 12 to 16
+        pool (multiprocessing.Pool): Splits large counter batches across workers if given
+    """
+
+    def __init__(self, key, rounds=10, table_bits=8, tag_length=16, pool=None):
+        if not 12 <= tag_length <= 16:
+            raise ValueError("tag_length must be 12 to 16 bytes")
+        self.rounds = rounds
+        self.tag_length = tag_length
+        self.pool = pool
+        self._round_keys = aes_engine.expand_key(key, rounds)
+        self._key_bytes = aes_batch.round_key_bytes(self._round_keys)
+        h = aes_engine.aes_encrypt_blocks([0], self._round_keys)[0]
+        self.ghash = GHash(h, table_bits)
+
+    def initial_counter(self, iv):
+        """
+        Derive the pre-counter block J0 from an IV.
+
+        Args:
+            iv (bytes): IV, normally 12 bytes
+
+        Returns:
+            int: J0
+        """
+        if len(iv) == 12:
+            return (int.from_bytes(iv, 'big') << 32) | 1
+        padded = iv + bytes(-len(iv) % 16) + (8 * len(iv)).to_bytes(16, 'big')
+        return self.ghash.update(0, padded)
+
+    def keystream(self, j0, start, count):
+        """
+        Encrypt the counter blocks inc32^start(J0) .. inc32^(start + count - 1)(J0).
+
+        Returns:
+            bytes: 16 * count keystream bytes
+        """
+        if self.pool is None or count < 2 * JOB_BLOCKS:
+            return _keystream_job((self._key_bytes, j0, start, count)).tobytes()
+        jobs = [(self._key_bytes, j0, s, min(JOB_BLOCKS, start + count - s))
+                for s in range(start, start + count, JOB_BLOCKS)]
+        return b''.join(out.tobytes() for out in self.pool.map(_keystream_job, jobs))
+
+    def encryptor(self, iv, aad=b''):
+        """Start encrypting a message (see GCMStream)."""
+        return GCMStream(self, iv, aad, decrypt=False)
+
+    def decryptor(self, iv, aad=b''):
+        """Start decrypting a message (see GCMStream)."""
+        return GCMStream(self, iv, aad, decrypt=True)
+
+    def encrypt(self, iv, plaintext, aad=b''):
+        """
+        Encrypt and authenticate a message.
+
+        Returns:
+            tuple: (ciphertext bytes, tag bytes)
+        """
+        stream = self.encryptor(iv, aad)
+        ciphertext = stream.update(plaintext)
+        return ciphertext, stream.finalize()
+
+    def decrypt(self, iv, ciphertext, tag, aad=b''):
+        """
+        Verify and decrypt a message.
+
+        Returns:
+            bytes: Plaintext
+
+        Raises:
+            ValueError: If the tag does not match
+        """
+        stream = self.decryptor(iv, aad)
+        plaintext = stream.update(ciphertext)
+        stream.finalize(tag)
+        return plaintext
+
+
+class GCMStream:
+    """
+    One message being encrypted or decrypted incrementally.
+
+    All update_aad() calls come before the first update(). A decrypting
+    stream returns plaintext before the tag is checked; it must not be used
+    until finalize(tag) has returned.
+    """
+
+    def __init__(self, gcm, iv, aad, decrypt):
+        self._gcm = gcm
+        self._decrypt = decrypt
+        self._j0 = gcm.initial_counter(iv)
+        self._counter = 1
+        self._keystream = b''
+        self._y = 0
+        self._pending = b''
+        self._aad_length = 0
+        self._length = 0
+        self._in_aad = True
+        self._finished = False
+        if aad:
+            self.update_aad(aad)
+
+    def _absorb(self, data):
+        data = self._pending + data
+        whole = len(data) - len(data) % 16
+        self._y = self._gcm.ghash.update(self._y, data[:whole])
+        self._pending = data[whole:]
+
+    def _pad(self):
+        if self._pending:
+            self._y = self._gcm.ghash.update(self._y, self._pending + bytes(16 - len(self._pending)))
+            self._pending = b''
+
+    def update_aad(self, data):
+        """Authenticate additional data."""
+        if not self._in_aad or self._finished:
+            raise ValueError("Additional data must come before the message")
+        self._aad_length += len(data)
+        self._absorb(data)
+
+    def update(self, data):
+        """
+        Encrypt or decrypt the next piece of the message.
+
+        Returns:
+            bytes: Output of the same length
+        """
+        if self._finished:
+            raise ValueError("Stream is finalized")
+        if self._in_aad:
+            self._pad()
+            self._in_aad = False
+        keystream = self._keystream
+        if len(keystream) < len(data):
+            count = -(-(len(data) - len(keystream)) // 16)
+            if self._counter + count > 1 << 32:
+                raise ValueError("Message too long for one IV")
+            keystream += self._gcm.keystream(self._j0, self._counter, count)
+            self._counter += count
+        out = (np.frombuffer(data, dtype=np.uint8)
+               ^ np.frombuffer(keystream, dtype=np.uint8, count=len(data))).tobytes()
+        self._keystream = keystream[len(data):]
+        self._absorb(data if self._decrypt else out)
+        self._length += len(data)
+        return out
+
+    def finalize(self, tag=None):
+        """
+        Finish the message.
+
+        Args:
+            tag (bytes): Expected tag (decryption only)
+
+        Returns:
+            bytes: The tag
+
+        Raises:
+            ValueError: If decrypting and the tag does not match
+        """
+        if not self._finished:
+            self._pad()
+            lengths = ((8 * self._aad_length) << 64) | (8 * self._length)
+            self._y = self._gcm.ghash.update(self._y, lengths.to_bytes(16, 'big'))
+            mask = aes_engine.aes_encrypt_blocks([self._j0], self._gcm._round_keys)[0]
+            self._tag = (mask ^ self._y).to_bytes(16, 'big')[:self._gcm.tag_length]
+            self._finished = True
+        if self._decrypt and (tag is None or not hmac.compare_digest(tag, self._tag)):
+            raise ValueError("GCM tag mismatch")
+        return self._tag
+
+
+# (key, iv, plaintext, aad, ciphertext, tag) from the GCM specification, test cases 1-6
+TEST_VECTORS = [
+    ('00000000000000000000000000000000', '000000000000000000000000', '', '', '',
+     '58e2fccefa7e3061367f1d57a4e7455a'),
+    ('00000000000000000000000000000000', '000000000000000000000000',
+     '00000000000000000000000000000000', '', '0388dace60b6a392f328c2b971b2fe78',
+     'ab6e47d42cec13bdf53a67b21257bddf'),
+    ('feffe9928665731c6d6a8f9467308308', 'cafebabefacedbaddecaf888',
+     'd9313225f88406e5a55909c5aff5269a86a7a9531534f7da2e4c303d8a318a72'
+     '1c3c0c95956809532fcf0e2449a6b525b16aedf5aa0de657ba637b391aafd255', '',
+     '42831ec2217774244b7221b784d0d49ce3aa212f2c02a4e035c17e2329aca12e'
+     '21d514b25466931c7d8f6a5aac84aa051ba30b396a0aac973d58e091473f5985',
+     '4d5c2af327cd64a62cf35abd2ba6fab4'),
+    ('feffe9928665731c6d6a8f9467308308', 'cafebabefacedbaddecaf888',
+     'd9313225f88406e5a55909c5aff5269a86a7a9531534f7da2e4c303d8a318a72'
+     '1c3c0c95956809532fcf0e2449a6b525b16aedf5aa0de657ba637b39',
+     'feedfacedeadbeeffeedfacedeadbeefabaddad2',
+     '42831ec2217774244b7221b784d0d49ce3aa212f2c02a4e035c17e2329aca12e'
+     '21d514b25466931c7d8f6a5aac84aa051ba30b396a0aac973d58e091',
+     '5bc94fbc3221a5db94fae95ae7121a47'),
+    ('feffe9928665731c6d6a8f9467308308', 'cafebabefacedbad',
+     'd9313225f88406e5a55909c5aff5269a86a7a9531534f7da2e4c303d8a318a72'
+     '1c3c0c95956809532fcf0e2449a6b525b16aedf5aa0de657ba637b39',
+     'feedfacedeadbeeffeedfacedeadbeefabaddad2',
+     '61353b4c2806934a777ff51fa22a4755699b2a714fcdc6f83766e5f97b6c7423'
+     '73806900e49f24b22b097544d4896b424989b5e1ebac0f07c23f4598',
+     '3612d2e79e3b0785561be14aaca2fccb'),
+    ('feffe9928665731c6d6a8f9467308308',
+     '9313225df88406e555909c5aff5269aa6a7a9538534f7da1e4c303d2a318a728'
+     'c3c0c95156809539fcf0e2429a6b525416aedbf5a0de6a57a637b39b',
+     'd9313225f88406e5a55909c5aff5269a86a7a9531534f7da2e4c303d8a318a72'
+     '1c3c0c95956809532fcf0e2449a6b525b16aedf5aa0de657ba637b39',
+     'feedfacedeadbeeffeedfacedeadbeefabaddad2',
+     '8ce24998625615b603a033aca13fb894be9112a5c3a211a8ba262a3cca7e2ca7'
+     '01e4a9a4fba43c90ccdcb281d48c7c6fd62875d2aca417034c34aee5',
+     '619cc5aefffe0bfa462af43c1699d050'),
+]
+
+
+def main():
+    """Check the specification test vectors and measure throughput."""
+    parser = argparse.ArgumentParser(description="AES-GCM with table-driven GHASH")
+    parser.add_argument('--megabytes', type=int, default=4)
+    parser.add_argument('--rounds', type=int, default=10)
+    parser.add_argument('--workers', type=int, default=1)
+    args = parser.parse_args()
+
+    print("\n" + "="*80)
+    print("AES-GCM")
+    print("="*80)
+    print()
+    for n, (key, iv, plain, aad, cipher, tag) in enumerate(TEST_VECTORS, 1):
+        ok = True
+        for table_bits in (4, 8):
+            gcm = AESGCM(int(key, 16), table_bits=table_bits)
+            c, t = gcm.encrypt(bytes.fromhex(iv), bytes.fromhex(plain), bytes.fromhex(aad))
+            ok &= c.hex() == cipher and t.hex() == tag
+            ok &= gcm.decrypt(bytes.fromhex(iv), c, t, bytes.fromhex(aad)) == bytes.fromhex(plain)
+        print(f"Test case {n}: {'✓' if ok else '✗'}")
+
+    rng = np.random.default_rng(0)
+    key = int.from_bytes(rng.bytes(16), 'big')
+    data = rng.bytes(args.megabytes << 20)
+    pieces = [data[i:i + 65536] for i in range(0, len(data), 65536)]
+    pool = Pool(args.workers) if args.workers > 1 else None
+
+    print(f"\n{'Operation':<40} {'MB/s':<10}")
+    print("-" * 80)
+    try:
+        for table_bits in (4, 8):
+            gcm = AESGCM(key, args.rounds, table_bits, pool=pool)
+            start = time.perf_counter()
+            gcm.ghash.update(0, data)
+            print(f"{f'GHASH, {table_bits}-bit tables, {STRIDE}-block groups':<40} "
+                  f"{args.megabytes / (time.perf_counter() - start):<10.1f}")
+        sample = data[:1 << 18]
+        start = time.perf_counter()
+        y = 0
+        for i in range(0, len(sample), 16):
+            y = gcm.ghash.multiply(y ^ int.from_bytes(sample[i:i + 16], 'big'))
+        print(f"{'GHASH, 8-bit tables, block by block':<40} "
+              f"{len(sample) / (1 << 20) / (time.perf_counter() - start):<10.1f}")
+        print(f"{'(same result)':<40} {'✓' if y == gcm.ghash.update(0, sample) else '✗'}")
+
+        start = time.perf_counter()
+        gcm.keystream(gcm.initial_counter(bytes(12)), 1, len(data) // 16)
+        print(f"{f'CTR keystream, {args.workers} worker(s)':<40} "
+              f"{args.megabytes / (time.perf_counter() - start):<10.1f}")
+        start = time.perf_counter()
+        ciphertext, tag = gcm.encrypt(bytes(12), data)
+        print(f"{'GCM encrypt, one call':<40} {args.megabytes / (time.perf_counter() - start):<10.1f}")
+        start = time.perf_counter()
+        stream = gcm.encryptor(bytes(12))
+        streamed = b''.join(stream.update(piece) for piece in pieces)
+        streamed_tag = stream.finalize()
+        print(f"{'GCM encrypt, 64 KiB update() calls':<40} "
+              f"{args.megabytes / (time.perf_counter() - start):<10.1f}")
+        print(f"{'(same ciphertext and tag)':<40} "
+              f"{'✓' if (streamed, streamed_tag) == (ciphertext, tag) else '✗'}")
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -151,6 +151,42 @@ def gf_mult(a, b):
     return p & 0xFF
 
 
+# GHASH reduction: x^128 + x^7 + x^2 + x + 1 with the bit order reversed
+GF128_REDUCTION = 0xE1 << 120
+
+
+def gf128_mult(a, b):
+    """
+    Multiply two blocks in GF(2^128) as defined for GCM's GHASH.
+    Polynomial: x^128 + x^7 + x^2 + x + 1
+
+    Uses the same shift-and-XOR method as gf_mult(), but the most
+    significant bit of a block is the coefficient of x^0, so multiplying
+    by x is a right shift.
+
+    Args:
+        a (int): First operand (128-bit block)
+        b (int): Second operand (128-bit block)
+
+    Returns:
+        int: Product in GF(2^128)
+    """
+    p = 0
+
+    for i in range(128):
+        # If coefficient i of a is 1, XOR with b
+        if (a >> (127 - i)) & 1:
+            p ^= b
+
+        # Multiply b by x, reducing if the x^127 coefficient was set
+        low_bit_set = b & 1
+        b >>= 1
+        if low_bit_set:
+            b ^= GF128_REDUCTION
+
+    return p
+
+
 def mix_columns(state):
     """
     Apply MixColumns transformation.
@@ -215,12 +251,7 @@ def format_state_matrix(state, title="State Matrix"):
     Returns:
         str: Formatted string representation
     """
-    output = f"\n{title}:\n"
-    output += "┌" + "─" * 35 + "┐\n"
-    for row in range(4):
-        output += "│ "
-        for col in range(4):
-            output += f"{state[row][col]:02X} "
-        output += "│\n"
-    output += "└" + "─" * 35 + "┘\n"
-    return output
+    lines = [f"\n{title}:", "┌" + "─" * 35 + "┐"]
+    lines.extend("│ " + "".join(f"{value:02X} " for value in row[:4]) + "│" for row in state[:4])
+    lines.append("└" + "─" * 35 + "┘\n")
+    return "\n".join(lines)
@@ -0,0 +1,164 @@
+"""
+Square (Integral) Attack on 4-Round AES
+Recovers the cipher key of 4-round AES (three full rounds and a final round
+without MixColumns, as aes_engine.py with rounds=4) from chosen plaintexts.
+
+A Lambda-set is 256 plaintexts that take every value in one byte position
+and agree in the other fifteen. After three rounds every state byte is
+balanced over the set (the XOR of its 256 values is zero). The last round
+has no MixColumns, so each ciphertext byte depends on a single byte of that
+state and one byte of the last round key:
+
+    state[j'] = InvSubBytes(C[j] ^ K4[j])       (j' = InvShiftRows(j))
+
+Every byte of K4 is therefore found independently by keeping the guesses
+whose partial decryptions XOR to zero. All 256 guesses x 256 ciphertexts x
+16 positions are decrypted at once as one inverse S-box gather, and wrong
+guesses (surviving with probability 1/256 per set) are removed by further
+Lambda-sets. The cipher key is then recovered by running the key schedule
+backwards from K4.
+
+Usage:
+
+    python aes_square_attack.py
+
+Requires NumPy.
+"""
+
+import time
+
+import numpy as np
+
+import aes_batch
+import aes_engine
+
+
+def lambda_set(rng, active_byte=0):
+    """
+    Build a Lambda-set of 256 plaintexts.
+
+    Args:
+        rng (numpy.random.Generator): Random generator for the constant bytes
+        active_byte (int): State byte position (0-15) that takes all values
+
+    Returns:
+        numpy.ndarray: (256, 16) uint8 plaintexts
+    """
+    states = np.repeat(aes_batch.random_states(rng, 1), 256, axis=0)
+    states[:, active_byte] = np.arange(256, dtype=np.uint8)
+    return states
+
+
+def zero_sum_candidates(ciphertexts):
+    """
+    Test every last-round key byte guess against one Lambda-set.
+
+    Args:
+        ciphertexts (numpy.ndarray): (256, 16) uint8 ciphertexts of a Lambda-set
+
+    Returns:
+        numpy.ndarray: (16, 256) bool array, True where guess g for key byte j
+            gives a zero sum of the partially decrypted byte
+    """
+    inv_sbox = aes_batch.load_arrays()['inv_sbox']
+    guesses = np.arange(256, dtype=np.uint8)
+    # (16 positions, 256 guesses, 256 ciphertexts)
+    partial = inv_sbox[ciphertexts.T[:, None, :] ^ guesses[None, :, None]]
+    return np.bitwise_xor.reduce(partial, axis=2) == 0
+
+
+def recover_last_round_key(oracle, rng, max_sets=16):
+    """
+    Recover the last round key with as many Lambda-sets as needed.
+
+    Args:
+        oracle (callable): Encrypts a (N, 16) uint8 batch under the unknown key
+        rng (numpy.random.Generator): Random generator for the Lambda-sets
+        max_sets (int): Give up after this many Lambda-sets
+
+    Returns:
+        tuple: (candidates, sets_used) where candidates is the (16, 256) bool
+            array of surviving guesses
+    """
+    candidates = np.ones((16, 256), dtype=bool)
+    sets_used = 0
+    while sets_used < max_sets:
+        # Vary the active byte so the constant bytes differ between sets
+        candidates &= zero_sum_candidates(oracle(lambda_set(rng, sets_used % 16)))
+        sets_used += 1
+        if (candidates.sum(axis=1) == 1).all():
+            break
+    return candidates, sets_used
+
+
+def recover_key(oracle, rounds=4, seed=0, max_sets=16):
+    """
+    Recover the 128-bit cipher key of reduced-round AES.
+
+    Args:
+        oracle (callable): Encrypts a (N, 16) uint8 batch under the unknown key
+        rounds (int): Must be 4; with fewer rounds every byte before the last
+            round is a permutation of the set and all guesses give a zero sum
+        seed (int): Seed for the Lambda-set plaintexts
+        max_sets (int): Maximum number of Lambda-sets to encrypt
+
+    Returns:
+        dict: 'key' (int, or None if the key bytes were not all unique),
+            'last_round_key' (hex), 'sets_used', 'chosen_plaintexts',
+            'remaining' (surviving guesses per key byte) and 'elapsed'
+    """
+    if rounds != 4:
+        raise ValueError("The zero-sum distinguisher needs exactly 4 rounds")
+    start = time.perf_counter()
+    rng = np.random.default_rng(seed)
+    candidates, sets_used = recover_last_round_key(oracle, rng, max_sets)
+    remaining = candidates.sum(axis=1)
+
+    key = None
+    last_round_key = None
+    if (remaining == 1).all():
+        last_bytes = bytes(int(np.argmax(row)) for row in candidates)
+        last_round_key = last_bytes.hex().upper()
+        key = aes_engine.invert_key_schedule(
+            aes_engine.block_to_words(aes_engine.bytes_to_int(last_bytes)), rounds)
+
+    return {
+        'key': key,
+        'last_round_key': last_round_key,
+        'sets_used': sets_used,
+        'chosen_plaintexts': 256 * sets_used,
+        'remaining': remaining.tolist(),
+        'elapsed': time.perf_counter() - start,
+    }
+
+
+def main():
+    """Recover a random 4-round AES key with the square attack."""
+    rounds = 4
+    secret = int.from_bytes(np.random.default_rng(2024).bytes(16), 'big')
+    key_bytes = aes_batch.round_key_bytes(aes_engine.expand_key(secret, rounds))
+
+    def oracle(plaintexts):
+        return aes_batch.aes_encrypt_array(plaintexts, key_bytes)
+
+    print("\n" + "="*80)
+    print(f"SQUARE ATTACK ON {rounds}-ROUND AES")
+    print("="*80)
+
+    result = recover_key(oracle, rounds)
+
+    print(f"\nLambda-sets encrypted:   {result['sets_used']}")
+    print(f"Chosen plaintexts:       {result['chosen_plaintexts']}")
+    print(f"Elapsed:                 {result['elapsed'] * 1000:.1f} ms")
+    if result['key'] is None:
+        print(f"Key bytes not unique:    {result['remaining']}")
+        return
+    print(f"Last round key:          {result['last_round_key']}")
+    print(f"Recovered cipher key:    {result['key']:032X}")
+    print(f"Actual cipher key:       {secret:032X}")
+    print(f"Match: {'✓' if result['key'] == secret else '✗'}")
+    print()
+
+
+if __name__ == "__main__":
+    main()
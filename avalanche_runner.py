@@ -0,0 +1,292 @@
+"""
+Monte Carlo Avalanche Experiment Runner
+Samples (plaintext, key, flipped-bit) triples and measures how many output
+bits change, for N-round DES or AES, across a process pool.
+
+Only streaming aggregates are kept (Welford mean/variance, a flip-count
+histogram, per-output-position flip counts and per-input-bit means), so
+no ciphertexts are stored. Both plaintext-bit and key-bit avalanche are
+supported.
+
+Samples are drawn in fixed-size chunks, each from its own seed stream derived
+from (seed, chunk index), so results are reproducible and independent of the
+number of worker processes. Completed chunks are checkpointed to a JSON file
+so long runs can resume where they stopped.
+
+Usage:
+
+    python avalanche_runner.py --cipher des --rounds 2 --mode plaintext \\
+        --samples 1000000 --checkpoint des2.json
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import random
+import time
+from multiprocessing import Pool
+
+import aes_engine
+import des_engine
+
+
+# Per cipher: (block bits, key bits)
+CIPHER_BITS = {
+    'des': (64, 56),
+    'aes': (128, 128),
+}
+
+
+def chunk_rng(seed, chunk_index):
+    """
+    Return the random stream for one chunk.
+
+    Args:
+        seed (int): Experiment seed
+        chunk_index (int): Chunk number
+
+    Returns:
+        random.Random: Generator seeded from a hash of (seed, chunk_index)
+    """
+    digest = hashlib.sha256(f"{seed}:{chunk_index}".encode('ascii')).digest()
+    return random.Random(int.from_bytes(digest[:16], 'big'))
+
+
+class AvalancheStats:
+    """
+    Streaming avalanche aggregates that can be merged across workers.
+
+    Args:
+        out_bits (int): Output block width
+        in_bits (int): Width of the flipped input (block or key)
+    """
+
+    def __init__(self, out_bits, in_bits):
+        self.out_bits = out_bits
+        self.in_bits = in_bits
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        # histogram[k] = number of samples with exactly k output bits flipped
+        self.histogram = [0] * (out_bits + 1)
+        # position_counts[j] = how often output bit j + 1 (MSB first) flipped
+        self.position_counts = [0] * out_bits
+        # Flip-count sum and sample count per flipped input bit
+        self.input_sums = [0] * in_bits
+        self.input_counts = [0] * in_bits
+
+    def add(self, diff, flipped_bit):
+        """
+        Record one sample.
+
+        Args:
+            diff (int): XOR of the two ciphertexts
+            flipped_bit (int): 0-based (MSB-first) index of the flipped input bit
+        """
+        flips = bin(diff).count('1')
+        self.count += 1
+        delta = flips - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (flips - self.mean)
+        self.histogram[flips] += 1
+        self.input_sums[flipped_bit] += flips
+        self.input_counts[flipped_bit] += 1
+        top = self.out_bits - 1
+        while diff:
+            low = diff & -diff
+            self.position_counts[top - (low.bit_length() - 1)] += 1
+            diff ^= low
+
+    def merge(self, other):
+        """Fold another aggregate into this one (Chan et al. parallel update)."""
+        if other.count == 0:
+            return
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        self.m2 += other.m2 + delta * delta * self.count * other.count / total
+        self.mean += delta * other.count / total
+        self.count = total
+        for name in ('histogram', 'position_counts', 'input_sums', 'input_counts'):
+            mine = getattr(self, name)
+            for i, value in enumerate(getattr(other, name)):
+                mine[i] += value
+
+    @property
+    def variance(self):
+        """Sample variance of the flip count."""
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    def to_dict(self):
+        """Return the aggregate as a JSON-serialisable dict."""
+        return dict(self.__dict__)
+
+    @classmethod
+    def from_dict(cls, data):
+        """Rebuild an aggregate saved with to_dict()."""
+        stats = cls(data['out_bits'], data['in_bits'])
+        stats.__dict__.update(data)
+        return stats
+
+
+def run_chunk(args):
+    """
+    Evaluate one chunk of samples (runs in a worker process).
+
+    Args:
+        args (tuple): (cipher, rounds, mode, seed, chunk_index, size)
+
+    Returns:
+        tuple: (chunk_index, aggregate dict)
+    """
+    cipher, rounds, mode, seed, chunk_index, size = args
+    block_bits, key_bits = CIPHER_BITS[cipher]
+    in_bits = block_bits if mode == 'plaintext' else key_bits
+    rng = chunk_rng(seed, chunk_index)
+    stats = AvalancheStats(block_bits, in_bits)
+
+    if cipher == 'des':
+        schedule, encrypt = des_engine.generate_round_keys, des_engine.des_encrypt_blocks
+    else:
+        schedule, encrypt = aes_engine.expand_key, aes_engine.aes_encrypt_blocks
+
+    for _ in range(size):
+        plaintext = rng.getrandbits(block_bits)
+        key = rng.getrandbits(key_bits)
+        bit = rng.randrange(in_bits)
+        mask = 1 << (in_bits - 1 - bit)
+        round_keys = schedule(key, rounds)
+        if mode == 'plaintext':
+            c1, c2 = encrypt((plaintext, plaintext ^ mask), round_keys)
+        else:
+            c1 = encrypt((plaintext,), round_keys)[0]
+            c2 = encrypt((plaintext,), schedule(key ^ mask, rounds))[0]
+        stats.add(c1 ^ c2, bit)
+    return chunk_index, stats.to_dict()
+
+
+def load_checkpoint(path, config):
+    """
+    Load a checkpoint if it exists and belongs to the same experiment.
+
+    Returns:
+        tuple: (set of completed chunk indices, AvalancheStats or None)
+    """
+    if not path or not os.path.exists(path):
+        return set(), None
+    with open(path) as f:
+        data = json.load(f)
+    if data['config'] != config:
+        raise ValueError(f"Checkpoint {path} was written for a different experiment")
+    return set(data['completed']), AvalancheStats.from_dict(data['stats'])
+
+
+def save_checkpoint(path, config, completed, stats):
+    """Atomically write the experiment state to a checkpoint file."""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump({'config': config, 'completed': sorted(completed),
+                   'stats': stats.to_dict()}, f)
+    os.replace(tmp_path, path)
+
+
+def run_experiment(cipher='des', rounds=2, mode='plaintext', samples=100000, seed=0,
+                   workers=None, chunk_size=10000, checkpoint=None,
+                   checkpoint_interval=10.0):
+    """
+    Run (or resume) a Monte Carlo avalanche experiment.
+
+    Args:
+        cipher (str): 'des' or 'aes'
+        rounds (int): Number of rounds
+        mode (str): 'plaintext' to flip a plaintext bit, 'key' to flip a key bit
+        samples (int): Total number of samples
+        seed (int): Experiment seed
+        workers (int): Worker processes (defaults to the CPU count)
+        chunk_size (int): Samples per chunk (part of the experiment identity)
+        checkpoint (str): Optional checkpoint path
+        checkpoint_interval (float): Minimum seconds between checkpoint writes
+
+    Returns:
+        AvalancheStats: Aggregated statistics
+    """
+    if cipher not in CIPHER_BITS:
+        raise ValueError(f"Unknown cipher {cipher!r}")
+    if mode not in ('plaintext', 'key'):
+        raise ValueError(f"Unknown mode {mode!r}")
+
+    config = {'cipher': cipher, 'rounds': rounds, 'mode': mode, 'samples': samples,
+              'seed': seed, 'chunk_size': chunk_size}
+    completed, stats = load_checkpoint(checkpoint, config)
+    if stats is None:
+        block_bits, key_bits = CIPHER_BITS[cipher]
+        stats = AvalancheStats(block_bits, block_bits if mode == 'plaintext' else key_bits)
+
+    jobs = []
+    for chunk_index, start in enumerate(range(0, samples, chunk_size)):
+        if chunk_index not in completed:
+            size = min(chunk_size, samples - start)
+            jobs.append((cipher, rounds, mode, seed, chunk_index, size))
+
+    last_save = time.monotonic()
+    with Pool(workers) as pool:
+        for chunk_index, data in pool.imap_unordered(run_chunk, jobs):
+            stats.merge(AvalancheStats.from_dict(data))
+            completed.add(chunk_index)
+            if checkpoint and time.monotonic() - last_save >= checkpoint_interval:
+                save_checkpoint(checkpoint, config, completed, stats)
+                last_save = time.monotonic()
+    if checkpoint:
+        save_checkpoint(checkpoint, config, completed, stats)
+    return stats
+
+
+def print_summary(stats, cipher, rounds, mode):
+    """Print the aggregated avalanche statistics."""
+    width = stats.out_bits
+    print("\n" + "="*80)
+    print(f"AVALANCHE EXPERIMENT - {cipher.upper()}-{rounds} ROUND(S), "
+          f"{mode.upper()}-BIT FLIPS")
+    print("="*80)
+    print(f"\nSamples:              {stats.count}")
+    print(f"Mean bits flipped:    {stats.mean:.4f} of {width} ({stats.mean / width * 100:.2f}%)")
+    print(f"Std deviation:        {math.sqrt(stats.variance):.4f}")
+    print(f"Ideal (random):       {width / 2:.1f} ± {math.sqrt(width) / 2:.4f}")
+
+    print(f"\n{'Bits flipped':<15} {'Samples':<15} {'Fraction':<10}")
+    print("-" * 40)
+    for flips, count in enumerate(stats.histogram):
+        if count:
+            print(f"{flips:<15} {count:<15} {count / stats.count:.6f}")
+
+    print(f"\n{'Output bit':<12} {'Flip rate':<10}")
+    print("-" * 22)
+    for position, count in enumerate(stats.position_counts, start=1):
+        print(f"{position:<12} {count / max(stats.count, 1):.4f}")
+    print()
+
+
+def main():
+    """Parse command-line options and run the experiment."""
+    parser = argparse.ArgumentParser(description="Monte Carlo avalanche experiment")
+    parser.add_argument('--cipher', choices=sorted(CIPHER_BITS), default='des')
+    parser.add_argument('--rounds', type=int, default=2)
+    parser.add_argument('--mode', choices=('plaintext', 'key'), default='plaintext')
+    parser.add_argument('--samples', type=int, default=100000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--chunk-size', type=int, default=10000)
+    parser.add_argument('--checkpoint', help="JSON file for resumable progress")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    stats = run_experiment(args.cipher, args.rounds, args.mode, args.samples, args.seed,
+                           args.workers, args.chunk_size, args.checkpoint)
+    elapsed = time.perf_counter() - start
+    print_summary(stats, args.cipher, args.rounds, args.mode)
+    print(f"Elapsed: {elapsed:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,544 @@
+"""
+Cache-Line Access Traces
+Records which table entries the S-box and T-table lookups read, maps them to
+simulated cache lines, and runs a Bernstein-style timing correlation
+against the key bytes.
+
+- Scalar code is traced as it runs: instrument() wraps
+  aes_tables.sbox_lookup() and des_2round.s_box_substitution(), and
+  recording_tables() gives aes_engine/des_engine tables that record every
+  index they are read at. Indices go into one compact byte array per table.
+- Batches are traced without running the scalar code: aes_lookups() and
+  des_lookups() compute the index of every lookup the T-table engines make
+  (aes_engine.aes_encrypt_blocks(), des_engine.des_encrypt_blocks()) for a
+  whole array of blocks with aes_batch/des_batch.
+- CacheLayout places the tables in a simulated address space (line size,
+  base address and alignment are configurable) and maps lookups to lines;
+  LineCounter aggregates per-round, per-line hit counts.
+- simulate_timings() turns the lines each encryption touches into a
+  simulated time: lines evicted by other activity (each line with its own
+  probability) cost a miss. TimingProfile keeps the mean time per
+  plaintext byte value, and bernstein_correlation() matches the profile of
+  an unknown key against that of a known key, as in Bernstein's cache
+  timing attack on AES: the first-round lookups are at p[i] ^ k[i], so the
+  profiles are shifts of each other by k[i] ^ k'[i], up to the entries
+  sharing a cache line.
+
+Usage:
+
+    trace = AccessTrace()
+    with instrument(trace):
+        des_2round.des_encrypt_2rounds(plaintext, key)
+    trace.counts('des_s1')
+
+    python cache_trace.py --count 2097152 --rounds 10 --line-size 64
+
+Requires NumPy.
+"""
+
+import argparse
+import time
+from array import array
+from contextlib import contextmanager
+
+import numpy as np
+
+import aes_batch
+import aes_engine
+import aes_operations
+import aes_tables
+import des_2round
+import des_batch
+import des_engine
+
+
+# Table name: (entries, bytes per entry)
+TABLES = {
+    'aes_sbox': (256, 1),
+    **{f'aes_te{i}': (256, 4) for i in range(4)},
+    **{f'des_s{i}': (64, 1) for i in range(1, 9)},
+    **{f'des_sp{i}': (64, 4) for i in range(1, 9)},
+}
+
+# Simulated cost of a lookup that hits, and the extra cost of a miss
+HIT_COST = 1
+MISS_PENALTY = 100
+
+# Encryptions simulated per batch (bounds the (batch, lines) arrays)
+BATCH_SIZE = 1 << 16
+
+
+class AccessTrace:
+    """Lookups in the order they were made: one byte array of indices per table."""
+
+    def __init__(self):
+        self.indices = {}
+
+    def _array(self, table):
+        if table not in self.indices:
+            self.indices[table] = array('B')
+        return self.indices[table]
+
+    def record(self, table, index):
+        """Record one lookup."""
+        self._array(table).append(index)
+
+    def record_many(self, table, indices):
+        """Record an array of lookups."""
+        self._array(table).frombytes(np.asarray(indices, dtype=np.uint8).tobytes())
+
+    def counts(self, table):
+        """
+        Count the lookups of each entry of a table.
+
+        Returns:
+            numpy.ndarray: (entries,) int64 counts
+        """
+        indices = np.frombuffer(self.indices.get(table, array('B')), dtype=np.uint8)
+        return np.bincount(indices, minlength=TABLES[table][0])
+
+    def line_counts(self, layout):
+        """
+        Count the lookups of each cache line (tables the layout does not place
+        are skipped).
+
+        Returns:
+            numpy.ndarray: (layout.num_lines,) int64 counts
+        """
+        out = np.zeros(layout.num_lines, dtype=np.int64)
+        for table, indices in self.indices.items():
+            if table not in layout.address:
+                continue
+            lines = layout.lines(table, np.frombuffer(indices, dtype=np.uint8))
+            out += np.bincount(lines, minlength=layout.num_lines)
+        return out
+
+    def clear(self):
+        """Forget all lookups (recording tables stay attached)."""
+        for indices in self.indices.values():
+            del indices[:]
+
+
+class RecordingTable(list):
+    """A lookup table that records every index it is read at."""
+
+    def __init__(self, rows, trace, table):
+        super().__init__(rows)
+        self._append = trace._array(table).append
+
+    def __getitem__(self, index):
+        self._append(index)
+        return list.__getitem__(self, index)
+
+
+def recording_tables(trace, cipher):
+    """
+    Engine tables whose S-box / T-table lookups are recorded.
+
+    Args:
+        trace (AccessTrace): Trace to record into
+        cipher (str): 'aes' for aes_engine, 'des' for des_engine
+
+    Returns:
+        tuple: Tables in the engine's load_tables() layout, to pass as tables=
+    """
+    if cipher == 'aes':
+        sbox, inv_sbox, te, td, imc = aes_engine.load_tables()
+        return (RecordingTable(sbox, trace, 'aes_sbox'), inv_sbox,
+                tuple(RecordingTable(t, trace, f'aes_te{i}') for i, t in enumerate(te)), td, imc)
+    if cipher == 'des':
+        ip, fp, e, pc1, pc2, sp = des_engine.load_tables()
+        return (ip, fp, e, pc1, pc2,
+                tuple(RecordingTable(t, trace, f'des_sp{i + 1}') for i, t in enumerate(sp)))
+    raise ValueError(f"Unknown cipher {cipher!r}")
+
+
+@contextmanager
+def instrument(trace):
+    """
+    Record the lookups of aes_tables.sbox_lookup() and des_2round.s_box_substitution().
+
+    DES S-box lookups are recorded as row * 16 + column of S_BOXES[i].
+    """
+    original_lookup = aes_tables.sbox_lookup
+    original_substitution = des_2round.s_box_substitution
+
+    def sbox_lookup(byte_value):
+        trace.record('aes_sbox', byte_value & 0xFF)
+        return original_lookup(byte_value)
+
+    def s_box_substitution(bits_48):
+        for i in range(8):
+            block = bits_48[i * 6:(i + 1) * 6]
+            trace.record(f'des_s{i + 1}', int(block[0] + block[5], 2) * 16 + int(block[1:5], 2))
+        return original_substitution(bits_48)
+
+    patches = [(aes_tables, 'sbox_lookup', sbox_lookup),
+               (aes_operations, 'sbox_lookup', sbox_lookup),
+               (des_2round, 's_box_substitution', s_box_substitution)]
+    originals = [(module, name, getattr(module, name)) for module, name, _ in patches]
+    try:
+        for module, name, wrapper in patches:
+            setattr(module, name, wrapper)
+        yield trace
+    finally:
+        for module, name, original in originals:
+            setattr(module, name, original)
+
+
+def aes_lookups(states, key_bytes):
+    """
+    Indices of the lookups aes_engine.aes_encrypt_blocks() makes for a batch.
+
+    Args:
+        states (numpy.ndarray): (N, 16) uint8 plaintexts
+        key_bytes (numpy.ndarray): (rounds + 1, 16) round keys from aes_batch.round_key_bytes()
+
+    Returns:
+        list: (round, table, (N, k) uint8 indices) per group of lookups
+    """
+    rounds = len(key_bytes) - 1
+    events = []
+    states = aes_batch.add_round_key(states, key_bytes[0])
+    for r in range(1, rounds + 1):
+        if r == rounds:
+            events.append((r, 'aes_sbox', states))
+            break
+        # Te_row is indexed by the bytes of that row
+        for row in range(4):
+            events.append((r, f'aes_te{row}', states[:, row::4]))
+        states = aes_batch.mix_columns(aes_batch.shift_rows(aes_batch.sub_bytes(states)))
+        states = aes_batch.add_round_key(states, key_bytes[r])
+    return events
+
+
+def des_lookups(blocks, round_keys):
+    """
+    Indices of the SP-box lookups des_engine.des_encrypt_blocks() makes for a batch.
+
+    Args:
+        blocks (numpy.ndarray): uint64 plaintext blocks
+        round_keys (list): Round keys from des_engine.generate_round_keys()
+
+    Returns:
+        list: (round, table, (N, 1) uint8 indices) per lookup
+    """
+    events = []
+    left, right = des_batch.split_halves(des_batch.initial_permutation(blocks))
+    for r, k in enumerate(round_keys, 1):
+        inputs = des_batch.s_box_inputs(des_batch.expand(right) ^ np.uint64(k))
+        for i in range(8):
+            events.append((r, f'des_sp{i + 1}', inputs[i].astype(np.uint8)[:, None]))
+        left, right = right, left ^ des_batch.sp_lookup(inputs)
+    return events
+
+
+class CacheLayout:
+    """
+    Placement of the tables in a simulated address space.
+
+    Tables are laid out in order from the base address, each starting at a
+    multiple of align bytes past the base.
+
+    Args:
+        line_size (int): Cache line size in bytes
+        base (int): Address of the first table (misalign it to shift every table)
+        align (int): Table alignment relative to the base (default line_size)
+        tables (iterable): Table names to place (default all of TABLES)
+    """
+
+    def __init__(self, line_size=64, base=0, align=None, tables=None):
+        self.line_size = line_size
+        align = align or line_size
+        self.address = {}
+        offset = 0
+        for table in tables or TABLES:
+            entries, size = TABLES[table]
+            self.address[table] = base + offset
+            offset = -(-(offset + entries * size) // align) * align
+        self.first_line = base // line_size
+        self.num_lines = (base + offset - 1) // line_size - self.first_line + 1
+
+    def lines(self, table, indices):
+        """
+        Map lookups of a table to cache lines.
+
+        Returns:
+            numpy.ndarray: intp line numbers, 0 being the first line of the layout
+        """
+        size = TABLES[table][1]
+        return ((self.address[table] + np.asarray(indices, dtype=np.intp) * size)
+                // self.line_size - self.first_line)
+
+    def table_lines(self, table):
+        """Return the range of lines a table occupies."""
+        entries = TABLES[table][0]
+        return range(int(self.lines(table, 0)), int(self.lines(table, entries - 1)) + 1)
+
+
+class LineCounter:
+    """
+    Lookups per round and cache line, accumulated over batches.
+
+    Args:
+        layout (CacheLayout): Table placement
+        rounds (int): Number of rounds
+    """
+
+    def __init__(self, layout, rounds):
+        self.layout = layout
+        self.counts = np.zeros((rounds + 1, layout.num_lines), dtype=np.int64)
+
+    def update(self, events):
+        """Add the lookups from aes_lookups() or des_lookups()."""
+        for r, table, indices in events:
+            self.counts[r] += np.bincount(self.layout.lines(table, indices).ravel(),
+                                          minlength=self.layout.num_lines)
+
+    def totals(self):
+        """Return the lookups per line over all rounds."""
+        return self.counts.sum(axis=0)
+
+
+def eviction_profile(layout, rng, low=0.0, high=0.5):
+    """
+    Draw how likely each line is to have been evicted before an encryption.
+
+    Returns:
+        numpy.ndarray: (layout.num_lines,) probabilities
+    """
+    return rng.uniform(low, high, size=layout.num_lines)
+
+
+def simulate_timings(events, layout, rng, evict_probability, miss_penalty=MISS_PENALTY, noise=0.0):
+    """
+    Simulated encryption times.
+
+    Every lookup costs HIT_COST; every distinct line an encryption touches
+    that was evicted before it started costs miss_penalty more.
+
+    Args:
+        events (list): Lookups from aes_lookups() or des_lookups()
+        layout (CacheLayout): Table placement
+        rng (numpy.random.Generator): Random generator
+        evict_probability (numpy.ndarray): Per-line eviction probabilities
+        miss_penalty (float): Extra cost of a miss
+        noise (float): Standard deviation of added Gaussian noise
+
+    Returns:
+        numpy.ndarray: (N,) float64 times
+    """
+    count = len(events[0][2])
+    touched = np.zeros((count, layout.num_lines), dtype=bool)
+    rows = np.arange(count)[:, None]
+    accesses = 0
+    for _, table, indices in events:
+        touched[rows, layout.lines(table, indices)] = True
+        accesses += indices.shape[1]
+    evicted = rng.random((count, layout.num_lines)) < evict_probability
+    times = HIT_COST * accesses + miss_penalty * np.count_nonzero(touched & evicted, axis=1)
+    if noise:
+        times = times + noise * rng.standard_normal(count)
+    return times.astype(np.float64)
+
+
+class TimingProfile:
+    """Mean time per (plaintext byte position, byte value), accumulated over batches."""
+
+    def __init__(self):
+        self.sums = np.zeros((16, 256))
+        self.counts = np.zeros((16, 256), dtype=np.int64)
+
+    def update(self, plaintexts, times):
+        """
+        Add a batch.
+
+        Args:
+            plaintexts (numpy.ndarray): (N, 16) uint8 plaintexts
+            times (numpy.ndarray): (N,) times
+        """
+        flat = (np.arange(16) * 256 + plaintexts).ravel()
+        self.sums += np.bincount(flat, weights=np.repeat(times, 16), minlength=4096).reshape(16, 256)
+        self.counts += np.bincount(flat, minlength=4096).reshape(16, 256)
+
+    def deviations(self):
+        """Return the mean time per byte value minus the overall mean, (16, 256)."""
+        means = self.sums / np.maximum(self.counts, 1)
+        return means - self.sums.sum(axis=1, keepdims=True) / np.maximum(
+            self.counts.sum(axis=1, keepdims=True), 1)
+
+
+def bernstein_correlation(target, reference, reference_key):
+    """
+    Score every key byte candidate by correlating timing profiles.
+
+    Args:
+        target (TimingProfile): Profile under the unknown key
+        reference (TimingProfile): Profile under a known key, same environment
+        reference_key (bytes or numpy.ndarray): The 16 bytes of the known key
+
+    Returns:
+        numpy.ndarray: (16, 256) correlation of each candidate value of each key byte
+    """
+    t = target.deviations()
+    r = reference.deviations()
+    values = np.arange(256)
+    # shifted[i, c, v] = r[i, v ^ c]
+    shifted = r[:, values[:, None] ^ values[None, :]]
+    scores = np.einsum('iv,icv->ic', t, shifted)
+    scores /= np.linalg.norm(t, axis=1)[:, None] * np.linalg.norm(r, axis=1)[:, None] + 1e-300
+    # Candidate key byte k corresponds to the shift k ^ k_ref
+    reference_key = np.asarray(bytearray(reference_key), dtype=np.intp)
+    return scores[np.arange(16)[:, None], values[None, :] ^ reference_key[:, None]]
+
+
+def candidate_ranks(scores, key, group_bits=0):
+    """
+    Rank of the true key bytes among the candidates.
+
+    Args:
+        scores (numpy.ndarray): (16, 256) from bernstein_correlation()
+        key (bytes): The true 16 key bytes
+        group_bits (int): Low key bits that do not change the cache line of a
+            lookup; candidates differing only there are ranked as one
+
+    Returns:
+        numpy.ndarray: (16,) ranks, 0 for the best candidate
+    """
+    grouped = scores.reshape(16, 256 >> group_bits, 1 << group_bits).max(axis=2)
+    true = np.array([grouped[i, b >> group_bits] for i, b in enumerate(bytearray(key))])
+    return (grouped > true[:, None]).sum(axis=1)
+
+
+def line_group_bits(layout, tables):
+    """
+    Low index bits that never change the cache line a given table is read at.
+
+    For line-aligned tables this is log2 of the fewest entries per line; a
+    table that starts part-way into a line splits the aligned groups of
+    entries across lines, and fewer bits (often none) qualify.
+
+    Args:
+        layout (CacheLayout): Table placement
+        tables (iterable): Names of the tables read (see TABLES)
+
+    Returns:
+        int: Number of low index bits (at most 8)
+    """
+    bits = 8
+    for table in tables:
+        indices = np.arange(TABLES[table][0])
+        lines = layout.lines(table, indices)
+        while bits and np.any(lines != lines[indices & ~((1 << bits) - 1)]):
+            bits -= 1
+    return bits
+
+
+def profile_key(key_bytes, count, layout, rng, evict_probability, miss_penalty, noise,
+                counter=None):
+    """
+    Time count random encryptions under one key.
+
+    Returns:
+        TimingProfile: Accumulated profile
+    """
+    profile = TimingProfile()
+    for start in range(0, count, BATCH_SIZE):
+        plaintexts = aes_batch.random_states(rng, min(BATCH_SIZE, count - start))
+        events = aes_lookups(plaintexts, key_bytes)
+        if counter is not None:
+            counter.update(events)
+        profile.update(plaintexts, simulate_timings(events, layout, rng, evict_probability,
+                                                    miss_penalty, noise))
+    return profile
+
+
+def main():
+    """Trace the scalar code, then run a simulated Bernstein attack on AES."""
+    parser = argparse.ArgumentParser(description="Cache-line access traces and Bernstein correlation")
+    parser.add_argument('--count', type=int, default=1 << 21, help="Timed encryptions per key")
+    parser.add_argument('--rounds', type=int, default=10)
+    parser.add_argument('--line-size', type=int, default=64)
+    parser.add_argument('--base', type=int, default=0, help="Address of the first table")
+    parser.add_argument('--miss-penalty', type=float, default=MISS_PENALTY)
+    parser.add_argument('--noise', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    layout = CacheLayout(args.line_size, args.base,
+                         tables=['aes_sbox'] + [f'aes_te{i}' for i in range(4)])
+
+    print("\n" + "="*80)
+    print("CACHE-LINE ACCESS TRACES")
+    print("="*80)
+
+    trace = AccessTrace()
+    with instrument(trace):
+        des_2round.des_encrypt_2rounds("0" * 64, "1" * 56)
+        aes_operations.sub_bytes([[0x00, 0x10, 0x20, 0x30]] * 4)
+    print(f"\nInstrumented scalar code: {sum(trace.counts(f'des_s{i}').sum() for i in range(1, 9))} "
+          f"DES S-box and {trace.counts('aes_sbox').sum()} AES S-box lookups")
+
+    key = int.from_bytes(rng.bytes(16), 'big')
+    round_keys = aes_engine.expand_key(key, args.rounds)
+    key_bytes = aes_batch.round_key_bytes(round_keys)
+    states = aes_batch.random_states(rng, 100)
+    trace = AccessTrace()
+    aes_engine.aes_encrypt_blocks(aes_batch.states_to_ints(states), round_keys,
+                                  recording_tables(trace, 'aes'))
+    batched = AccessTrace()
+    for _, table, indices in aes_lookups(states, key_bytes):
+        batched.record_many(table, indices)
+    same = all(np.array_equal(trace.counts(t), batched.counts(t)) for t in layout.address)
+    print(f"Batched traces match recorded aes_engine lookups: {'✓' if same else '✗'}")
+
+    print(f"\nLayout: {args.line_size}-byte lines, base {args.base:#x}, {layout.num_lines} lines")
+    for table in layout.address:
+        lines = layout.table_lines(table)
+        print(f"  {table:<10} address {layout.address[table]:#06x}, lines {lines.start}-{lines.stop - 1}")
+
+    environment = eviction_profile(layout, rng)
+    target_key = rng.bytes(16)
+    reference_key = rng.bytes(16)
+    counter = LineCounter(layout, args.rounds)
+    start = time.perf_counter()
+    target = profile_key(aes_batch.round_key_bytes(
+        aes_engine.expand_key(int.from_bytes(target_key, 'big'), args.rounds)),
+        args.count, layout, rng, environment, args.miss_penalty, args.noise, counter)
+    reference = profile_key(aes_batch.round_key_bytes(
+        aes_engine.expand_key(int.from_bytes(reference_key, 'big'), args.rounds)),
+        args.count, layout, rng, environment, args.miss_penalty, args.noise)
+    elapsed = time.perf_counter() - start
+    print(f"\nSimulated {2 * args.count} encryptions of {args.rounds}-round AES in {elapsed:.1f} s "
+          f"({2 * args.count / elapsed:.0f}/s)")
+
+    totals = counter.totals()
+    print(f"\nLookups per line under the target key:")
+    print(f"{'Table':<10} {'Lines':<8} {'Round 1 (min-max)':<24} {'All rounds (min-max)':<24}")
+    print("-" * 80)
+    for table in layout.address:
+        lines = layout.table_lines(table)
+        first = counter.counts[1, lines.start:lines.stop]
+        every = totals[lines.start:lines.stop]
+        print(f"{table:<10} {len(lines):<8} {f'{first.min()}-{first.max()}':<24} "
+              f"{f'{every.min()}-{every.max()}':<24}")
+
+    # The plaintext bytes only reach the first round's lookups directly
+    first_round = {table for r, table, _ in aes_lookups(states[:1], key_bytes) if r == 1}
+    group_bits = line_group_bits(layout, first_round)
+    scores = bernstein_correlation(target, reference, reference_key)
+    ranks = candidate_ranks(scores, target_key, group_bits)
+    exact = candidate_ranks(scores, target_key)
+    print(f"\n{'Byte':<6} {'Key':<6} {'Best':<6} {'Rank':<8} {f'Line rank (top {8 - group_bits} bits)':<24}")
+    print("-" * 80)
+    for i in range(16):
+        print(f"{i:<6} {target_key[i]:02X}{'':<4} {int(scores[i].argmax()):02X}{'':<4} "
+              f"{exact[i]:<8} {ranks[i]:<24}")
+    print(f"\nKey bytes whose cache line is ranked first: {int((ranks == 0).sum())}/16 "
+          f"(the low {group_bits} bits share a line and cannot be told apart)")
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+"""
+Pluggable Cipher Parameters
+A CipherParams object carries its own copy of every source table
+(des_tables.py: IP, FP, E, P, PC1, PC2, SHIFT_SCHEDULE, S_BOXES;
+aes_tables.py: SBOX, MIX_COLUMNS_MATRIX, AES_POLYNOMIAL), any of which can
+be replaced per instance, and runs des_engine/aes_engine with tables derived
+from them.
+
+Derived tables (chunk permutations, SP boxes, GF tables, inverse S-box,
+T-tables) are built on first use, one table at a time, and cached process
+wide by a hash of only the source tables each one depends on. Swapping the
+DES S-boxes rebuilds the SP boxes but reuses IP, FP, E and the key schedule
+tables; returning to a set of tables seen before costs a hash and a lookup.
+Tables that match the defaults come straight from the derived table store.
+Each operation builds only the tables it reads: key expansion and
+encryption never build the inverse AES tables, so a MixColumns matrix that
+is not invertible only fails (with ValueError) on decryption.
+
+Usage:
+
+    params = CipherParams(S_BOXES=my_s_boxes)
+    round_keys = params.des_round_keys(key_56, rounds=4)
+    round_keys = params.des_round_keys_64(key_64, rounds=4)  # applies PC1
+    ciphertexts = params.des_encrypt_blocks(plaintexts, round_keys)
+"""
+
+import hashlib
+import random
+import time
+
+import aes_engine
+import aes_tables
+import des_engine
+import des_tables
+from derived_tables import (build_chunk_table, build_gf_tables, build_sp_boxes,
+                            build_t_tables, get_store, inverse_mix_columns_matrix)
+
+
+DES_SOURCES = ('IP', 'FP', 'E', 'P', 'PC1', 'PC2', 'SHIFT_SCHEDULE', 'S_BOXES')
+AES_SOURCES = ('SBOX', 'MIX_COLUMNS_MATRIX', 'AES_POLYNOMIAL')
+
+# Derived table names in the des_engine/aes_engine load_tables() layouts
+DES_LAYOUT = ('des_ip', 'des_fp', 'des_e', 'des_pc1', 'des_pc2', 'des_sp')
+AES_LAYOUT = ('aes_sbox', 'aes_inv_sbox', 'aes_te', 'aes_td', 'aes_imc')
+
+# Tables the DES block functions read (the key schedule only needs des_pc2)
+DES_CIPHER = ('des_ip', 'des_fp', 'des_e', 'des_sp')
+
+# Derived tables kept across all parameter objects
+CACHE_SIZE = 512
+
+_cache = {}
+_stats = {'hits': 0, 'builds': 0}
+
+
+def _freeze(value):
+    """Turn nested lists into nested tuples."""
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def _build_gf(params):
+    exp_table, log_table = build_gf_tables(params.AES_POLYNOMIAL)
+    if len(set(exp_table[:255])) != 255:
+        raise ValueError(f"0x03 does not generate GF(2^8) modulo {params.AES_POLYNOMIAL:#x}")
+    return exp_table, log_table
+
+
+def _build_inv_sbox(params):
+    sbox = params.table('aes_sbox')
+    if len(set(sbox)) != 256:
+        raise ValueError("AES S-box is not a permutation")
+    inv_sbox = [0] * 256
+    for x, s in enumerate(sbox):
+        inv_sbox[s] = x
+    return inv_sbox
+
+
+def _build_inv_matrix(params):
+    exp_table, log_table = params.table('gf')
+    return inverse_mix_columns_matrix(params.MIX_COLUMNS_MATRIX, exp_table, log_table)
+
+
+def _build_t(params, sbox_name, matrix):
+    exp_table, log_table = params.table('gf')
+    sbox = params.table(sbox_name) if sbox_name else list(range(256))
+    return build_t_tables(sbox, matrix, exp_table, log_table)
+
+
+# name: (source tables it depends on, builder, name in the derived table store)
+BUILDERS = {
+    'des_ip': (('IP',), lambda p: build_chunk_table(p.IP, 64), 'des_ip'),
+    'des_fp': (('FP',), lambda p: build_chunk_table(p.FP, 64), 'des_fp'),
+    'des_e': (('E',), lambda p: build_chunk_table(p.E, 32), 'des_e'),
+    'des_pc1': (('PC1',), lambda p: build_chunk_table(p.PC1, 64), 'des_pc1'),
+    'des_pc2': (('PC2',), lambda p: build_chunk_table(p.PC2, 56), 'des_pc2'),
+    'des_sp': (('S_BOXES', 'P'), lambda p: build_sp_boxes(p.S_BOXES, p.P), 'des_sp'),
+    'aes_sbox': (('SBOX',), lambda p: [v for row in p.SBOX for v in row], 'aes_sbox'),
+    'aes_inv_sbox': (('SBOX',), _build_inv_sbox, 'aes_inv_sbox'),
+    'gf': (('AES_POLYNOMIAL',), _build_gf, None),
+    'aes_inv_matrix': (('MIX_COLUMNS_MATRIX', 'AES_POLYNOMIAL'), _build_inv_matrix, None),
+    'aes_te': (('SBOX', 'MIX_COLUMNS_MATRIX', 'AES_POLYNOMIAL'),
+               lambda p: _build_t(p, 'aes_sbox', p.MIX_COLUMNS_MATRIX), 'aes_te'),
+    'aes_td': (('SBOX', 'MIX_COLUMNS_MATRIX', 'AES_POLYNOMIAL'),
+               lambda p: _build_t(p, 'aes_inv_sbox', p.table('aes_inv_matrix')), 'aes_td'),
+    'aes_imc': (('MIX_COLUMNS_MATRIX', 'AES_POLYNOMIAL'),
+                lambda p: _build_t(p, None, p.table('aes_inv_matrix')), 'aes_imc'),
+}
+
+
+class CipherParams:
+    """
+    Source tables for DES and AES, with lazily derived engine tables.
+
+    Args:
+        **tables: Replacements for source tables, by their module name; SBOX
+            may be given as 16 rows of 16 or as a flat list of 256
+    """
+
+    def __init__(self, **tables):
+        unknown = set(tables) - set(DES_SOURCES) - set(AES_SOURCES)
+        if unknown:
+            raise ValueError(f"Unknown source tables: {', '.join(sorted(unknown))}")
+        for name in DES_SOURCES:
+            setattr(self, name, _freeze(tables.get(name, getattr(des_tables, name))))
+        for name in AES_SOURCES:
+            setattr(self, name, _freeze(tables.get(name, getattr(aes_tables, name))))
+        if len(self.SBOX) == 256:
+            self.SBOX = tuple(self.SBOX[i:i + 16] for i in range(0, 256, 16))
+        self._tables = {}
+
+    def replace(self, **tables):
+        """Return a copy with some source tables replaced."""
+        current = {name: getattr(self, name) for name in DES_SOURCES + AES_SOURCES}
+        current.update(tables)
+        return CipherParams(**current)
+
+    def sources_digest(self, names=DES_SOURCES + AES_SOURCES):
+        """
+        Hash some (by default all) source tables.
+
+        Returns:
+            str: SHA-256 hex digest
+        """
+        sources = tuple((name, getattr(self, name)) for name in names)
+        return hashlib.sha256(repr(sources).encode('ascii')).hexdigest()
+
+    def is_default(self, names):
+        """True if the named source tables equal those in des_tables/aes_tables."""
+        for name in names:
+            module = des_tables if name in DES_SOURCES else aes_tables
+            if getattr(self, name) != _freeze(getattr(module, name)):
+                return False
+        return True
+
+    def table(self, name):
+        """
+        Return one derived table, building it on first use.
+
+        Args:
+            name (str): Table name (see BUILDERS)
+
+        Returns:
+            list: Table rows as Python lists
+        """
+        if name in self._tables:
+            return self._tables[name]
+        sources, builder, store_name = BUILDERS[name]
+        cache_key = (name, self.sources_digest(sources))
+        value = _cache.pop(cache_key, None)
+        if value is None:
+            _stats['builds'] += 1
+            if store_name and self.is_default(sources):
+                value = get_store().rows(store_name)
+            else:
+                value = builder(self)
+            if len(_cache) >= CACHE_SIZE:
+                del _cache[next(iter(_cache))]
+        else:
+            _stats['hits'] += 1
+        _cache[cache_key] = value
+        self._tables[name] = value
+        return value
+
+    def des_tables(self, names=DES_LAYOUT):
+        """
+        Return DES tables in the des_engine.load_tables() layout.
+
+        Args:
+            names (tuple): Tables to build (default all); other slots are None
+        """
+        return tuple(self.table(name) if name in names else None for name in DES_LAYOUT)
+
+    def aes_tables(self, names=AES_LAYOUT):
+        """
+        Return AES tables in the aes_engine.load_tables() layout.
+
+        Args:
+            names (tuple): Tables to build (default all); other slots are None
+        """
+        return tuple(self.table(name) if name in names else None for name in AES_LAYOUT)
+
+    def des_pc1(self, key_64):
+        """Reduce a 64-bit key (with parity bits) to 56 bits with this PC1 table."""
+        return des_engine.apply_chunk_table(key_64, self.table('des_pc1'), 64)
+
+    def des_round_keys_64(self, key_64, rounds=2):
+        """Generate DES round keys from a 64-bit key with these PC1, PC2 and shift tables."""
+        return self.des_round_keys(self.des_pc1(key_64), rounds)
+
+    def des_round_keys(self, key_56, rounds=2):
+        """Generate DES round keys from a PC-1 reduced key with these PC2 and shift tables."""
+        return des_engine.generate_round_keys(key_56, rounds, self.des_tables(('des_pc2',)),
+                                              self.SHIFT_SCHEDULE)
+
+    def des_encrypt_blocks(self, blocks, round_keys):
+        """Encrypt 64-bit int blocks (see des_engine.des_encrypt_blocks())."""
+        return des_engine.des_encrypt_blocks(blocks, round_keys, self.des_tables(DES_CIPHER))
+
+    def des_decrypt_blocks(self, blocks, round_keys):
+        """Decrypt 64-bit int blocks (see des_engine.des_decrypt_blocks())."""
+        return des_engine.des_decrypt_blocks(blocks, round_keys, self.des_tables(DES_CIPHER))
+
+    def aes_expand_key(self, key_128, rounds=10):
+        """Expand an AES-128 key with this S-box and polynomial."""
+        return aes_engine.expand_key(key_128, rounds, self.aes_tables(('aes_sbox',)),
+                                     self.AES_POLYNOMIAL)
+
+    def aes_encrypt_blocks(self, blocks, round_keys):
+        """Encrypt 128-bit int blocks (see aes_engine.aes_encrypt_blocks())."""
+        return aes_engine.aes_encrypt_blocks(blocks, round_keys,
+                                             self.aes_tables(('aes_sbox', 'aes_te')))
+
+    def aes_decrypt_blocks(self, blocks, round_keys):
+        """Decrypt 128-bit int blocks (see aes_engine.aes_decrypt_blocks())."""
+        return aes_engine.aes_decrypt_blocks(blocks, round_keys,
+                                             self.aes_tables(('aes_inv_sbox', 'aes_td', 'aes_imc')))
+
+
+def cache_info():
+    """
+    Return derived table cache statistics.
+
+    Returns:
+        dict: 'hits', 'builds', 'size' and 'max_size'
+    """
+    return dict(_stats, size=len(_cache), max_size=CACHE_SIZE)
+
+
+def random_aes_sbox(rng):
+    """Return a random byte permutation as a flat S-box."""
+    sbox = list(range(256))
+    rng.shuffle(sbox)
+    return sbox
+
+
+def main():
+    """Search loop over candidate S-boxes, showing the derived table cache at work."""
+    rng = random.Random(0)
+    candidates = [random_aes_sbox(rng) for _ in range(16)]
+    des_variants = []
+    for _ in range(16):
+        s_boxes = [list(box) for box in des_tables.S_BOXES]
+        rng.shuffle(s_boxes)
+        des_variants.append(s_boxes)
+    key = rng.getrandbits(128)
+    blocks = [rng.getrandbits(128) for _ in range(64)]
+
+    default = CipherParams()
+    expected = aes_engine.aes_encrypt_blocks(blocks, aes_engine.expand_key(key, 4))
+    default_ok = default.aes_encrypt_blocks(blocks, default.aes_expand_key(key, 4)) == expected
+    des_key = rng.getrandbits(56)
+    des_blocks = [rng.getrandbits(64) for _ in range(64)]
+    default_ok &= (default.des_encrypt_blocks(des_blocks, default.des_round_keys(des_key, 16))
+                   == des_engine.des_encrypt_blocks(des_blocks,
+                                                    des_engine.generate_round_keys(des_key, 16)))
+    des_key_64 = rng.getrandbits(64)
+    default_ok &= (default.des_round_keys_64(des_key_64, 16)
+                   == des_engine.generate_round_keys(des_engine.pc1(des_key_64), 16))
+
+    print("\n" + "="*80)
+    print("PLUGGABLE CIPHER PARAMETERS")
+    print("="*80)
+    print(f"\nDefault parameters match the engines: {'✓' if default_ok else '✗'}")
+    print(f"\n{'Pass':<8} {'Candidates':<12} {'Seconds':<10} {'Tables built':<14} {'Round trips':<12}")
+    print("-" * 80)
+
+    for label in ('first', 'second'):
+        before = cache_info()['builds']
+        start = time.perf_counter()
+        ok = True
+        for sbox, s_boxes in zip(candidates, des_variants):
+            params = CipherParams(SBOX=sbox, S_BOXES=s_boxes)
+            round_keys = params.aes_expand_key(key, 4)
+            ok &= params.aes_decrypt_blocks(params.aes_encrypt_blocks(blocks, round_keys),
+                                            round_keys) == blocks
+            des_keys = params.des_round_keys(des_key, 4)
+            ok &= params.des_decrypt_blocks(params.des_encrypt_blocks(des_blocks, des_keys),
+                                            des_keys) == des_blocks
+        elapsed = time.perf_counter() - start
+        built = cache_info()['builds'] - before
+        print(f"{label:<8} {len(candidates):<12} {elapsed:<10.3f} {built:<14} "
+              f"{'✓' if ok else '✗':<12}")
+
+    info = cache_info()
+    print(f"\nCache: {info['size']}/{info['max_size']} tables, "
+          f"{info['hits']} hits, {info['builds']} builds")
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,315 @@
+"""
+Persistent Ciphertext Cache
+Opt-in on-disk cache of (cipher, rounds, key, plaintext) -> ciphertext
+results, so reruns of experiments over the same vectors and datasets skip
+the encryptions they have already done.
+
+Entries live in a SQLite database keyed by a 16-byte BLAKE2b digest of the
+algorithm version, cipher, rounds, key and plaintext:
+
+- get_many()/put_many() look up and store whole batches, a few hundred
+  digests per statement, in one transaction.
+- The database is capped at max_entries; each batch that hits entries marks
+  them with a new value of a use counter, and the least recently used
+  entries are evicted when the cap is exceeded.
+- Hit, miss and eviction counts are kept for the session and in total.
+- The algorithm version includes derived_tables.source_checksum(), so any
+  change to des_tables.py or aes_tables.py (or to ALGORITHM_VERSION) empties
+  the cache the next time it is opened.
+
+Usage:
+
+    with CiphertextCache() as cache:
+        ciphertexts = cache.encrypt_many('des', 2, key, plaintexts)
+
+    python ciphertext_cache.py [--path cache.sqlite] [--clear]
+"""
+
+import argparse
+import hashlib
+import os
+import sqlite3
+import time
+
+import aes_engine
+import des_engine
+from derived_tables import source_checksum
+
+
+# Bump whenever an engine's results change for the same inputs
+ALGORITHM_VERSION = 1
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            '.cache', 'ciphertexts.sqlite')
+
+# Environment variable that overrides the location of the cache
+PATH_ENV_VAR = 'CIPHERTEXT_CACHE_PATH'
+
+# Per cipher: (block bytes, key bytes)
+BLOCK_SIZES = {
+    'des': (8, 7),
+    'aes': (16, 16),
+}
+
+# Digests per SQL statement (below SQLite's bound parameter limit)
+BATCH_SIZE = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value);
+CREATE TABLE IF NOT EXISTS entries (
+    digest BLOB PRIMARY KEY,
+    ciphertext BLOB NOT NULL,
+    last_used INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used);
+"""
+
+COUNTERS = ('hits', 'misses', 'puts', 'evictions')
+
+
+def algorithm_version():
+    """
+    Identify the algorithms whose results are cached.
+
+    Returns:
+        bytes: Digest of ALGORITHM_VERSION and the source table checksum
+    """
+    return hashlib.sha256(ALGORITHM_VERSION.to_bytes(4, 'big') + source_checksum()).digest()
+
+
+def cache_path():
+    """Return the path of the cache database."""
+    return os.environ.get(PATH_ENV_VAR, DEFAULT_PATH)
+
+
+def _encrypt(cipher, rounds, key, plaintexts):
+    """Encrypt int blocks with the engines."""
+    if cipher == 'des':
+        return des_engine.des_encrypt_blocks(plaintexts, des_engine.generate_round_keys(key, rounds))
+    return aes_engine.aes_encrypt_blocks(plaintexts, aes_engine.expand_key(key, rounds))
+
+
+class CiphertextCache:
+    """
+    SQLite-backed ciphertext cache with LRU eviction.
+
+    Args:
+        path (str): Database path (defaults to cache_path())
+        max_entries (int): Entries kept before the least recently used are evicted
+    """
+
+    def __init__(self, path=None, max_entries=1 << 22):
+        self.path = path or cache_path()
+        self.max_entries = max_entries
+        self.session = dict.fromkeys(COUNTERS, 0)
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        self._db = sqlite3.connect(self.path)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        with self._db:
+            self._db.executescript(SCHEMA)
+            self._version = algorithm_version()
+            if self._meta('version') != self._version:
+                self._db.execute("DELETE FROM entries")
+                self._db.execute("DELETE FROM meta")
+                self._set_meta('version', self._version)
+                self._set_meta('clock', 0)
+                for name in COUNTERS:
+                    self._set_meta(name, 0)
+
+    def _meta(self, name):
+        row = self._db.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, name, value):
+        self._db.execute("INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)", (name, value))
+
+    def _count(self, **increments):
+        for name, value in increments.items():
+            self.session[name] += value
+            self._db.execute("UPDATE meta SET value = value + ? WHERE name = ?", (value, name))
+
+    def _tick(self):
+        """Advance and return the use counter."""
+        self._db.execute("UPDATE meta SET value = value + 1 WHERE name = 'clock'")
+        return self._meta('clock')
+
+    def digests(self, cipher, rounds, key, plaintexts):
+        """
+        Compute the cache keys of a batch.
+
+        Args:
+            cipher (str): 'des' or 'aes'
+            rounds (int): Number of rounds
+            key (int): 56-bit DES or 128-bit AES key
+            plaintexts (list): Plaintext blocks as ints
+
+        Returns:
+            list: 16-byte digests
+        """
+        if cipher not in BLOCK_SIZES:
+            raise ValueError(f"Unknown cipher {cipher!r}")
+        block_bytes, key_bytes = BLOCK_SIZES[cipher]
+        prefix = hashlib.blake2b(digest_size=16)
+        prefix.update(self._version + cipher.encode('ascii') + rounds.to_bytes(2, 'big')
+                      + key.to_bytes(key_bytes, 'big'))
+        out = []
+        for plaintext in plaintexts:
+            h = prefix.copy()
+            h.update(plaintext.to_bytes(block_bytes, 'big'))
+            out.append(h.digest())
+        return out
+
+    def get_many(self, cipher, rounds, key, plaintexts):
+        """
+        Look up a batch.
+
+        Returns:
+            list: Ciphertext ints, None where not cached
+        """
+        digests = self.digests(cipher, rounds, key, plaintexts)
+        found = {}
+        with self._db:
+            clock = self._tick()
+            for i in range(0, len(digests), BATCH_SIZE):
+                chunk = digests[i:i + BATCH_SIZE]
+                marks = ','.join('?' * len(chunk))
+                found.update(self._db.execute(
+                    f"SELECT digest, ciphertext FROM entries WHERE digest IN ({marks})", chunk))
+                self._db.execute(
+                    f"UPDATE entries SET last_used = ? WHERE digest IN ({marks})", [clock] + chunk)
+            # Per lookup: a digest repeated in the batch is a hit each time
+            hits = sum(d in found for d in digests)
+            self._count(hits=hits, misses=len(digests) - hits)
+        return [int.from_bytes(found[d], 'big') if d in found else None for d in digests]
+
+    def put_many(self, cipher, rounds, key, plaintexts, ciphertexts):
+        """Store a batch, evicting least recently used entries over the cap."""
+        block_bytes = BLOCK_SIZES[cipher][0]
+        digests = self.digests(cipher, rounds, key, plaintexts)
+        with self._db:
+            clock = self._tick()
+            self._db.executemany(
+                "INSERT OR REPLACE INTO entries (digest, ciphertext, last_used) VALUES (?, ?, ?)",
+                ((d, c.to_bytes(block_bytes, 'big'), clock) for d, c in zip(digests, ciphertexts)))
+            self._count(puts=len(digests))
+            excess = self.entry_count() - self.max_entries
+            if excess > 0:
+                self._db.execute(
+                    "DELETE FROM entries WHERE digest IN "
+                    "(SELECT digest FROM entries ORDER BY last_used LIMIT ?)", (excess,))
+                self._count(evictions=excess)
+
+    def encrypt_many(self, cipher, rounds, key, plaintexts):
+        """
+        Encrypt a batch, computing and storing only the blocks not cached.
+
+        Args:
+            cipher (str): 'des' or 'aes'
+            rounds (int): Number of rounds
+            key (int): 56-bit DES or 128-bit AES key
+            plaintexts (list): Plaintext blocks as ints
+
+        Returns:
+            list: Ciphertext blocks as ints
+        """
+        plaintexts = list(plaintexts)
+        results = self.get_many(cipher, rounds, key, plaintexts)
+        missing = [i for i, c in enumerate(results) if c is None]
+        if missing:
+            todo = [plaintexts[i] for i in missing]
+            computed = _encrypt(cipher, rounds, key, todo)
+            self.put_many(cipher, rounds, key, todo, computed)
+            for i, c in zip(missing, computed):
+                results[i] = c
+        return results
+
+    def entry_count(self):
+        """Return the number of cached entries."""
+        return self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def stats(self):
+        """
+        Return hit-rate statistics.
+
+        Returns:
+            dict: 'entries', 'max_entries', 'session' and 'total' counters
+                (hits, misses, puts, evictions) with a 'hit_rate' in each
+        """
+        total = {name: self._meta(name) for name in COUNTERS}
+        for counters in (self.session, total):
+            lookups = counters['hits'] + counters['misses']
+            counters['hit_rate'] = counters['hits'] / lookups if lookups else 0.0
+        return {'entries': self.entry_count(), 'max_entries': self.max_entries,
+                'session': dict(self.session), 'total': total}
+
+    def clear(self):
+        """Remove every entry and reset the statistics."""
+        with self._db:
+            self._db.execute("DELETE FROM entries")
+            for name in COUNTERS:
+                self._set_meta(name, 0)
+        self.session = dict.fromkeys(COUNTERS, 0)
+
+    def close(self):
+        """Close the database."""
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main():
+    """Encrypt the assignment vectors and a dataset twice through the cache."""
+    parser = argparse.ArgumentParser(description="Persistent ciphertext cache")
+    parser.add_argument('--path', default=None)
+    parser.add_argument('--count', type=int, default=50000)
+    parser.add_argument('--clear', action='store_true', help="Empty the cache first")
+    args = parser.parse_args()
+
+    des_key = int("00100000000111101110001001011111110101101111110111111111", 2)
+    des_vectors = [int(p, 2) for p in (
+        "1011001100001111111100100001011011110100001101001011111100101110",
+        "1111001100001111111100100001011011110100001101001011111100101110",
+        "0011001100001111111100100001011011110100001101001011111100101110",
+    )]
+    dataset = [(0x0123456789ABCDEF * (i + 1)) & ((1 << 64) - 1) for i in range(args.count)]
+
+    with CiphertextCache(args.path) as cache:
+        if args.clear:
+            cache.clear()
+
+        print("\n" + "="*80)
+        print("CIPHERTEXT CACHE")
+        print("="*80)
+        print(f"\nDatabase: {cache.path}")
+
+        parts = cache.encrypt_many('des', 2, des_key, des_vectors)
+        for name, c in zip(('i', 'ii', 'iii'), parts):
+            print(f"DES part {name:<4} ciphertext: {c:016X}")
+
+        print(f"\n{'Pass':<8} {'Blocks':<10} {'Seconds':<10} {'Hit rate':<10}")
+        print("-" * 80)
+        for label in ('first', 'second'):
+            before = dict(cache.session)
+            start = time.perf_counter()
+            result = cache.encrypt_many('des', 16, des_key, dataset)
+            elapsed = time.perf_counter() - start
+            hits = cache.session['hits'] - before['hits']
+            print(f"{label:<8} {len(dataset):<10} {elapsed:<10.3f} {hits / len(dataset):<10.2%}")
+
+        expected = des_engine.des_encrypt_blocks(dataset, des_engine.generate_round_keys(des_key, 16))
+        stats = cache.stats()
+        print(f"\nResults match the engine: {'✓' if result == expected else '✗'}")
+        print(f"Entries: {stats['entries']} / {stats['max_entries']}")
+        print(f"Session hit rate: {stats['session']['hit_rate']:.2%}, "
+              f"total hit rate: {stats['total']['hit_rate']:.2%}, "
+              f"evictions: {stats['total']['evictions']}")
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,302 @@
+"""
+Plaintext/Ciphertext Dataset Generator
+Writes large fixed datasets of random (plaintext, ciphertext) pairs for a
+given cipher, round count and key, for attacks and statistics that need the
+same 2^20+ pairs over and over.
+
+A dataset is a data file plus a JSON header next to it (<path>.json) that
+records the cipher, rounds, key fingerprint, seed and count. The data is
+either a .npy file or a raw file; in both, record i is plaintext i followed
+by ciphertext i as big-endian block bytes, and open_dataset() maps it back
+with np.memmap without copying:
+
+    DES: (count, 2) array of '>u8' blocks
+    AES: (count, 2, 16) array of uint8 state bytes (state_to_hex() order)
+
+The file is preallocated and filled in fixed-size chunks by a process pool,
+each worker writing its chunk straight into the mapped file. Every chunk's
+plaintexts come from a seed stream derived from (seed, chunk index), so the
+file is byte-identical for a given seed whatever the number of workers.
+Completed chunks are recorded in the header, so an interrupted run resumes
+where it stopped.
+
+Usage:
+
+    python dataset_generator.py des2.npy --cipher des --rounds 2 \\
+        --key 201EE25FD6FDFF --log-count 24
+
+Requires NumPy.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import time
+from multiprocessing import Pool
+
+import numpy as np
+
+import aes_batch
+import aes_engine
+import des_batch
+import des_engine
+
+
+FORMAT_VERSION = 1
+
+# Per cipher: (block bytes, key bits)
+CIPHER_SIZES = {
+    'des': (8, 56),
+    'aes': (16, 128),
+}
+
+LAYOUTS = ('npy', 'raw')
+
+
+def header_path(path):
+    """Return the path of the JSON header of a dataset."""
+    return path + '.json'
+
+
+def key_fingerprint(cipher, key):
+    """
+    Identify a key without storing it.
+
+    Args:
+        cipher (str): 'des' or 'aes'
+        key (int): Cipher key
+
+    Returns:
+        str: First 16 hex digits of SHA-256 over the cipher name and key
+    """
+    key_bytes = key.to_bytes(CIPHER_SIZES[cipher][1] // 8, 'big')
+    return hashlib.sha256(cipher.encode('ascii') + b':' + key_bytes).hexdigest()[:16]
+
+
+def record_layout(cipher, count):
+    """
+    Return the array dtype and shape of a dataset.
+
+    Returns:
+        tuple: (numpy dtype, shape)
+    """
+    if cipher == 'des':
+        return np.dtype('>u8'), (count, 2)
+    return np.dtype(np.uint8), (count, 2, CIPHER_SIZES[cipher][0])
+
+
+def map_data(path, header, mode='r'):
+    """
+    Memory-map the data file of a dataset.
+
+    Args:
+        path (str): Data file path
+        header (dict): Dataset header
+        mode (str): 'r' for read-only, 'r+' to write chunks
+
+    Returns:
+        numpy.memmap: Records as described by record_layout()
+    """
+    dtype, shape = record_layout(header['cipher'], header['count'])
+    if header['layout'] == 'npy':
+        data = np.load(path, mmap_mode=mode)
+        if data.dtype != dtype or data.shape != shape:
+            raise ValueError(f"{path} does not match its header")
+        return data
+    return np.memmap(path, dtype=dtype, mode=mode, shape=shape)
+
+
+def chunk_plaintexts(cipher, seed, chunk_index, size):
+    """
+    Draw the plaintexts of one chunk.
+
+    Args:
+        cipher (str): 'des' or 'aes'
+        seed (int): Dataset seed
+        chunk_index (int): Chunk number
+        size (int): Number of plaintexts
+
+    Returns:
+        numpy.ndarray: uint64 blocks (DES) or (size, 16) uint8 states (AES)
+    """
+    rng = np.random.default_rng([seed, chunk_index])
+    if cipher == 'des':
+        return des_batch.random_blocks(rng, size)
+    return aes_batch.random_states(rng, size)
+
+
+def generate_chunk(args):
+    """
+    Encrypt one chunk and write it into the mapped data file (runs in a worker).
+
+    Args:
+        args (tuple): (path, header, key, chunk_index)
+
+    Returns:
+        int: The chunk index
+    """
+    path, header, key, chunk_index = args
+    cipher, rounds = header['cipher'], header['rounds']
+    start = chunk_index * header['chunk_size']
+    size = min(header['chunk_size'], header['count'] - start)
+
+    plaintexts = chunk_plaintexts(cipher, header['seed'], chunk_index, size)
+    if cipher == 'des':
+        round_keys = des_engine.generate_round_keys(key, rounds)
+        ciphertexts = des_batch.des_encrypt_array(plaintexts, round_keys)
+    else:
+        key_bytes = aes_batch.round_key_bytes(aes_engine.expand_key(key, rounds))
+        ciphertexts = aes_batch.aes_encrypt_array(plaintexts, key_bytes)
+
+    data = map_data(path, header, 'r+')
+    data[start:start + size, 0] = plaintexts
+    data[start:start + size, 1] = ciphertexts
+    data.flush()
+    del data
+    return chunk_index
+
+
+def write_header(path, header):
+    """Atomically write the JSON header of a dataset."""
+    tmp_path = header_path(path) + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(header, f, indent=2)
+    os.replace(tmp_path, header_path(path))
+
+
+def read_header(path):
+    """Read the JSON header of a dataset."""
+    with open(header_path(path)) as f:
+        return json.load(f)
+
+
+def _allocate(path, header):
+    """Create the data file at its full size."""
+    dtype, shape = record_layout(header['cipher'], header['count'])
+    if header['layout'] == 'npy':
+        data = np.lib.format.open_memmap(path, mode='w+', dtype=dtype, shape=shape)
+    else:
+        data = np.memmap(path, dtype=dtype, mode='w+', shape=shape)
+    data.flush()
+    del data
+
+
+def generate_dataset(path, cipher='des', rounds=2, key=0, count=1 << 20, seed=0,
+                     layout='npy', workers=None, chunk_size=1 << 16,
+                     checkpoint_interval=5.0):
+    """
+    Generate (or resume) a plaintext/ciphertext dataset.
+
+    Args:
+        path (str): Data file path (the header goes to path + '.json')
+        cipher (str): 'des' or 'aes'
+        rounds (int): Number of rounds
+        key (int): 56-bit DES or 128-bit AES key
+        count (int): Number of pairs
+        seed (int): Seed for the plaintexts
+        layout (str): 'npy' or 'raw'
+        workers (int): Worker processes (defaults to the CPU count)
+        chunk_size (int): Pairs per chunk (part of the dataset identity)
+        checkpoint_interval (float): Minimum seconds between header updates
+
+    Returns:
+        dict: The final header
+    """
+    if cipher not in CIPHER_SIZES:
+        raise ValueError(f"Unknown cipher {cipher!r}")
+    if layout not in LAYOUTS:
+        raise ValueError(f"Unknown layout {layout!r}")
+
+    header = {
+        'format_version': FORMAT_VERSION,
+        'cipher': cipher,
+        'rounds': rounds,
+        'key_fingerprint': key_fingerprint(cipher, key),
+        'seed': seed,
+        'count': count,
+        'chunk_size': chunk_size,
+        'layout': layout,
+        'record': 'plaintext, ciphertext (big-endian block bytes)',
+    }
+
+    completed = set()
+    if os.path.exists(header_path(path)) and os.path.exists(path):
+        existing = read_header(path)
+        identity = {k: v for k, v in existing.items() if k in header}
+        if identity != header:
+            raise ValueError(f"{path} holds a different dataset; remove it to regenerate")
+        completed = set(existing['completed'])
+    else:
+        _allocate(path, header)
+
+    chunks = range((count + chunk_size - 1) // chunk_size)
+    jobs = [(path, header, key, i) for i in chunks if i not in completed]
+
+    def save():
+        write_header(path, dict(header, completed=sorted(completed),
+                                complete=len(completed) == len(chunks)))
+
+    save()
+    last_save = time.monotonic()
+    with Pool(workers) as pool:
+        for chunk_index in pool.imap_unordered(generate_chunk, jobs):
+            completed.add(chunk_index)
+            if time.monotonic() - last_save >= checkpoint_interval:
+                save()
+                last_save = time.monotonic()
+    save()
+    return read_header(path)
+
+
+def open_dataset(path, allow_partial=False):
+    """
+    Map a dataset for reading without copying it.
+
+    Args:
+        path (str): Data file path
+        allow_partial (bool): Also open an unfinished dataset (pairs in
+            chunks not listed as completed are zero)
+
+    Returns:
+        tuple: (header dict, read-only memmap of the records)
+    """
+    header = read_header(path)
+    if header['format_version'] != FORMAT_VERSION:
+        raise ValueError(f"{path} has format version {header['format_version']}")
+    if not header['complete'] and not allow_partial:
+        raise ValueError(f"{path} is incomplete; run the generator again to resume")
+    return header, map_data(path, header)
+
+
+def main():
+    """Parse command-line options and generate a dataset."""
+    parser = argparse.ArgumentParser(description="Plaintext/ciphertext dataset generator")
+    parser.add_argument('path', help="Data file (.npy or raw)")
+    parser.add_argument('--cipher', choices=sorted(CIPHER_SIZES), default='des')
+    parser.add_argument('--rounds', type=int, default=2)
+    parser.add_argument('--key', required=True, help="Key in hex (56-bit DES, 128-bit AES)")
+    parser.add_argument('--log-count', type=int, default=20, help="Generate 2^N pairs")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--layout', choices=LAYOUTS, default='npy')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--chunk-size', type=int, default=1 << 16)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    header = generate_dataset(args.path, args.cipher, args.rounds, int(args.key, 16),
+                              1 << args.log_count, args.seed, args.layout,
+                              args.workers, args.chunk_size)
+    elapsed = time.perf_counter() - start
+
+    print("\n" + "="*80)
+    print("DATASET GENERATED")
+    print("="*80)
+    for name in ('cipher', 'rounds', 'key_fingerprint', 'seed', 'count', 'layout'):
+        print(f"{name:<17} {header[name]}")
+    print(f"{'file':<17} {args.path} ({os.path.getsize(args.path)} bytes)")
+    print(f"Elapsed: {elapsed:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
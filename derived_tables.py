@@ -0,0 +1,516 @@
+"""
+Derived Table Store
+Builds the lookup tables used by the fast DES and AES engines (SP boxes,
+byte-chunk permutation tables, T-tables, GF(2^8) log tables) once, writes them
+to a versioned binary file and memory-maps that file lazily on first use.
+
+The file is checksummed against the source tables in des_tables.py and
+aes_tables.py and is rebuilt automatically whenever those tables change.
+
+Run this module directly to (re)build the store:
+
+    python derived_tables.py [--force]
+"""
+
+import hashlib
+import mmap
+import os
+import struct
+import sys
+
+import des_tables
+import aes_tables
+
+
+# Bump whenever the layout or the contents of a derived table change
+FORMAT_VERSION = 1
+
+MAGIC = b'DTBL'
+
+# Header: magic, format version, entry count, SHA-256 of the source tables
+HEADER = struct.Struct('<4sII32s')
+
+# Directory entry: name, typecode, number of dimensions, shape (up to 2),
+# byte offset of the data from the start of the file
+ENTRY = struct.Struct('<24scBIIQ')
+
+ITEM_SIZES = {'B': 1, 'I': 4, 'Q': 8}
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            '.derived_tables', 'derived_tables.bin')
+
+# Environment variable that overrides the location of the store
+PATH_ENV_VAR = 'DERIVED_TABLES_PATH'
+
+
+def source_checksum():
+    """
+    Compute the checksum of every source table the store is derived from.
+
+    Returns:
+        bytes: 32-byte SHA-256 digest
+    """
+    sources = (
+        FORMAT_VERSION,
+        des_tables.IP, des_tables.FP, des_tables.E, des_tables.P,
+        des_tables.PC1, des_tables.PC2, des_tables.SHIFT_SCHEDULE,
+        des_tables.S_BOXES,
+        aes_tables.SBOX, aes_tables.MIX_COLUMNS_MATRIX, aes_tables.AES_POLYNOMIAL,
+    )
+    return hashlib.sha256(repr(sources).encode('ascii')).digest()
+
+
+# =============================================================================
+# Table builders
+# =============================================================================
+
+def build_chunk_table(table, in_bits):
+    """
+    Build byte-chunk lookup tables for a DES bit-selection table.
+
+    The input block is split into 8-bit chunks (most significant first). For
+    each chunk and each of its 256 values the table holds the output bits that
+    chunk contributes, so a full permutation becomes one lookup and OR per
+    input byte.
+
+    Args:
+        table (list): Selection table (1-indexed input positions)
+        in_bits (int): Width of the input block (multiple of 8)
+
+    Returns:
+        list: (in_bits // 8) rows of 256 output integers
+    """
+    out_bits = len(table)
+    chunks = []
+    for chunk in range(in_bits // 8):
+        row = [0] * 256
+        for value in range(256):
+            out = 0
+            for out_pos, in_pos in enumerate(table):
+                offset = in_pos - 1 - chunk * 8
+                if 0 <= offset < 8 and (value >> (7 - offset)) & 1:
+                    out |= 1 << (out_bits - 1 - out_pos)
+            row[value] = out
+        chunks.append(row)
+    return chunks
+
+
+def build_sp_boxes(s_boxes, p_table):
+    """
+    Build combined S-box + P permutation tables.
+
+    SP[i][v] is the 32-bit P-permuted output of S-box i for the 6-bit input v
+    (first bit most significant, as in the standard row/column convention).
+
+    Args:
+        s_boxes (list): Eight 4x16 S-boxes
+        p_table (list): 32-entry P permutation table
+
+    Returns:
+        list: 8 rows of 64 32-bit integers
+    """
+    sp = []
+    for i, s_box in enumerate(s_boxes):
+        row = [0] * 64
+        for value in range(64):
+            s_row = ((value >> 4) & 0x02) | (value & 0x01)
+            s_col = (value >> 1) & 0x0F
+            pre_p = s_box[s_row][s_col] << (28 - 4 * i)
+            out = 0
+            for out_pos, in_pos in enumerate(p_table):
+                if (pre_p >> (32 - in_pos)) & 1:
+                    out |= 1 << (31 - out_pos)
+            row[value] = out
+        sp.append(row)
+    return sp
+
+
+def build_gf_tables(polynomial):
+    """
+    Build GF(2^8) exponent and logarithm tables with generator 0x03.
+
+    The exponent table is doubled in length so that exp[log[a] + log[b]]
+    needs no reduction modulo 255. log[0] is unused and left as 0.
+
+    Args:
+        polynomial (int): Irreducible polynomial (0x11b for AES)
+
+    Returns:
+        tuple: (exp_table, log_table) lists of 510 and 256 entries
+    """
+    exp_table = [0] * 510
+    log_table = [0] * 256
+    value = 1
+    for power in range(255):
+        exp_table[power] = value
+        exp_table[power + 255] = value
+        log_table[value] = power
+        # Multiply by the generator x + 1
+        doubled = value << 1
+        if doubled & 0x100:
+            doubled ^= polynomial
+        value = doubled ^ value
+    return exp_table, log_table
+
+
+def _gf_mul(a, b, exp_table, log_table):
+    if a == 0 or b == 0:
+        return 0
+    return exp_table[log_table[a] + log_table[b]]
+
+
+def build_t_tables(sbox, matrix, exp_table, log_table):
+    """
+    Build AES T-tables combining SubBytes and MixColumns.
+
+    T[j][x] is the column contribution of byte x in row j of the input column,
+    packed big-endian (row 0 in the most significant byte).
+
+    Args:
+        sbox (list): Flat 256-entry S-box
+        matrix (list): 4x4 MixColumns matrix
+        exp_table (list): GF(2^8) exponent table
+        log_table (list): GF(2^8) logarithm table
+
+    Returns:
+        list: 4 rows of 256 32-bit integers
+    """
+    tables = []
+    for j in range(4):
+        row = [0] * 256
+        for x in range(256):
+            s = sbox[x]
+            word = 0
+            for r in range(4):
+                word = (word << 8) | _gf_mul(matrix[r][j], s, exp_table, log_table)
+            row[x] = word
+        tables.append(row)
+    return tables
+
+
+def inverse_mix_columns_matrix(matrix, exp_table, log_table):
+    """
+    Invert a 4x4 MixColumns matrix over GF(2^8) by Gauss-Jordan elimination.
+
+    Args:
+        matrix (list): 4x4 matrix
+        exp_table (list): GF(2^8) exponent table
+        log_table (list): GF(2^8) logarithm table
+
+    Returns:
+        list: 4x4 inverse matrix
+
+    Raises:
+        ValueError: If the matrix is singular over GF(2^8)
+    """
+    n = len(matrix)
+    work = [list(row) + [1 if i == j else 0 for j in range(n)]
+            for i, row in enumerate(matrix)]
+    for col in range(n):
+        pivot = next((r for r in range(col, n) if work[r][col]), None)
+        if pivot is None:
+            raise ValueError("MixColumns matrix is not invertible over GF(2^8)")
+        work[col], work[pivot] = work[pivot], work[col]
+        inv = exp_table[255 - log_table[work[col][col]]]
+        work[col] = [_gf_mul(v, inv, exp_table, log_table) for v in work[col]]
+        for r in range(n):
+            if r != col and work[r][col]:
+                factor = work[r][col]
+                work[r] = [v ^ _gf_mul(factor, p, exp_table, log_table)
+                           for v, p in zip(work[r], work[col])]
+    return [row[n:] for row in work]
+
+
+def build_all_tables():
+    """
+    Build every derived table from the current source tables.
+
+    Returns:
+        dict: name -> (typecode, shape, flat list of values)
+    """
+    tables = {}
+
+    def add(name, typecode, rows):
+        if isinstance(rows[0], list):
+            shape = (len(rows), len(rows[0]))
+            flat = [v for row in rows for v in row]
+        else:
+            shape = (len(rows),)
+            flat = list(rows)
+        tables[name] = (typecode, shape, flat)
+
+    # DES
+    add('des_ip', 'Q', build_chunk_table(des_tables.IP, 64))
+    add('des_fp', 'Q', build_chunk_table(des_tables.FP, 64))
+    add('des_e', 'Q', build_chunk_table(des_tables.E, 32))
+    add('des_pc2', 'Q', build_chunk_table(des_tables.PC2, 56))
+    add('des_pc1', 'Q', build_chunk_table(des_tables.PC1, 64))
+    add('des_sp', 'I', build_sp_boxes(des_tables.S_BOXES, des_tables.P))
+
+    # AES
+    sbox = [aes_tables.sbox_lookup(x) for x in range(256)]
+    inv_sbox = [0] * 256
+    for x, s in enumerate(sbox):
+        inv_sbox[s] = x
+    exp_table, log_table = build_gf_tables(aes_tables.AES_POLYNOMIAL)
+    inv_matrix = inverse_mix_columns_matrix(aes_tables.MIX_COLUMNS_MATRIX,
+                                            exp_table, log_table)
+    add('aes_sbox', 'B', sbox)
+    add('aes_inv_sbox', 'B', inv_sbox)
+    add('gf_exp', 'B', exp_table)
+    add('gf_log', 'B', log_table)
+    add('aes_te', 'I', build_t_tables(sbox, aes_tables.MIX_COLUMNS_MATRIX,
+                                      exp_table, log_table))
+    add('aes_td', 'I', build_t_tables(inv_sbox, inv_matrix, exp_table, log_table))
+    # InvMixColumns without the inverse S-box, for the equivalent decryption key schedule
+    add('aes_imc', 'I', build_t_tables(list(range(256)), inv_matrix,
+                                       exp_table, log_table))
+    return tables
+
+
+# =============================================================================
+# Store file
+# =============================================================================
+
+def store_path():
+    """Return the path of the derived table store file."""
+    return os.environ.get(PATH_ENV_VAR, DEFAULT_PATH)
+
+
+def write_store(path=None):
+    """
+    Build all derived tables and write them atomically to the store file.
+
+    Args:
+        path (str): Destination path (defaults to store_path())
+
+    Returns:
+        str: Path of the written file
+    """
+    path = path or store_path()
+    tables = build_all_tables()
+
+    offset = HEADER.size + ENTRY.size * len(tables)
+    entries = []
+    blobs = []
+    for name, (typecode, shape, flat) in sorted(tables.items()):
+        offset = (offset + 7) & ~7
+        dims = list(shape) + [0] * (2 - len(shape))
+        entries.append(ENTRY.pack(name.encode('ascii'), typecode.encode('ascii'),
+                                  len(shape), dims[0], dims[1], offset))
+        blob = struct.pack(f'<{len(flat)}{typecode}', *flat)
+        blobs.append((offset, blob))
+        offset += len(blob)
+
+    data = bytearray(offset)
+    HEADER.pack_into(data, 0, MAGIC, FORMAT_VERSION, len(tables), source_checksum())
+    for i, entry in enumerate(entries):
+        start = HEADER.size + i * ENTRY.size
+        data[start:start + ENTRY.size] = entry
+    for start, blob in blobs:
+        data[start:start + len(blob)] = blob
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return path
+
+
+def _read_header(buf):
+    """Return (version, count, checksum) or None if the buffer is not a store."""
+    if len(buf) < HEADER.size:
+        return None
+    magic, version, count, checksum = HEADER.unpack_from(buf, 0)
+    if magic != MAGIC:
+        return None
+    return version, count, checksum
+
+
+def is_current(path=None):
+    """
+    Check whether the store file exists and matches the current source tables.
+
+    Args:
+        path (str): Store path (defaults to store_path())
+
+    Returns:
+        bool: True if the file can be used as is
+    """
+    path = path or store_path()
+    try:
+        with open(path, 'rb') as f:
+            header = _read_header(f.read(HEADER.size))
+    except OSError:
+        return False
+    return (header is not None and header[0] == FORMAT_VERSION
+            and header[2] == source_checksum())
+
+
+class TableStore:
+    """
+    Read-only view of a memory-mapped derived table store.
+
+    Tables are exposed as memoryviews (cast to their typecode and shape) that
+    point straight into the mapping, so loading costs no parsing or copying.
+
+    Args:
+        path (str): Store file to map
+        buffer (object): Use this buffer (e.g. a shared memory block holding a
+            copy of the file) instead of mapping the file
+    """
+
+    def __init__(self, path, buffer=None):
+        self.path = path
+        if buffer is None:
+            with open(path, 'rb') as f:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self._mmap = buffer
+        header = _read_header(self._mmap)
+        if header is None:
+            raise ValueError(f"{path} is not a derived table store")
+        self.version, count, self.checksum = header
+
+        self._entries = {}
+        for i in range(count):
+            name, typecode, ndim, dim0, dim1, offset = ENTRY.unpack_from(
+                self._mmap, HEADER.size + i * ENTRY.size)
+            shape = (dim0, dim1)[:ndim]
+            self._entries[name.rstrip(b'\0').decode('ascii')] = (
+                typecode.decode('ascii'), shape, offset)
+        self._views = {}
+
+    def names(self):
+        """Return the names of all stored tables."""
+        return sorted(self._entries)
+
+    def shape(self, name):
+        """Return the shape tuple of a stored table."""
+        return self._entries[name][1]
+
+    def view(self, name):
+        """
+        Return a flat memoryview of a stored table.
+
+        Args:
+            name (str): Table name
+
+        Returns:
+            memoryview: Flat view cast to the table's typecode
+        """
+        if name not in self._views:
+            typecode, shape, offset = self._entries[name]
+            count = 1
+            for dim in shape:
+                count *= dim
+            size = count * ITEM_SIZES[typecode]
+            raw = memoryview(self._mmap)[offset:offset + size]
+            self._views[name] = raw.cast(typecode)
+        return self._views[name]
+
+    def rows(self, name):
+        """
+        Return a stored table as Python lists (one list per row for 2-D tables).
+
+        Plain lists index fastest from pure Python code, so engines copy the
+        tables they use on their hot path once with this method.
+
+        Args:
+            name (str): Table name
+
+        Returns:
+            list: Flat list or list of row lists
+        """
+        flat = self.view(name).tolist()
+        shape = self.shape(name)
+        if len(shape) == 1:
+            return flat
+        width = shape[1]
+        return [flat[i:i + width] for i in range(0, len(flat), width)]
+
+    def array(self, name):
+        """
+        Return a stored table as a zero-copy NumPy array with its shape.
+
+        Args:
+            name (str): Table name
+
+        Returns:
+            numpy.ndarray: Read-only array backed by the mapping
+        """
+        import numpy as np
+        typecode, shape, _ = self._entries[name]
+        dtype = {'B': np.uint8, 'I': np.uint32, 'Q': np.uint64}[typecode]
+        return np.frombuffer(self.view(name), dtype=dtype).reshape(shape)
+
+
+_store = None
+
+
+def get_store():
+    """
+    Return the process-wide table store, building or rebuilding it if needed.
+
+    The file is only opened on the first call, and is regenerated when it is
+    missing, from an older format version, or built from different source
+    tables.
+
+    Returns:
+        TableStore: Memory-mapped store
+    """
+    global _store
+    if _store is None:
+        path = store_path()
+        if not is_current(path):
+            write_store(path)
+        _store = TableStore(path)
+    return _store
+
+
+def set_store(store):
+    """
+    Install the process-wide table store, e.g. one attached to shared memory.
+
+    Args:
+        store (TableStore): Store returned by get_store() from now on
+    """
+    global _store
+    _store = store
+
+
+def get_table(name):
+    """
+    Return one derived table as a flat memoryview.
+
+    Args:
+        name (str): Table name (see TableStore.names())
+
+    Returns:
+        memoryview: Flat view into the mapped store
+    """
+    return get_store().view(name)
+
+
+def main():
+    """Build the derived table store and print a summary."""
+    path = store_path()
+    if '--force' in sys.argv[1:] or not is_current(path):
+        write_store(path)
+        print(f"Built derived table store: {path}")
+    else:
+        print(f"Derived table store is up to date: {path}")
+
+    store = TableStore(path)
+    print(f"Format version: {store.version}")
+    print(f"Source checksum: {store.checksum.hex()}")
+    print(f"\n{'Table':<16} {'Type':<6} {'Shape':<12}")
+    print("-" * 36)
+    for name in store.names():
+        typecode = store._entries[name][0]
+        print(f"{name:<16} {typecode:<6} {str(store.shape(name)):<12}")
+
+
+if __name__ == "__main__":
+    main()
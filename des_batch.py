@@ -0,0 +1,202 @@
+"""
+Vectorized N-Round DES
+NumPy versions of the des_engine.py operations that work on whole arrays of
+blocks at once. Blocks are uint64 arrays (bit 1 of the block is the most
+significant bit) and halves are uint64 arrays holding 32-bit values.
+
+Requires NumPy.
+"""
+
+import numpy as np
+
+from derived_tables import get_store
+from des_tables import SHIFT_SCHEDULE
+
+
+MASK_28 = np.uint64(0xFFFFFFF)
+MASK_32 = np.uint64(0xFFFFFFFF)
+
+_arrays = None
+
+
+def load_arrays():
+    """
+    Return the DES lookup tables as NumPy arrays, loading them on first use.
+
+    Returns:
+        dict: 'ip', 'fp', 'e', 'pc2' chunk tables (uint64) and 'sp' (uint64)
+    """
+    global _arrays
+    if _arrays is None:
+        store = get_store()
+        _arrays = {
+            'ip': store.array('des_ip'),
+            'fp': store.array('des_fp'),
+            'e': store.array('des_e'),
+            'pc2': store.array('des_pc2'),
+            'sp': store.array('des_sp').astype(np.uint64),
+        }
+    return _arrays
+
+
+def reset_arrays():
+    """Drop the loaded arrays so the next load_arrays() reads the current table store."""
+    global _arrays
+    _arrays = None
+
+
+def apply_chunk_table(values, table, in_bits):
+    """
+    Apply a byte-chunk permutation table to an array of blocks.
+
+    Args:
+        values (numpy.ndarray): uint64 input blocks
+        table (numpy.ndarray): (in_bits // 8, 256) chunk table
+        in_bits (int): Width of the input blocks
+
+    Returns:
+        numpy.ndarray: uint64 permuted blocks
+    """
+    values = np.asarray(values, dtype=np.uint64)
+    out = np.zeros(values.shape, dtype=np.uint64)
+    for chunk in range(in_bits // 8):
+        shift = np.uint64(in_bits - 8 - 8 * chunk)
+        out |= table[chunk][((values >> shift) & np.uint64(0xFF)).astype(np.intp)]
+    return out
+
+
+def initial_permutation(blocks):
+    """Apply IP to an array of 64-bit blocks."""
+    return apply_chunk_table(blocks, load_arrays()['ip'], 64)
+
+
+def final_permutation(blocks):
+    """Apply FP to an array of 64-bit blocks."""
+    return apply_chunk_table(blocks, load_arrays()['fp'], 64)
+
+
+def expand(right):
+    """Apply the E expansion to an array of 32-bit halves (48-bit results)."""
+    return apply_chunk_table(right, load_arrays()['e'], 32)
+
+
+def s_box_inputs(expanded_xor_key):
+    """
+    Split 48-bit values into their eight 6-bit S-box inputs.
+
+    Args:
+        expanded_xor_key (numpy.ndarray): uint64 48-bit values
+
+    Returns:
+        numpy.ndarray: (8, N) intp array, row i holding the inputs of S-box i + 1
+    """
+    x = np.asarray(expanded_xor_key, dtype=np.uint64)
+    return np.stack([((x >> np.uint64(42 - 6 * i)) & np.uint64(63)).astype(np.intp)
+                     for i in range(8)])
+
+
+def sp_lookup(inputs):
+    """
+    Combined S-box and P permutation for (8, N) S-box inputs.
+
+    Returns:
+        numpy.ndarray: uint64 32-bit round function outputs
+    """
+    sp = load_arrays()['sp']
+    out = sp[0][inputs[0]]
+    for i in range(1, 8):
+        out = out | sp[i][inputs[i]]
+    return out
+
+
+def f_function(right, round_key):
+    """
+    DES round function over arrays.
+
+    Args:
+        right (numpy.ndarray): uint64 32-bit right halves
+        round_key (int or numpy.ndarray): 48-bit round key(s)
+
+    Returns:
+        numpy.ndarray: uint64 32-bit outputs
+    """
+    return sp_lookup(s_box_inputs(expand(right) ^ np.asarray(round_key, dtype=np.uint64)))
+
+
+def split_halves(blocks):
+    """Split 64-bit blocks into (left, right) 32-bit halves."""
+    return blocks >> np.uint64(32), blocks & MASK_32
+
+
+def join_swapped(left, right):
+    """Join halves as R||L (the final DES swap)."""
+    return (right << np.uint64(32)) | left
+
+
+def generate_round_keys(keys, rounds=2):
+    """
+    Generate the round keys of many 56-bit keys at once.
+
+    Args:
+        keys (numpy.ndarray): uint64 56-bit keys
+        rounds (int): Number of rounds
+
+    Returns:
+        numpy.ndarray: (rounds, N) uint64 array, row r holding K(r + 1) of
+            every key
+    """
+    keys = np.asarray(keys, dtype=np.uint64)
+    pc2 = load_arrays()['pc2']
+    c = keys >> np.uint64(28)
+    d = keys & MASK_28
+    round_keys = np.empty((rounds,) + keys.shape, dtype=np.uint64)
+    for r in range(rounds):
+        shift = np.uint64(SHIFT_SCHEDULE[r % len(SHIFT_SCHEDULE)])
+        back = np.uint64(28) - shift
+        c = ((c << shift) | (c >> back)) & MASK_28
+        d = ((d << shift) | (d >> back)) & MASK_28
+        round_keys[r] = apply_chunk_table((c << np.uint64(28)) | d, pc2, 56)
+    return round_keys
+
+
+def des_encrypt_array(blocks, round_keys):
+    """
+    Encrypt an array of blocks under one key schedule, or one per block.
+
+    Args:
+        blocks (numpy.ndarray): uint64 plaintext blocks
+        round_keys (list or numpy.ndarray): 48-bit round keys from
+            des_engine.generate_round_keys(), or a (rounds, N) array from
+            generate_round_keys() giving each block its own key
+
+    Returns:
+        numpy.ndarray: uint64 ciphertext blocks
+    """
+    left, right = split_halves(initial_permutation(blocks))
+    for k in round_keys:
+        left, right = right, left ^ f_function(right, k)
+    return final_permutation(join_swapped(left, right))
+
+
+def des_decrypt_array(blocks, round_keys):
+    """Decrypt an array of blocks under one key schedule or one per block (encryption order keys)."""
+    return des_encrypt_array(blocks, list(round_keys)[::-1])
+
+
+def random_blocks(rng, count, bits=64):
+    """
+    Draw uniformly random blocks of up to 64 bits.
+
+    Args:
+        rng (numpy.random.Generator): Random generator
+        count (int): Number of blocks
+        bits (int): Block width
+
+    Returns:
+        numpy.ndarray: uint64 blocks
+    """
+    blocks = rng.integers(0, 1 << 32, size=count, dtype=np.uint64) << np.uint64(32)
+    blocks |= rng.integers(0, 1 << 32, size=count, dtype=np.uint64)
+    if bits < 64:
+        blocks >>= np.uint64(64 - bits)
+    return blocks
@@ -0,0 +1,206 @@
+"""
+Fast N-Round DES Engine
+Integer-based DES with a configurable number of rounds, driven by the lookup
+tables in derived_tables.py. Produces the same results as des_2round.py for two
+rounds. The tables come from des_tables.py, so this is the repository's DES
+variant (its S-boxes differ from FIPS 46-3), not standard DES, at any round
+count.
+
+Blocks and keys are Python ints whose most significant bit is bit 1 of the
+corresponding binary string used by des_2round.py.
+"""
+
+from derived_tables import get_store
+from des_tables import SHIFT_SCHEDULE
+
+
+MASK_28 = (1 << 28) - 1
+MASK_32 = (1 << 32) - 1
+
+_tables = None
+
+
+def load_tables():
+    """
+    Return the DES lookup tables as Python lists, loading them on first use.
+
+    Returns:
+        tuple: (ip, fp, e, pc1, pc2, sp) chunk/SP tables from the derived store
+    """
+    global _tables
+    if _tables is None:
+        store = get_store()
+        _tables = tuple(store.rows(name) for name in
+                        ('des_ip', 'des_fp', 'des_e', 'des_pc1', 'des_pc2', 'des_sp'))
+    return _tables
+
+
+def bits_to_int(bits):
+    """Convert a binary string to an int."""
+    return int(bits, 2)
+
+
+def int_to_bits(value, width):
+    """Convert an int to a zero-padded binary string of the given width."""
+    return format(value, f'0{width}b')
+
+
+def apply_chunk_table(value, chunk_table, in_bits):
+    """
+    Apply a byte-chunk permutation table to an int.
+
+    Args:
+        value (int): Input block
+        chunk_table (list): Rows of 256 entries, one row per input byte
+        in_bits (int): Width of the input block
+
+    Returns:
+        int: Permuted block
+    """
+    out = 0
+    shift = in_bits - 8
+    for row in chunk_table:
+        out |= row[(value >> shift) & 0xFF]
+        shift -= 8
+    return out
+
+
+def pc1(key_64):
+    """
+    Apply PC-1 to a 64-bit key (with parity bits) to get the 56-bit key.
+
+    Args:
+        key_64 (int): 64-bit key
+
+    Returns:
+        int: 56-bit key as used by generate_round_keys()
+    """
+    return apply_chunk_table(key_64, load_tables()[3], 64)
+
+
+def generate_round_keys(key_56, rounds=2, tables=None, shift_schedule=SHIFT_SCHEDULE):
+    """
+    Generate the round keys for N-round DES from a 56-bit key.
+
+    Args:
+        key_56 (int): 56-bit key (parity bits removed)
+        rounds (int): Number of rounds
+        tables (tuple): Tables in the load_tables() layout (defaults to the store)
+        shift_schedule (list): Left rotations per round
+
+    Returns:
+        list: 48-bit round keys K1..KN as ints
+    """
+    pc2 = (tables or load_tables())[4]
+    c = key_56 >> 28
+    d = key_56 & MASK_28
+    round_keys = []
+    for r in range(rounds):
+        shift = shift_schedule[r % len(shift_schedule)]
+        c = ((c << shift) | (c >> (28 - shift))) & MASK_28
+        d = ((d << shift) | (d >> (28 - shift))) & MASK_28
+        round_keys.append(apply_chunk_table((c << 28) | d, pc2, 56))
+    return round_keys
+
+
+def f_function(right_32, round_key_48):
+    """
+    DES round function on ints (expansion, key XOR, S-boxes and P).
+
+    Args:
+        right_32 (int): 32-bit right half
+        round_key_48 (int): 48-bit round key
+
+    Returns:
+        int: 32-bit output
+    """
+    _, _, e, _, _, sp = load_tables()
+    x = (e[0][right_32 >> 24] | e[1][(right_32 >> 16) & 0xFF]
+         | e[2][(right_32 >> 8) & 0xFF] | e[3][right_32 & 0xFF]) ^ round_key_48
+    return (sp[0][x >> 42] | sp[1][(x >> 36) & 63] | sp[2][(x >> 30) & 63]
+            | sp[3][(x >> 24) & 63] | sp[4][(x >> 18) & 63] | sp[5][(x >> 12) & 63]
+            | sp[6][(x >> 6) & 63] | sp[7][x & 63])
+
+
+def des_encrypt_blocks(blocks, round_keys, tables=None):
+    """
+    Encrypt many 64-bit blocks under one key schedule.
+
+    The tables and round keys are bound to locals once, so the per-block cost
+    is only the Feistel rounds themselves.
+
+    Args:
+        blocks (iterable): 64-bit plaintext blocks as ints
+        round_keys (list): Round keys from generate_round_keys()
+        tables (tuple): Tables in the load_tables() layout (defaults to the store)
+
+    Returns:
+        list: 64-bit ciphertext blocks as ints
+    """
+    ip, fp, e, _, _, sp = tables or load_tables()
+    ip0, ip1, ip2, ip3, ip4, ip5, ip6, ip7 = ip
+    fp0, fp1, fp2, fp3, fp4, fp5, fp6, fp7 = fp
+    e0, e1, e2, e3 = e
+    sp0, sp1, sp2, sp3, sp4, sp5, sp6, sp7 = sp
+
+    out = []
+    for block in blocks:
+        x = (ip0[block >> 56] | ip1[(block >> 48) & 0xFF] | ip2[(block >> 40) & 0xFF]
+             | ip3[(block >> 32) & 0xFF] | ip4[(block >> 24) & 0xFF]
+             | ip5[(block >> 16) & 0xFF] | ip6[(block >> 8) & 0xFF] | ip7[block & 0xFF])
+        left = x >> 32
+        right = x & MASK_32
+        for k in round_keys:
+            t = (e0[right >> 24] | e1[(right >> 16) & 0xFF]
+                 | e2[(right >> 8) & 0xFF] | e3[right & 0xFF]) ^ k
+            left, right = right, left ^ (
+                sp0[t >> 42] | sp1[(t >> 36) & 63] | sp2[(t >> 30) & 63]
+                | sp3[(t >> 24) & 63] | sp4[(t >> 18) & 63] | sp5[(t >> 12) & 63]
+                | sp6[(t >> 6) & 63] | sp7[t & 63])
+        # Final swap R||L, then FP
+        x = (right << 32) | left
+        out.append(fp0[x >> 56] | fp1[(x >> 48) & 0xFF] | fp2[(x >> 40) & 0xFF]
+                   | fp3[(x >> 32) & 0xFF] | fp4[(x >> 24) & 0xFF]
+                   | fp5[(x >> 16) & 0xFF] | fp6[(x >> 8) & 0xFF] | fp7[x & 0xFF])
+    return out
+
+
+def des_decrypt_blocks(blocks, round_keys, tables=None):
+    """
+    Decrypt many 64-bit blocks under one key schedule.
+
+    Args:
+        blocks (iterable): 64-bit ciphertext blocks as ints
+        round_keys (list): Round keys from generate_round_keys() (encryption order)
+        tables (tuple): Tables in the load_tables() layout (defaults to the store)
+
+    Returns:
+        list: 64-bit plaintext blocks as ints
+    """
+    return des_encrypt_blocks(blocks, round_keys[::-1], tables)
+
+
+def des_encrypt_block(block, round_keys):
+    """Encrypt a single 64-bit block (int) under the given round keys."""
+    return des_encrypt_blocks((block,), round_keys)[0]
+
+
+def des_decrypt_block(block, round_keys):
+    """Decrypt a single 64-bit block (int) under the given round keys."""
+    return des_encrypt_blocks((block,), round_keys[::-1])[0]
+
+
+def des_encrypt(plaintext_64bit, key_56bit, rounds=2):
+    """
+    Encrypt a binary-string block, mirroring des_2round.des_encrypt_2rounds().
+
+    Args:
+        plaintext_64bit (str): 64-bit plaintext (binary string)
+        key_56bit (str): 56-bit key (binary string, parity bits removed)
+        rounds (int): Number of rounds
+
+    Returns:
+        str: 64-bit ciphertext (binary string)
+    """
+    round_keys = generate_round_keys(bits_to_int(key_56bit), rounds)
+    return int_to_bits(des_encrypt_block(bits_to_int(plaintext_64bit), round_keys), 64)
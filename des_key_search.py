@@ -0,0 +1,343 @@
+"""
+Restricted Key-Space Search for N-Round DES
+Exhaustively searches the DES keys that agree with a base key outside an
+unknown-bit mask, against known (plaintext, ciphertext) pairs.
+
+- The 2^k keys (k = bits in the mask) are visited in Gray-code order, so
+  consecutive keys differ in one key bit. The key schedule is linear, so
+  each step XORs that bit's precomputed round-key difference (from
+  generate_round_keys() of the single bit) into the round keys instead of
+  recomputing them.
+- IP(C) = R_N || L_N is known for every pair, so the last two rounds are
+  checked S-box by S-box against it: the f output of round N - 1 must equal
+  L_{N-2} ^ L_N and that of round N must equal L_{N-1} ^ R_N, with the
+  expansion of L_N precomputed. Most keys are rejected by the first S-box.
+  Keys that survive the first pair are checked in full against the others.
+- The index space is cut into shards that run on a process pool. Finished
+  shards and found keys are checkpointed to a JSON file, so a killed run
+  resumes where it stopped.
+
+Usage:
+
+    python des_key_search.py --demo-bits 24 --rounds 2 --workers 4 \\
+        --checkpoint search.json
+
+    python des_key_search.py --base-key 201EE25FD6FDFF --mask FFFFFF \\
+        --pair B30FF216F434BF2E:1D4C3F4C6E8D2B1A --pair ...
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import time
+from multiprocessing import Pool
+
+import des_engine
+
+
+MAX_UNKNOWN_BITS = 36
+
+MASK_32 = (1 << 32) - 1
+MASK_56 = (1 << 56) - 1
+
+
+def mask_bits(mask):
+    """Return the positions (0 = least significant) of the set bits of a key mask."""
+    return [b for b in range(56) if (mask >> b) & 1]
+
+
+def deposit(value, bits):
+    """Scatter the low bits of value into the given key bit positions."""
+    key = 0
+    for j, b in enumerate(bits):
+        if (value >> j) & 1:
+            key |= 1 << b
+    return key
+
+
+def gray(index):
+    """Return the index-th Gray code."""
+    return index ^ (index >> 1)
+
+
+def bit_deltas(bits, rounds):
+    """
+    Round-key differences caused by flipping each unknown key bit.
+
+    Args:
+        bits (list): Unknown key bit positions
+        rounds (int): Number of rounds
+
+    Returns:
+        list: Per unknown bit, the list of round-key XOR differences
+    """
+    return [des_engine.generate_round_keys(1 << b, rounds) for b in bits]
+
+
+def prepare_pair(plaintext, ciphertext):
+    """
+    Precompute the key-independent values of one known pair.
+
+    Returns:
+        tuple: (L0, R0, L_N, R_N, E(L_N)) with E(L_N) as a 48-bit int
+    """
+    ip, _, e, _, _, _ = des_engine.load_tables()
+    x = des_engine.apply_chunk_table(plaintext, ip, 64)
+    y = des_engine.apply_chunk_table(ciphertext, ip, 64)
+    left_n = y & MASK_32
+    return x >> 32, x & MASK_32, left_n, y >> 32, des_engine.apply_chunk_table(left_n, e, 32)
+
+
+def sbox_output_masks():
+    """Return, per S-box, the mask of the f-output bits it produces (after P)."""
+    masks = []
+    for table in des_engine.load_tables()[5]:
+        mask = 0
+        for value in table:
+            mask |= value
+        masks.append(mask)
+    return masks
+
+
+def search_range(start, stop, base_key, bits, rounds, pairs):
+    """
+    Test the keys with Gray-code indices start..stop - 1.
+
+    Args:
+        start (int): First index
+        stop (int): End index (exclusive)
+        base_key (int): 56-bit key with the unknown bits cleared
+        bits (list): Unknown key bit positions
+        rounds (int): Number of rounds
+        pairs (list): (plaintext, ciphertext) ints; the first is used for the
+            S-box-level early abort
+
+    Returns:
+        list: Keys consistent with all pairs
+    """
+    _, _, e, _, _, sp = des_engine.load_tables()
+    e0, e1, e2, e3 = e
+    sp0, sp1, sp2, sp3, sp4, sp5, sp6, sp7 = sp
+    m0, m1, m2, m3, m4, m5, m6, m7 = sbox_output_masks()
+    deltas = bit_deltas(bits, rounds)
+    l0, r0, left_n, right_n, e_left_n = prepare_pair(*pairs[0])
+    others = pairs[1:]
+    if rounds == 1 and r0 != left_n:
+        return []
+
+    round_keys = des_engine.generate_round_keys(base_key | deposit(gray(start), bits), rounds)
+    inner = rounds - 2
+    found = []
+    for index in range(start, stop):
+        if index != start:
+            flip = deltas[(index & -index).bit_length() - 1]
+            for r in range(rounds):
+                round_keys[r] ^= flip[r]
+
+        # Rounds 1 .. N - 2 in full
+        left, right = l0, r0
+        for r in range(inner):
+            t = (e0[right >> 24] | e1[(right >> 16) & 0xFF]
+                 | e2[(right >> 8) & 0xFF] | e3[right & 0xFF]) ^ round_keys[r]
+            left, right = right, left ^ (
+                sp0[t >> 42] | sp1[(t >> 36) & 63] | sp2[(t >> 30) & 63]
+                | sp3[(t >> 24) & 63] | sp4[(t >> 18) & 63] | sp5[(t >> 12) & 63]
+                | sp6[(t >> 6) & 63] | sp7[t & 63])
+
+        if rounds >= 2:
+            # Round N - 1 must output R_{N-1} = L_N
+            t = (e0[right >> 24] | e1[(right >> 16) & 0xFF]
+                 | e2[(right >> 8) & 0xFF] | e3[right & 0xFF]) ^ round_keys[inner]
+            need = left ^ left_n
+            if (sp0[t >> 42] != need & m0 or sp1[(t >> 36) & 63] != need & m1
+                    or sp2[(t >> 30) & 63] != need & m2 or sp3[(t >> 24) & 63] != need & m3
+                    or sp4[(t >> 18) & 63] != need & m4 or sp5[(t >> 12) & 63] != need & m5
+                    or sp6[(t >> 6) & 63] != need & m6 or sp7[t & 63] != need & m7):
+                continue
+            left = right
+        # Round N must output R_N from R_{N-1} = L_N
+        t = e_left_n ^ round_keys[rounds - 1]
+        need = left ^ right_n
+        if (sp0[t >> 42] != need & m0 or sp1[(t >> 36) & 63] != need & m1
+                or sp2[(t >> 30) & 63] != need & m2 or sp3[(t >> 24) & 63] != need & m3
+                or sp4[(t >> 18) & 63] != need & m4 or sp5[(t >> 12) & 63] != need & m5
+                or sp6[(t >> 6) & 63] != need & m6 or sp7[t & 63] != need & m7):
+            continue
+
+        if all(des_engine.des_encrypt_block(p, round_keys) == c for p, c in others):
+            found.append(base_key | deposit(gray(index), bits))
+    return found
+
+
+def _search_shard(args):
+    """Search one shard (runs in a worker)."""
+    shard, shard_size, total, base_key, bits, rounds, pairs = args
+    # CPU time, so workers outnumbering the cores do not count time descheduled
+    start = time.process_time()
+    first = shard * shard_size
+    stop = min(first + shard_size, total)
+    found = search_range(first, stop, base_key, bits, rounds, pairs)
+    return shard, found, stop - first, time.process_time() - start
+
+
+def search_identity(base_key, mask, rounds, pairs, shard_bits):
+    """Describe a search so a checkpoint is only resumed by the same search."""
+    digest = hashlib.sha256(repr(sorted(pairs)).encode('ascii')).hexdigest()[:16]
+    return {
+        'base_key': f"{base_key & ~mask & MASK_56:014X}",
+        'mask': f"{mask:014X}",
+        'rounds': rounds,
+        'pairs': digest,
+        'shard_bits': shard_bits,
+    }
+
+
+def write_checkpoint(path, state):
+    """Atomically write a search checkpoint."""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def search(base_key, mask, pairs, rounds=2, workers=None, shard_bits=20,
+           checkpoint=None, checkpoint_interval=5.0, progress=None):
+    """
+    Search every key that matches base_key outside mask.
+
+    Args:
+        base_key (int): 56-bit key; bits inside mask are ignored
+        mask (int): 56-bit mask of unknown key bits (at most MAX_UNKNOWN_BITS)
+        pairs (list): Known (plaintext, ciphertext) 64-bit ints
+        rounds (int): Number of rounds
+        workers (int): Worker processes (defaults to the CPU count)
+        shard_bits (int): log2 of the keys per shard
+        checkpoint (str): JSON file to resume from and save progress to
+        checkpoint_interval (float): Minimum seconds between checkpoint writes
+        progress (callable): Called with (shards done, shards total) after
+            each shard
+
+    Returns:
+        dict: 'keys' (found keys), 'keys_tested' (this run), 'shards',
+            'resumed_shards', 'elapsed', 'keys_per_second' (wall clock) and
+            'keys_per_core_second' (per worker CPU time)
+    """
+    bits = mask_bits(mask & MASK_56)
+    if len(bits) > MAX_UNKNOWN_BITS:
+        raise ValueError(f"At most {MAX_UNKNOWN_BITS} unknown key bits are supported")
+    if not pairs:
+        raise ValueError("At least one known pair is required")
+    base_key &= ~mask & MASK_56
+    total = 1 << len(bits)
+    shard_bits = min(shard_bits, len(bits))
+    shard_size = 1 << shard_bits
+    shard_count = total // shard_size
+
+    identity = search_identity(base_key, mask, rounds, pairs, shard_bits)
+    completed = set()
+    keys = set()
+    if checkpoint and os.path.exists(checkpoint):
+        with open(checkpoint) as f:
+            state = json.load(f)
+        if state['identity'] != identity:
+            raise ValueError(f"{checkpoint} belongs to a different search")
+        completed = set(state['completed'])
+        keys = {int(k, 16) for k in state['keys']}
+    resumed = len(completed)
+
+    def save():
+        if checkpoint:
+            write_checkpoint(checkpoint, {
+                'identity': identity,
+                'completed': sorted(completed),
+                'keys': [f"{k:014X}" for k in sorted(keys)],
+                'complete': len(completed) == shard_count,
+            })
+
+    jobs = [(shard, shard_size, total, base_key, bits, rounds, list(pairs))
+            for shard in range(shard_count) if shard not in completed]
+    tested = 0
+    busy = 0.0
+    start = time.perf_counter()
+    last_save = time.monotonic()
+    with Pool(workers) as pool:
+        for shard, found, count, elapsed in pool.imap_unordered(_search_shard, jobs):
+            completed.add(shard)
+            keys.update(found)
+            tested += count
+            busy += elapsed
+            if progress:
+                progress(len(completed), shard_count)
+            if found or time.monotonic() - last_save >= checkpoint_interval:
+                save()
+                last_save = time.monotonic()
+    save()
+    wall = time.perf_counter() - start
+
+    return {
+        'keys': sorted(keys),
+        'keys_tested': tested,
+        'shards': shard_count,
+        'resumed_shards': resumed,
+        'elapsed': wall,
+        'keys_per_second': tested / wall if wall else 0.0,
+        'keys_per_core_second': tested / busy if busy else 0.0,
+    }
+
+
+def main():
+    """Parse command-line options and run a search."""
+    parser = argparse.ArgumentParser(description="Restricted key-space DES search")
+    parser.add_argument('--base-key', help="56-bit base key in hex")
+    parser.add_argument('--mask', help="56-bit mask of unknown key bits in hex")
+    parser.add_argument('--pair', action='append', default=[],
+                        help="Known pair PLAINTEXT:CIPHERTEXT in hex (repeatable)")
+    parser.add_argument('--demo-bits', type=int,
+                        help="Search a random key with this many random unknown bits")
+    parser.add_argument('--rounds', type=int, default=2)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--shard-bits', type=int, default=20)
+    parser.add_argument('--checkpoint', help="JSON checkpoint file")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    secret = None
+    if args.demo_bits is not None:
+        rng = random.Random(args.seed)
+        secret = rng.getrandbits(56)
+        mask = deposit((1 << args.demo_bits) - 1, rng.sample(range(56), args.demo_bits))
+        base_key = secret ^ (rng.getrandbits(56) & mask)
+        round_keys = des_engine.generate_round_keys(secret, args.rounds)
+        pairs = [(p, des_engine.des_encrypt_block(p, round_keys))
+                 for p in (rng.getrandbits(64) for _ in range(3))]
+    else:
+        if not (args.base_key and args.mask and args.pair):
+            parser.error("--base-key, --mask and --pair are required without --demo-bits")
+        base_key, mask = int(args.base_key, 16), int(args.mask, 16)
+        pairs = [tuple(int(x, 16) for x in pair.split(':')) for pair in args.pair]
+
+    print("\n" + "="*80)
+    print(f"RESTRICTED KEY SEARCH - {args.rounds}-ROUND DES, "
+          f"{bin(mask).count('1')} UNKNOWN BITS, {len(pairs)} PAIRS")
+    print("="*80)
+
+    result = search(base_key, mask, pairs, args.rounds, args.workers,
+                    args.shard_bits, args.checkpoint)
+
+    print(f"\nShards:              {result['shards']} "
+          f"({result['resumed_shards']} resumed from checkpoint)")
+    print(f"Keys tested:         {result['keys_tested']}")
+    print(f"Elapsed:             {result['elapsed']:.2f} s")
+    print(f"Keys/s (wall):       {result['keys_per_second']:.0f}")
+    print(f"Keys/s per core:     {result['keys_per_core_second']:.0f}")
+    for key in result['keys']:
+        print(f"Key found:           {key:014X}")
+    if secret is not None:
+        print(f"Match: {'✓' if secret in result['keys'] else '✗'}")
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,492 @@
+"""
+Linear Cryptanalysis of Reduced-Round DES
+Matsui's linear attack against the N-round DES of des_engine.py / des_batch.py
+(two rounds reproduce des_2round.py).
+
+Linear approximations are built from the linear approximation table (LAT) of
+each S-box in des_tables.S_BOXES and chained through the Feistel rounds with a
+branch-and-bound search over trails with at most one active S-box per round,
+the shape of Matsui's best characteristics.
+
+Algorithm 1 recovers one parity bit of the key from an N-round approximation.
+Algorithm 2 uses an (N-1)-round approximation and guesses the six last-round
+subkey bits of the S-box the approximation reaches. Both reduce every
+known-plaintext set to a small histogram with vectorized parity computation
+and np.bincount, so counting costs a few array passes per 2^20 pairs instead
+of a Python loop per pair.
+
+Masks are written in the IP domain: a plaintext mask applies to IP(P) = L0||R0
+and a ciphertext mask to IP(C) = R_N||L_N.
+
+Usage:
+
+    python des_linear.py --rounds 3 --trials 20 --log-pairs 8 10 12 14
+
+Requires NumPy.
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+import des_batch
+import des_engine
+from des_tables import E, P, PC2, S_BOXES, SHIFT_SCHEDULE
+
+
+MASK_32 = (1 << 32) - 1
+
+
+def s_box_value(s_box, x):
+    """Look up a 6-bit input (first bit most significant) in an S-box."""
+    return s_box[((x >> 4) & 0x02) | (x & 0x01)][(x >> 1) & 0x0F]
+
+
+def parity(x):
+    """Parity of a Python int."""
+    return bin(x).count('1') & 1
+
+
+def linear_approximation_table(s_box):
+    """
+    Compute the LAT of one DES S-box.
+
+    Args:
+        s_box (list): 4x16 S-box
+
+    Returns:
+        list: 64x16 table of #{x : a.x = b.S(x)} - 32
+    """
+    outputs = [s_box_value(s_box, x) for x in range(64)]
+    return [[sum(1 for x in range(64) if parity(x & a) == parity(outputs[x] & b)) - 32
+             for b in range(16)] for a in range(64)]
+
+
+def parity_array(values):
+    """Parity of each element of a uint64 array (as uint8)."""
+    x = np.asarray(values, dtype=np.uint64).copy()
+    for shift in (32, 16, 8, 4, 2, 1):
+        x ^= x >> np.uint64(shift)
+    return (x & np.uint64(1)).astype(np.uint8)
+
+
+class RoundApproximation:
+    """
+    A one-round approximation lambda.f(R, K) = gamma.R ^ kappa.K of the DES
+    round function using a single S-box (or none, for the exact zero mask).
+    """
+
+    def __init__(self, sbox, alpha, beta, lat):
+        self.sbox = sbox
+        self.alpha = alpha
+        self.beta = beta
+        self.lat = lat
+        self.output_mask = 0
+        self.input_mask = 0
+        self.key_mask = 0
+        if sbox is None:
+            return
+        # Output: beta on the S-box nibble, moved through P
+        pre_p = beta << (28 - 4 * sbox)
+        for j, pos in enumerate(P):
+            if (pre_p >> (32 - pos)) & 1:
+                self.output_mask |= 1 << (31 - j)
+        # Input: alpha on the S-box's six expanded bits, folded back through E
+        for t in range(6):
+            if (alpha >> (5 - t)) & 1:
+                self.input_mask ^= 1 << (32 - E[6 * sbox + t])
+        self.key_mask = alpha << (42 - 6 * sbox)
+
+    @property
+    def correlation(self):
+        """Correlation 2 * bias (1 for the inactive approximation)."""
+        return 1.0 if self.sbox is None else self.lat / 32
+
+    def __repr__(self):
+        if self.sbox is None:
+            return "RoundApproximation(inactive)"
+        return (f"RoundApproximation(S{self.sbox + 1}, alpha={self.alpha:02X}, "
+                f"beta={self.beta:X}, LAT={self.lat:+d})")
+
+
+INACTIVE = RoundApproximation(None, 0, 0, 32)
+
+
+def approximations_by_output_mask(min_lat=4):
+    """
+    Index single-S-box round approximations by their f-output mask.
+
+    Args:
+        min_lat (int): Smallest |LAT| entry to keep
+
+    Returns:
+        dict: output mask -> approximations, strongest first (mask 0 maps to
+            the exact inactive approximation)
+    """
+    table = {0: [INACTIVE]}
+    for sbox, s_box in enumerate(S_BOXES):
+        lat = linear_approximation_table(s_box)
+        for beta in range(1, 16):
+            options = [RoundApproximation(sbox, alpha, beta, lat[alpha][beta])
+                       for alpha in range(1, 64) if abs(lat[alpha][beta]) >= min_lat]
+            if options:
+                options.sort(key=lambda a: -abs(a.lat))
+                table[options[0].output_mask] = options
+    return table
+
+
+class LinearTrail:
+    """
+    A chained N-round linear approximation.
+
+    Attributes:
+        rounds (list): RoundApproximation per round
+        masks (list): lambda_0 .. lambda_{N+1}; lambda_r (1 <= r <= N) is the
+            f-output mask of round r, lambda_0 is the mask on R0 and
+            lambda_{N+1} the mask on L_N
+    """
+
+    def __init__(self, rounds, masks):
+        self.rounds = rounds
+        self.masks = masks
+
+    @property
+    def correlation(self):
+        value = 1.0
+        for approximation in self.rounds:
+            value *= approximation.correlation
+        return value
+
+    @property
+    def bias(self):
+        """Bias of the whole approximation (piling-up lemma)."""
+        return self.correlation / 2
+
+    @property
+    def plaintext_mask(self):
+        """64-bit mask on IP(P) = L0||R0."""
+        return (self.masks[1] << 32) | self.masks[0]
+
+    @property
+    def ciphertext_mask(self):
+        """64-bit mask on IP(C) = R_N||L_N."""
+        n = len(self.rounds)
+        return (self.masks[n] << 32) | self.masks[n + 1]
+
+    @property
+    def round_key_masks(self):
+        """48-bit mask on each round key K1..KN."""
+        return [approximation.key_mask for approximation in self.rounds]
+
+    def key_mask(self):
+        """
+        Translate the round key masks into a mask on the 56-bit key.
+
+        Returns:
+            int: 56-bit mask whose parity the approximation predicts
+        """
+        mask = 0
+        total_shift = 0
+        for r, round_mask in enumerate(self.round_key_masks):
+            total_shift += SHIFT_SCHEDULE[r % len(SHIFT_SCHEDULE)]
+            for j, pos in enumerate(PC2):
+                if not (round_mask >> (47 - j)) & 1:
+                    continue
+                # Bit pos of the rotated C||D comes from this bit of C0||D0
+                half, offset = divmod(pos - 1, 28)
+                source = half * 28 + (offset + total_shift) % 28
+                mask ^= 1 << (55 - source)
+        return mask
+
+    def __repr__(self):
+        active = sum(1 for a in self.rounds if a.sbox is not None)
+        return (f"LinearTrail({len(self.rounds)} rounds, {active} active, "
+                f"bias={self.bias:+.6f})")
+
+
+def search_trails(rounds, min_lat=4, require_final_active=False):
+    """
+    Find the strongest single-S-box-per-round linear trail.
+
+    The Feistel structure forces lambda_{r+1} = lambda_{r-1} ^ gamma_r, so
+    after choosing the first two output masks every later mask follows from
+    the approximation chosen for the previous round. The first and last
+    rounds' input masks are free, so they take the strongest approximation.
+
+    Args:
+        rounds (int): Number of rounds the trail covers
+        min_lat (int): Smallest |LAT| entry considered
+        require_final_active (bool): Require lambda_{N+1} (the mask on L_N)
+            to be a non-zero single-S-box mask, as Algorithm 2 needs to guess
+            the subkey of that S-box in the following round
+
+    Returns:
+        LinearTrail: Best trail found
+    """
+    table = approximations_by_output_mask(min_lat)
+    masks = list(table)
+    first_active_mask = next(m for m in masks if m)
+    best = {'trail': None, 'score': 0.0}
+
+    def close(chosen, lam, score):
+        # Rounds 1..N-1 are fixed in chosen; pick round N and the free end masks
+        for last in table[lam[-1]]:
+            total = score * abs(last.correlation)
+            if total <= best['score']:
+                break
+            if rounds == 1:
+                lambda_end = first_active_mask if require_final_active else last.input_mask
+                lambda_0 = lambda_end ^ last.input_mask
+            else:
+                lambda_0 = lam[1] ^ chosen[0].input_mask
+                lambda_end = lam[-2] ^ last.input_mask
+                if require_final_active and (not lambda_end or lambda_end not in table):
+                    continue
+            all_masks = [lambda_0] + lam + [lambda_end]
+            if not any(all_masks):
+                continue
+            best['trail'] = LinearTrail(chosen + [last], all_masks)
+            best['score'] = total
+            break
+
+    def extend(chosen, lam, score):
+        if len(lam) == rounds:
+            close(chosen, lam, score)
+            return
+        for approximation in table[lam[-1]]:
+            new_score = score * abs(approximation.correlation)
+            if new_score <= best['score']:
+                break
+            nxt = lam[-2] ^ approximation.input_mask
+            if nxt in table:
+                extend(chosen + [approximation], lam + [nxt], new_score)
+
+    for first_mask in masks:
+        if rounds == 1:
+            close([], [first_mask], 1.0)
+            continue
+        first = table[first_mask][0]
+        for second_mask in masks:
+            extend([first], [first_mask, second_mask], abs(first.correlation))
+    return best['trail']
+
+
+def mask_to_sbox(output_mask):
+    """
+    Find the S-box and nibble mask behind a single-S-box f-output mask.
+
+    Args:
+        output_mask (int): 32-bit mask on the round function output
+
+    Returns:
+        tuple: (S-box index, 4-bit output mask)
+    """
+    pre_p = 0
+    for j, pos in enumerate(P):
+        if (output_mask >> (31 - j)) & 1:
+            pre_p |= 1 << (32 - pos)
+    sboxes = [i for i in range(8) if (pre_p >> (28 - 4 * i)) & 0xF]
+    if len(sboxes) != 1:
+        raise ValueError(f"Mask {output_mask:08X} does not reach exactly one S-box")
+    sbox = sboxes[0]
+    return sbox, (pre_p >> (28 - 4 * sbox)) & 0xF
+
+
+# =============================================================================
+# Known-plaintext data
+# =============================================================================
+
+def generate_pairs(count, round_keys, rng, chunk_size=1 << 18):
+    """
+    Generate known (IP(P), IP(C)) pairs with the vectorized engine.
+
+    Working in the IP domain avoids applying IP to the data again later, since
+    IP(C) = R_N||L_N directly.
+
+    Args:
+        count (int): Number of pairs
+        round_keys (list): Round keys from des_engine.generate_round_keys()
+        rng (numpy.random.Generator): Random generator
+        chunk_size (int): Blocks per vectorized call
+
+    Returns:
+        tuple: (x, y) uint64 arrays of IP(P) and IP(C)
+    """
+    xs, ys = [], []
+    for start in range(0, count, chunk_size):
+        plaintexts = des_batch.random_blocks(rng, min(chunk_size, count - start))
+        x = des_batch.initial_permutation(plaintexts)
+        left, right = des_batch.split_halves(x)
+        for k in round_keys:
+            left, right = right, left ^ des_batch.f_function(right, k)
+        xs.append(x)
+        ys.append(des_batch.join_swapped(left, right))
+    return np.concatenate(xs), np.concatenate(ys)
+
+
+# =============================================================================
+# Matsui's algorithms
+# =============================================================================
+
+def algorithm1(trail, x, y):
+    """
+    Matsui's Algorithm 1: recover the key parity predicted by an N-round trail.
+
+    Args:
+        trail (LinearTrail): N-round trail
+        x (numpy.ndarray): IP(P) values
+        y (numpy.ndarray): IP(C) values
+
+    Returns:
+        tuple: (guessed key parity, count of pairs where the data parity is 0)
+    """
+    data = parity_array((x & np.uint64(trail.plaintext_mask))
+                        ^ (y & np.uint64(trail.ciphertext_mask)))
+    zeros = len(data) - int(data.sum())
+    majority = 0 if zeros > len(data) / 2 else 1
+    return majority ^ (trail.bias < 0), zeros
+
+
+def algorithm2(trail, x, y):
+    """
+    Matsui's Algorithm 2: rank the last-round subkey guesses of one S-box.
+
+    The trail covers rounds 1..N-1. The last round is partially decrypted for
+    each of the 64 guesses of the subkey of the S-box that lambda_N (the mask
+    on L_{N-1}) passes through. Pairs are first compressed to a 128-bin
+    histogram of (six E-expanded bits of L_N, data parity), so each guess
+    costs one lookup over 128 counters instead of a pass over the data.
+
+    Args:
+        trail (LinearTrail): (N-1)-round trail with an active final mask
+        x (numpy.ndarray): IP(P) values
+        y (numpy.ndarray): IP(C) values of N-round encryptions
+
+    Returns:
+        tuple: (S-box index, guesses ordered best first, counters per guess,
+            key parity guessed for the best subkey)
+    """
+    n = len(trail.rounds)
+    sbox, beta = mask_to_sbox(trail.masks[n + 1])
+
+    r_n = y >> np.uint64(32)
+    l_n = y & np.uint64(MASK_32)
+    # Known part: lambda_X.X ^ lambda_N.R_N ^ lambda_{N-1}.L_N
+    base = parity_array((x & np.uint64(trail.plaintext_mask))
+                        ^ (r_n & np.uint64(trail.masks[n + 1]))
+                        ^ (l_n & np.uint64(trail.masks[n])))
+    expanded = des_batch.s_box_inputs(des_batch.expand(l_n))[sbox]
+    counts = np.bincount(expanded * 2 + base, minlength=128).reshape(64, 2)
+
+    # out_parity[g][e] = beta . S(e ^ g)
+    guesses = np.arange(64)
+    outputs = np.array([s_box_value(S_BOXES[sbox], v) for v in range(64)])
+    out_parity = parity_array(outputs[guesses[:, None] ^ guesses[None, :]] & beta)
+    e_index = np.arange(64)[None, :]
+    zeros = counts[e_index, out_parity].sum(axis=1)
+
+    deviation = np.abs(zeros - len(x) / 2)
+    order = np.argsort(-deviation, kind='stable')
+    best = int(order[0])
+    majority = 0 if zeros[best] > len(x) / 2 else 1
+    return sbox, [int(g) for g in order], zeros, majority ^ (trail.bias < 0)
+
+
+def subkey_bits(round_key, sbox):
+    """Return the six round key bits feeding one S-box."""
+    return (round_key >> (42 - 6 * sbox)) & 0x3F
+
+
+# =============================================================================
+# Experiments
+# =============================================================================
+
+def success_rates(rounds, data_sizes, trials=20, seed=0):
+    """
+    Measure key-bit success rates of both algorithms as the data size varies.
+
+    Args:
+        rounds (int): Number of DES rounds attacked
+        data_sizes (list): Numbers of known plaintexts to test
+        trials (int): Random keys per data size
+        seed (int): Seed for keys and plaintexts
+
+    Returns:
+        list: One dict per data size with success rates and counting throughput
+    """
+    trail_1 = search_trails(rounds)
+    trail_2 = search_trails(rounds - 1, require_final_active=True) if rounds > 1 else None
+    rng = np.random.default_rng(seed)
+
+    results = []
+    for size in data_sizes:
+        ok_1 = ok_2 = 0
+        ranks = []
+        count_time = 0.0
+        for _ in range(trials):
+            key = int(rng.integers(0, 1 << 56, dtype=np.uint64))
+            round_keys = des_engine.generate_round_keys(key, rounds)
+            x, y = generate_pairs(size, round_keys, rng)
+
+            start = time.perf_counter()
+            guess, _ = algorithm1(trail_1, x, y)
+            ok_1 += guess == parity(key & trail_1.key_mask())
+            if trail_2 is not None:
+                sbox, order, _, _ = algorithm2(trail_2, x, y)
+                rank = order.index(subkey_bits(round_keys[-1], sbox))
+                ranks.append(rank)
+                ok_2 += rank == 0
+            count_time += time.perf_counter() - start
+
+        results.append({
+            'pairs': size,
+            'algorithm1': ok_1 / trials,
+            'algorithm2': ok_2 / trials if trail_2 is not None else None,
+            'mean_rank': float(np.mean(ranks)) if ranks else None,
+            'pairs_per_second': size * trials / count_time if count_time else float('inf'),
+        })
+    return trail_1, trail_2, results
+
+
+def print_trail(trail, title):
+    """Print the round approximations and masks of a trail."""
+    print(f"\n{title}: {trail}")
+    for r, approximation in enumerate(trail.rounds, start=1):
+        print(f"  Round {r}: {approximation}")
+    print(f"  Plaintext mask  (IP domain): {trail.plaintext_mask:016X}")
+    print(f"  Ciphertext mask (IP domain): {trail.ciphertext_mask:016X}")
+    print(f"  Key mask (56-bit):           {trail.key_mask():014X}")
+
+
+def main():
+    """Parse command-line options and run the success-rate experiment."""
+    parser = argparse.ArgumentParser(description="Matsui linear attack on reduced-round DES")
+    parser.add_argument('--rounds', type=int, default=3)
+    parser.add_argument('--trials', type=int, default=20)
+    parser.add_argument('--log-pairs', type=int, nargs='+', default=[6, 8, 10, 12, 14])
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    sizes = [1 << k for k in args.log_pairs]
+    trail_1, trail_2, results = success_rates(args.rounds, sizes, args.trials, args.seed)
+
+    print("\n" + "="*80)
+    print(f"LINEAR CRYPTANALYSIS OF {args.rounds}-ROUND DES")
+    print("="*80)
+    print_trail(trail_1, "Algorithm 1 approximation")
+    if trail_2 is not None:
+        print_trail(trail_2, "Algorithm 2 approximation")
+
+    print(f"\n{'Pairs':<12} {'Alg. 1':<10} {'Alg. 2':<10} {'Mean rank':<11} {'Pairs/s':<12}")
+    print("-" * 60)
+    for row in results:
+        alg2 = '-' if row['algorithm2'] is None else f"{row['algorithm2']:.2f}"
+        rank = '-' if row['mean_rank'] is None else f"{row['mean_rank']:.2f}"
+        print(f"{row['pairs']:<12} {row['algorithm1']:<10.2f} {alg2:<10} {rank:<11} "
+              f"{row['pairs_per_second']:<12.3g}")
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""
+Encryption Service Client
+asyncio client for encryption_service.py with a small connection pool.
+Each pooled connection pipelines requests, matching responses by request id,
+so many coroutines can share a few sockets.
+
+Example:
+
+    client = EncryptionClient(port=7878, pool_size=4)
+    ciphertext = await client.encrypt('des', 2, key_bytes, plaintext_bytes)
+    await client.close()
+"""
+
+import asyncio
+import itertools
+import json
+
+from encryption_service import (
+    CIPHER_AES, CIPHER_DES, OP_DECRYPT, OP_ENCRYPT, OP_STATS, STATUS_OK,
+    decode_response, encode_request, read_frame
+)
+
+
+CIPHERS = {'des': CIPHER_DES, 'aes': CIPHER_AES}
+
+
+class ServiceError(Exception):
+    """Raised when the service answers a request with an error status."""
+
+
+class _Connection:
+    """One pipelined connection with its own response reader task."""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.pending = {}
+        self.write_lock = asyncio.Lock()
+        self.reader_task = asyncio.create_task(self._read_responses())
+
+    async def _read_responses(self):
+        error = ConnectionError("Connection closed by service")
+        try:
+            while True:
+                payload = await read_frame(self.reader)
+                if payload is None:
+                    break
+                request_id, status, data = decode_response(payload)
+                future = self.pending.pop(request_id, None)
+                if future is not None and not future.done():
+                    future.set_result((status, data))
+        except Exception as exc:
+            error = exc
+        finally:
+            for future in self.pending.values():
+                if not future.done():
+                    future.set_exception(error)
+            self.pending.clear()
+
+    @property
+    def closed(self):
+        return self.reader_task.done()
+
+    async def request(self, request_id, frame):
+        future = asyncio.get_running_loop().create_future()
+        self.pending[request_id] = future
+        # A reader that has already finished would never answer the future
+        if self.reader_task.done():
+            del self.pending[request_id]
+            raise ConnectionError("Connection closed by service")
+        async with self.write_lock:
+            self.writer.write(frame)
+            await self.writer.drain()
+        return await future
+
+    async def close(self):
+        self.writer.close()
+        try:
+            await self.writer.wait_closed()
+        except ConnectionError:
+            pass
+        self.reader_task.cancel()
+
+
+class EncryptionClient:
+    """
+    Client for the local encryption service.
+
+    Connections are opened lazily up to pool_size and handed out round-robin;
+    closed connections are replaced on the next request.
+    """
+
+    def __init__(self, host='127.0.0.1', port=7878, path=None, pool_size=4):
+        self.host = host
+        self.port = port
+        self.path = path
+        self.pool_size = pool_size
+        self._pool = []
+        self._next = 0
+        self._ids = itertools.count(1)
+        self._connect_lock = None
+
+    async def _open(self):
+        if self.path:
+            reader, writer = await asyncio.open_unix_connection(self.path)
+        else:
+            reader, writer = await asyncio.open_connection(self.host, self.port)
+        return _Connection(reader, writer)
+
+    async def _connection(self):
+        if self._connect_lock is None:
+            self._connect_lock = asyncio.Lock()
+        async with self._connect_lock:
+            self._pool = [conn for conn in self._pool if not conn.closed]
+            if len(self._pool) < self.pool_size:
+                conn = await self._open()
+                self._pool.append(conn)
+                return conn
+            self._next = (self._next + 1) % len(self._pool)
+            return self._pool[self._next]
+
+    async def _call(self, opcode, cipher=0, rounds=0, key=b'', data=b''):
+        request_id = next(self._ids) & 0xFFFFFFFF
+        frame = encode_request(request_id, opcode, cipher, rounds, key, data)
+        conn = await self._connection()
+        status, body = await conn.request(request_id, frame)
+        if status != STATUS_OK:
+            raise ServiceError(body.decode(errors='replace'))
+        return body
+
+    async def encrypt(self, cipher, rounds, key, data):
+        """
+        Encrypt concatenated blocks.
+
+        Args:
+            cipher (str): 'des' or 'aes'
+            rounds (int): Number of rounds
+            key (bytes): 7-byte DES key (56 bits) or 16-byte AES key
+            data (bytes): Plaintext blocks (multiple of the block size)
+
+        Returns:
+            bytes: Ciphertext blocks
+        """
+        return await self._call(OP_ENCRYPT, CIPHERS[cipher], rounds, key, data)
+
+    async def decrypt(self, cipher, rounds, key, data):
+        """
+        Decrypt concatenated blocks.
+
+        Args:
+            cipher (str): 'des' or 'aes'
+            rounds (int): Number of rounds
+            key (bytes): 7-byte DES key (56 bits) or 16-byte AES key
+            data (bytes): Ciphertext blocks (multiple of the block size)
+
+        Returns:
+            bytes: Plaintext blocks
+        """
+        return await self._call(OP_DECRYPT, CIPHERS[cipher], rounds, key, data)
+
+    async def stats(self):
+        """Return the service's latency and batch-size statistics."""
+        return json.loads(await self._call(OP_STATS))
+
+    async def close(self):
+        """Close all pooled connections."""
+        for conn in self._pool:
+            await conn.close()
+        self._pool = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
@@ -0,0 +1,475 @@
+"""
+Local Encryption Service
+asyncio server exposing N-round DES and AES encrypt/decrypt over a compact
+length-prefixed binary protocol. Concurrent requests are coalesced into
+micro-batches (bounded by a maximum batch size and a maximum wait) and run
+through the batched engines in des_engine.py and aes_engine.py, so table setup
+and key schedules are paid once per server instead of once per caller.
+
+Wire format (all integers big-endian):
+
+    frame    = u32 payload length || payload
+    request  = u32 request id || u8 opcode || u8 cipher || u8 rounds
+               || u8 key length || key || data
+    response = u32 request id || u8 status || data
+
+    opcode: 0 = encrypt, 1 = decrypt, 2 = stats (data is UTF-8 JSON)
+    cipher: 0 = DES (7-byte 56-bit key, 8-byte blocks)
+            1 = AES (16-byte key, 16-byte blocks)
+    status: 0 = ok, 1 = error (data is a UTF-8 message)
+
+Usage:
+
+    python encryption_service.py --port 7878
+    python encryption_service.py --unix /tmp/encryption.sock
+    python encryption_service.py --check
+"""
+
+import argparse
+import asyncio
+import json
+import struct
+import time
+from collections import Counter, OrderedDict, deque
+
+import aes_engine
+import des_engine
+
+
+OP_ENCRYPT = 0
+OP_DECRYPT = 1
+OP_STATS = 2
+
+CIPHER_DES = 0
+CIPHER_AES = 1
+
+STATUS_OK = 0
+STATUS_ERROR = 1
+
+LENGTH = struct.Struct('>I')
+REQUEST_ID = struct.Struct('>I')
+REQUEST_HEADER = struct.Struct('>IBBBB')
+RESPONSE_HEADER = struct.Struct('>IB')
+
+# Per cipher: (key length in bytes, block length in bytes)
+CIPHER_SIZES = {
+    CIPHER_DES: (7, 8),
+    CIPHER_AES: (16, 16),
+}
+
+MAX_FRAME = 64 * 1024 * 1024
+
+
+# =============================================================================
+# Protocol
+# =============================================================================
+
+def encode_request(request_id, opcode, cipher=0, rounds=0, key=b'', data=b''):
+    """
+    Encode one request as a length-prefixed frame.
+
+    Args:
+        request_id (int): Caller-chosen id echoed in the response
+        opcode (int): OP_ENCRYPT, OP_DECRYPT or OP_STATS
+        cipher (int): CIPHER_DES or CIPHER_AES
+        rounds (int): Number of rounds
+        key (bytes): Key bytes
+        data (bytes): Concatenated blocks
+
+    Returns:
+        bytes: Frame ready to write to the stream
+    """
+    payload = REQUEST_HEADER.pack(request_id, opcode, cipher, rounds, len(key)) + key + data
+    return LENGTH.pack(len(payload)) + payload
+
+
+def decode_request(payload):
+    """
+    Decode a request payload.
+
+    Args:
+        payload (bytes): Frame payload without the length prefix
+
+    Returns:
+        tuple: (request_id, opcode, cipher, rounds, key, data)
+
+    Raises:
+        ValueError: If the payload is shorter than its header or key
+    """
+    if len(payload) < REQUEST_HEADER.size:
+        raise ValueError(f"Request of {len(payload)} bytes is shorter than its header")
+    request_id, opcode, cipher, rounds, key_len = REQUEST_HEADER.unpack_from(payload)
+    start = REQUEST_HEADER.size
+    key = payload[start:start + key_len]
+    if len(key) != key_len:
+        raise ValueError(f"Request is truncated inside its {key_len}-byte key")
+    return request_id, opcode, cipher, rounds, key, payload[start + key_len:]
+
+
+def encode_response(request_id, status, data=b''):
+    """Encode one response as a length-prefixed frame."""
+    payload = RESPONSE_HEADER.pack(request_id, status) + data
+    return LENGTH.pack(len(payload)) + payload
+
+
+def decode_response(payload):
+    """
+    Decode a response payload.
+
+    Returns:
+        tuple: (request_id, status, data)
+    """
+    request_id, status = RESPONSE_HEADER.unpack_from(payload)
+    return request_id, status, payload[RESPONSE_HEADER.size:]
+
+
+async def read_frame(reader):
+    """
+    Read one length-prefixed frame from a stream.
+
+    Returns:
+        bytes: Payload, or None at end of stream
+    """
+    try:
+        header = await reader.readexactly(LENGTH.size)
+    except asyncio.IncompleteReadError:
+        return None
+    (length,) = LENGTH.unpack(header)
+    if length > MAX_FRAME:
+        raise ValueError(f"Frame of {length} bytes exceeds limit")
+    return await reader.readexactly(length)
+
+
+def split_blocks(data, block_size):
+    """Split concatenated block bytes into ints."""
+    return [int.from_bytes(data[i:i + block_size], 'big')
+            for i in range(0, len(data), block_size)]
+
+
+def join_blocks(blocks, block_size):
+    """Join block ints into concatenated bytes."""
+    return b''.join(block.to_bytes(block_size, 'big') for block in blocks)
+
+
+# =============================================================================
+# Statistics
+# =============================================================================
+
+class ServiceStats:
+    """Per-request latency samples and batch-size histogram."""
+
+    def __init__(self, max_samples=100000):
+        self.latencies = deque(maxlen=max_samples)
+        self.batch_sizes = Counter()
+        self.requests = 0
+        self.blocks = 0
+        self.errors = 0
+
+    def record_batch(self, size):
+        """Record a batch of `size` requests in a power-of-two bucket."""
+        bucket = 1
+        while bucket < size:
+            bucket <<= 1
+        self.batch_sizes[bucket] += 1
+
+    def record_request(self, latency, blocks, ok=True):
+        """Record the latency (seconds) and size of one finished request."""
+        self.latencies.append(latency)
+        self.requests += 1
+        self.blocks += blocks
+        if not ok:
+            self.errors += 1
+
+    def percentiles(self, points=(50, 90, 99, 99.9)):
+        """
+        Return latency percentiles in milliseconds.
+
+        Args:
+            points (tuple): Percentiles to report
+
+        Returns:
+            dict: 'pNN' -> latency in ms, plus 'max'
+        """
+        samples = sorted(self.latencies)
+        if not samples:
+            return {}
+        result = {}
+        for point in points:
+            index = min(len(samples) - 1, int(len(samples) * point / 100))
+            result[f"p{point:g}"] = samples[index] * 1000
+        result['max'] = samples[-1] * 1000
+        return result
+
+    def summary(self):
+        """Return all statistics as a JSON-serialisable dict."""
+        return {
+            'requests': self.requests,
+            'blocks': self.blocks,
+            'errors': self.errors,
+            'latency_ms': self.percentiles(),
+            'batch_size_histogram': {f"<={size}": count
+                                     for size, count in sorted(self.batch_sizes.items())},
+        }
+
+
+# =============================================================================
+# Server
+# =============================================================================
+
+class EncryptionServer:
+    """
+    Micro-batching encryption server.
+
+    Requests are queued as they arrive. A single batcher task takes the first
+    waiting request, keeps collecting until max_batch_size requests are queued
+    or max_wait seconds have passed, then runs the batch on the engines,
+    grouping requests that share cipher, rounds, key and direction.
+    """
+
+    def __init__(self, max_batch_size=256, max_wait=0.002, key_cache_size=1024):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.key_cache_size = key_cache_size
+        self.stats = ServiceStats()
+        self._queue = None
+        self._key_cache = OrderedDict()
+        self._server = None
+        self._batcher = None
+
+    async def start(self, host='127.0.0.1', port=0, path=None):
+        """
+        Start listening on a TCP port or a Unix socket.
+
+        Args:
+            host (str): TCP host
+            port (int): TCP port (0 picks a free port)
+            path (str): Unix socket path (takes precedence over host/port)
+
+        Returns:
+            asyncio.AbstractServer: The listening server
+        """
+        self._queue = asyncio.Queue()
+        self._batcher = asyncio.create_task(self._run_batches())
+        if path:
+            self._server = await asyncio.start_unix_server(self._handle_client, path=path)
+        else:
+            self._server = await asyncio.start_server(self._handle_client, host, port)
+        return self._server
+
+    def address(self):
+        """Return the bound address of the listening socket."""
+        return self._server.sockets[0].getsockname()
+
+    async def serve_forever(self):
+        """Serve connections until cancelled."""
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        """Stop accepting connections and stop the batcher."""
+        self._server.close()
+        await self._server.wait_closed()
+        self._batcher.cancel()
+
+    async def _handle_client(self, reader, writer):
+        write_lock = asyncio.Lock()
+        pending = set()
+        try:
+            while True:
+                payload = await read_frame(reader)
+                if payload is None:
+                    break
+                received = time.perf_counter()
+                task = asyncio.create_task(
+                    self._serve(payload, received, writer, write_lock))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+            writer.close()
+
+    async def _serve(self, payload, received, writer, write_lock):
+        request_id = opcode = None
+        blocks = 0
+        try:
+            request_id, opcode, cipher, rounds, key, data = decode_request(payload)
+            if opcode == OP_STATS:
+                status, body = STATUS_OK, json.dumps(self.stats.summary()).encode()
+            elif opcode in (OP_ENCRYPT, OP_DECRYPT):
+                if cipher not in CIPHER_SIZES:
+                    raise ValueError(f"Unknown cipher {cipher}")
+                key_len, block_len = CIPHER_SIZES[cipher]
+                if len(key) != key_len or len(data) % block_len or rounds < 1:
+                    raise ValueError("Bad key length, data length or round count")
+                blocks = len(data) // block_len
+                future = asyncio.get_running_loop().create_future()
+                await self._queue.put(((opcode, cipher, rounds, key), data, future))
+                status, body = STATUS_OK, await future
+            else:
+                raise ValueError(f"Unknown opcode {opcode}")
+        except Exception as exc:
+            status, body = STATUS_ERROR, str(exc).encode()
+
+        if request_id is None:
+            if len(payload) < REQUEST_ID.size:
+                # No request id to answer: drop the connection so the client
+                # fails its pending requests instead of waiting for a reply
+                writer.close()
+                self.stats.record_request(time.perf_counter() - received, 0, False)
+                return
+            (request_id,) = REQUEST_ID.unpack_from(payload)
+        async with write_lock:
+            writer.write(encode_response(request_id, status, body))
+            await writer.drain()
+        if opcode != OP_STATS:
+            self.stats.record_request(time.perf_counter() - received, blocks,
+                                      status == STATUS_OK)
+
+    async def _run_batches(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            self.stats.record_batch(len(batch))
+            try:
+                results = await loop.run_in_executor(None, self._process_batch, batch)
+            except Exception as exc:
+                results = [exc] * len(batch)
+            for (_, _, future), result in zip(batch, results):
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+    def _round_keys(self, cipher, rounds, key):
+        cache_key = (cipher, rounds, key)
+        round_keys = self._key_cache.get(cache_key)
+        if round_keys is None:
+            if cipher == CIPHER_DES:
+                round_keys = des_engine.generate_round_keys(int.from_bytes(key, 'big'), rounds)
+            else:
+                round_keys = aes_engine.expand_key(int.from_bytes(key, 'big'), rounds)
+            self._key_cache[cache_key] = round_keys
+            if len(self._key_cache) > self.key_cache_size:
+                self._key_cache.popitem(last=False)
+        else:
+            self._key_cache.move_to_end(cache_key)
+        return round_keys
+
+    def _process_batch(self, batch):
+        """Run a batch through the engines, one engine call per distinct group."""
+        groups = OrderedDict()
+        for index, (group, data, _) in enumerate(batch):
+            groups.setdefault(group, []).append((index, data))
+
+        results = [None] * len(batch)
+        for (opcode, cipher, rounds, key), members in groups.items():
+            block_len = CIPHER_SIZES[cipher][1]
+            try:
+                round_keys = self._round_keys(cipher, rounds, key)
+                blocks = split_blocks(b''.join(data for _, data in members), block_len)
+                if cipher == CIPHER_DES:
+                    engine = (des_engine.des_encrypt_blocks if opcode == OP_ENCRYPT
+                              else des_engine.des_decrypt_blocks)
+                else:
+                    engine = (aes_engine.aes_encrypt_blocks if opcode == OP_ENCRYPT
+                              else aes_engine.aes_decrypt_blocks)
+                output = join_blocks(engine(blocks, round_keys), block_len)
+            except Exception as exc:
+                for index, _ in members:
+                    results[index] = exc
+                continue
+            offset = 0
+            for index, data in members:
+                results[index] = output[offset:offset + len(data)]
+                offset += len(data)
+        return results
+
+
+async def serve(host, port, path, max_batch_size, max_wait):
+    """Run the server until cancelled."""
+    server = EncryptionServer(max_batch_size=max_batch_size, max_wait=max_wait)
+    await server.start(host=host, port=port, path=path)
+    print(f"Encryption service listening on {path or server.address()}")
+    print(f"Micro-batching: max batch {max_batch_size} requests, max wait {max_wait * 1000:.1f} ms")
+    await server.serve_forever()
+
+
+async def check_malformed_frames(timeout=2.0):
+    """
+    Send malformed frames to a local server and check each one is answered.
+
+    A frame truncated inside its key must get an error response for its
+    request id, and a frame too short to hold a request id must close the
+    connection; neither may leave the client waiting.
+
+    Returns:
+        list: (description, passed) per check
+    """
+    server = EncryptionServer()
+    await server.start()
+    host, port = server.address()[:2]
+    results = []
+    try:
+        reader, writer = await asyncio.open_connection(host, port)
+        truncated = REQUEST_HEADER.pack(7, OP_ENCRYPT, CIPHER_DES, 2, 7) + b'\x00' * 3
+        writer.write(LENGTH.pack(len(truncated)) + truncated)
+        try:
+            payload = await asyncio.wait_for(read_frame(reader), timeout)
+            request_id, status, _ = decode_response(payload)
+            passed = request_id == 7 and status == STATUS_ERROR
+        except asyncio.TimeoutError:
+            passed = False
+        results.append(("Frame truncated inside its key gets an error", passed))
+        writer.close()
+
+        reader, writer = await asyncio.open_connection(host, port)
+        writer.write(LENGTH.pack(2) + b'\x00\x07')
+        try:
+            passed = await asyncio.wait_for(read_frame(reader), timeout) is None
+        except asyncio.TimeoutError:
+            passed = False
+        results.append(("Frame without a request id closes the connection", passed))
+        writer.close()
+    finally:
+        await server.close()
+    return results
+
+
+def main():
+    """Parse command-line options and run the server."""
+    parser = argparse.ArgumentParser(description="Local DES/AES encryption service")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=7878)
+    parser.add_argument('--unix', help="Listen on this Unix socket path instead of TCP")
+    parser.add_argument('--max-batch', type=int, default=256)
+    parser.add_argument('--max-wait-ms', type=float, default=2.0)
+    parser.add_argument('--check', action='store_true',
+                        help="Check that malformed frames are answered, then exit")
+    args = parser.parse_args()
+    if args.check:
+        for description, passed in asyncio.run(check_malformed_frames()):
+            print(f"{description}: {'✓' if passed else '✗'}")
+        return
+    try:
+        asyncio.run(serve(args.host, args.port, args.unix,
+                          args.max_batch, args.max_wait_ms / 1000))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
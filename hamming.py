@@ -0,0 +1,165 @@
+"""
+Hamming-Distance Analytics
+Bit-difference measurements on packed blocks, shared by the assignment
+scripts and the batch analyses.
+
+Blocks are ints (bit 1 of a binary string is the most significant bit), so a
+comparison is one XOR and a popcount, and changed positions come from
+iterating over the set bits of the difference rather than over characters.
+For sets of blocks the array functions work on packed uint64 words (one word
+per 64 bits, most significant word first):
+
+- distance_matrix(): all-pairs N x N Hamming distances
+- flip_frequency(): per-bit fraction of pairs in which the bit differs
+
+The int and string helpers are pure Python; the array functions import
+NumPy on first use.
+"""
+
+_POPCOUNT_8 = None
+
+
+def hamming_distance(a, b):
+    """Return the number of bits in which two ints differ."""
+    return bin(a ^ b).count('1')
+
+
+def diff_positions(a, b, width):
+    """
+    Return the positions in which two blocks differ.
+
+    Args:
+        a (int): First block
+        b (int): Second block
+        width (int): Block width in bits
+
+    Returns:
+        list: 1-indexed positions (bit 1 is the most significant), ascending
+    """
+    diff = a ^ b
+    positions = []
+    # One step per differing bit, highest first
+    while diff:
+        top = diff.bit_length()
+        positions.append(width - top + 1)
+        diff ^= 1 << (top - 1)
+    return positions
+
+
+def compare_blocks(a, b, width):
+    """
+    Compare two blocks.
+
+    Returns:
+        tuple: (number_of_differences, list_of_positions)
+    """
+    positions = diff_positions(a, b, width)
+    return len(positions), positions
+
+
+def compare_binary_strings(bin1, bin2):
+    """
+    Compare two binary strings and return difference information.
+
+    Args:
+        bin1 (str): First binary string
+        bin2 (str): Second binary string; only the first min(len(bin1),
+            len(bin2)) bits of the two are compared
+
+    Returns:
+        tuple: (number_of_differences, list_of_positions), positions 1-indexed
+    """
+    width = min(len(bin1), len(bin2))
+    if width == 0:
+        return 0, []
+    return compare_blocks(int(bin1[:width], 2), int(bin2[:width], 2), width)
+
+
+def popcount64(values):
+    """Return the number of set bits of each element of a uint64 array."""
+    import numpy as np
+    global _POPCOUNT_8
+    values = np.asarray(values, dtype=np.uint64)
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(values).astype(np.int64)
+    if _POPCOUNT_8 is None:
+        _POPCOUNT_8 = np.array([bin(x).count('1') for x in range(256)], dtype=np.uint8)
+    as_bytes = np.ascontiguousarray(values).view(np.uint8)
+    return _POPCOUNT_8[as_bytes].reshape(values.shape + (8,)).sum(axis=-1, dtype=np.int64)
+
+
+def pack_blocks(blocks, width=None):
+    """
+    Pack blocks into uint64 words.
+
+    Args:
+        blocks: uint64 array (DES blocks), (N, 8k) uint8 array (e.g. AES
+            states in state_to_hex() order) or a sequence of ints
+        width (int): Block width in bits, required for a sequence of ints
+
+    Returns:
+        numpy.ndarray: (N, words) uint64 array, most significant word first
+    """
+    import numpy as np
+    if isinstance(blocks, np.ndarray):
+        if blocks.dtype == np.uint8:
+            return np.ascontiguousarray(blocks).view('>u8').astype(np.uint64)
+        return np.asarray(blocks, dtype=np.uint64).reshape(len(blocks), -1)
+    if width is None:
+        raise ValueError("width is required to pack ints")
+    words = (width + 63) // 64
+    mask = (1 << 64) - 1
+    return np.array([[(block >> (64 * (words - 1 - w))) & mask for w in range(words)]
+                     for block in blocks], dtype=np.uint64).reshape(-1, words)
+
+
+def pair_distances(a, b):
+    """
+    Hamming distances between corresponding packed blocks.
+
+    Args:
+        a, b (numpy.ndarray): (N, words) packed blocks from pack_blocks()
+
+    Returns:
+        numpy.ndarray: (N,) int64 distances
+    """
+    return popcount64(a ^ b).sum(axis=-1)
+
+
+def distance_matrix(packed, max_elements=1 << 22):
+    """
+    All-pairs Hamming distances of a set of blocks.
+
+    Args:
+        packed (numpy.ndarray): (N, words) packed blocks from pack_blocks()
+        max_elements (int): Words XORed per step (bounds temporary memory)
+
+    Returns:
+        numpy.ndarray: (N, N) int64 symmetric matrix with a zero diagonal
+    """
+    import numpy as np
+    count, words = packed.shape
+    out = np.empty((count, count), dtype=np.int64)
+    step = max(1, max_elements // max(1, count * words))
+    for start in range(0, count, step):
+        rows = packed[start:start + step, None, :] ^ packed[None, :, :]
+        out[start:start + step] = popcount64(rows).sum(axis=-1)
+    return out
+
+
+def flip_frequency(a, b, width):
+    """
+    Per-bit flip frequencies between corresponding packed blocks.
+
+    Args:
+        a, b (numpy.ndarray): (N, words) packed blocks from pack_blocks()
+        width (int): Block width in bits
+
+    Returns:
+        numpy.ndarray: (width,) float64 fraction of pairs differing in each
+            bit; index 0 is bit 1 (the most significant)
+    """
+    import numpy as np
+    diff = np.ascontiguousarray((a ^ b).astype('>u8')).view(np.uint8)
+    bits = np.unpackbits(diff.reshape(len(diff), -1), axis=1)[:, -width:]
+    return bits.mean(axis=0)
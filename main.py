@@ -4,24 +4,7 @@ Compares three different plaintexts (parts i, ii, iii) to demonstrate avalanche
 """
 
 from des_2round import des_encrypt_2rounds, format_binary_string, binary_to_hex
-
-
-def compare_binary_strings(bin1, bin2):
-    """
-    Compare two binary strings and return difference information.
-    
-    Args:
-        bin1 (str): First binary string
-        bin2 (str): Second binary string
-    
-    Returns:
-        tuple: (number_of_differences, list_of_positions)
-    """
-    differences = []
-    for i, (b1, b2) in enumerate(zip(bin1, bin2)):
-        if b1 != b2:
-            differences.append(i + 1)  # 1-indexed position
-    return len(differences), differences
+from hamming import compare_binary_strings
 
 
 def main():
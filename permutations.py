@@ -0,0 +1,350 @@
+"""
+Permutation Algebra for DES Tables
+Treats the bit-selection tables in des_tables.py as BitMap values that can be
+composed, inverted and fused, instead of as opaque lists.
+
+A BitMap with table T maps an in_bits-bit block to a len(T)-bit block whose
+j-th bit (1-indexed) is input bit T[j-1], exactly as des_2round.permute(). A
+map is a pure permutation when it is a bijection (IP, FP, P), an expansion
+when it repeats input bits (E) and a compression when it drops some (PC1, PC2).
+
+Pure permutations on ints can be compiled into a short sequence of delta swaps
+(shift-mask exchanges), derived from a Benes network: at most 2*log2(n) - 1
+word operations instead of one operation per bit.
+"""
+
+import itertools
+
+from des_tables import IP, FP, E, P, PC1, PC2
+from derived_tables import build_chunk_table
+
+
+class BitMap:
+    """
+    A bit-selection map from in_bits input bits to len(table) output bits.
+
+    Args:
+        table (list): 1-indexed input positions, one per output bit
+        in_bits (int): Width of the input block (defaults to len(table))
+    """
+
+    def __init__(self, table, in_bits=None):
+        self.table = tuple(table)
+        self.in_bits = len(self.table) if in_bits is None else in_bits
+        if any(not 1 <= pos <= self.in_bits for pos in self.table):
+            raise ValueError(f"Table positions must lie in 1..{self.in_bits}")
+        self._chunks = None
+        self._program = None
+
+    @property
+    def out_bits(self):
+        return len(self.table)
+
+    @classmethod
+    def identity(cls, n):
+        """Return the identity permutation on n bits."""
+        return cls(range(1, n + 1))
+
+    @classmethod
+    def swap_halves(cls, n):
+        """Return the map that exchanges the two halves of an n-bit block."""
+        half = n // 2
+        return cls(list(range(half + 1, n + 1)) + list(range(1, half + 1)))
+
+    def is_permutation(self):
+        """True if the map is a bijection (every input bit used exactly once)."""
+        return self.in_bits == self.out_bits and len(set(self.table)) == self.in_bits
+
+    def is_expansion(self):
+        """True if some input bit is copied to more than one output."""
+        return len(set(self.table)) < self.out_bits
+
+    def is_compression(self):
+        """True if some input bit is dropped."""
+        return len(set(self.table)) < self.in_bits
+
+    def then(self, other):
+        """
+        Fuse this map with one applied after it.
+
+        Args:
+            other (BitMap): Map applied to this map's output
+
+        Returns:
+            BitMap: Single map equivalent to applying self, then other
+        """
+        if other.in_bits != self.out_bits:
+            raise ValueError(f"Cannot feed {self.out_bits} bits into a "
+                             f"{other.in_bits}-bit map")
+        return BitMap([self.table[pos - 1] for pos in other.table], self.in_bits)
+
+    def compose(self, other):
+        """Return self ∘ other, i.e. apply other first and then self."""
+        return other.then(self)
+
+    def inverse(self):
+        """
+        Return the inverse of a pure permutation.
+
+        Raises:
+            ValueError: If the map is not a permutation
+        """
+        if not self.is_permutation():
+            raise ValueError("Only pure permutations can be inverted")
+        inverse = [0] * self.in_bits
+        for out_pos, in_pos in enumerate(self.table, start=1):
+            inverse[in_pos - 1] = out_pos
+        return BitMap(inverse)
+
+    def apply_bits(self, block):
+        """Apply the map to a binary string (same as des_2round.permute())."""
+        return ''.join(block[pos - 1] for pos in self.table)
+
+    def apply_int(self, value):
+        """
+        Apply the map to an int block (bit 1 is the most significant bit).
+
+        Pure permutations use the compiled delta-swap program; other maps use
+        byte-chunk lookup tables.
+        """
+        if self.is_permutation():
+            return self.compile().apply(value)
+        if self._chunks is None:
+            self._chunks = build_chunk_table(self.table, (self.in_bits + 7) // 8 * 8)
+        out = 0
+        shift = len(self._chunks) * 8 - 8
+        value <<= len(self._chunks) * 8 - self.in_bits
+        for row in self._chunks:
+            out |= row[(value >> shift) & 0xFF]
+            shift -= 8
+        return out
+
+    def compile(self):
+        """
+        Compile a pure permutation into a delta-swap program (cached).
+
+        Returns:
+            DeltaSwapProgram: Equivalent sequence of shift-mask swaps
+        """
+        if self._program is None:
+            if not self.is_permutation():
+                raise ValueError("Only pure permutations compile to delta swaps")
+            n = self.in_bits
+            # Work with LSB-first indices: output bit o takes input bit src[o]
+            src = [0] * n
+            for j, pos in enumerate(self.table):
+                src[n - 1 - j] = n - pos
+            self._program = DeltaSwapProgram(benes_stages(src), n)
+        return self._program
+
+    def __eq__(self, other):
+        return (isinstance(other, BitMap) and self.table == other.table
+                and self.in_bits == other.in_bits)
+
+    def __hash__(self):
+        return hash((self.table, self.in_bits))
+
+    def __repr__(self):
+        kind = ('permutation' if self.is_permutation() else
+                'expansion' if self.is_expansion() else 'compression')
+        return f"BitMap({self.in_bits} -> {self.out_bits} bits, {kind})"
+
+
+class DeltaSwapProgram:
+    """
+    A sequence of delta swaps (shift, mask) on ints.
+
+    Each step exchanges bit i with bit i + shift for every set bit i of mask:
+
+        t = ((x >> shift) ^ x) & mask
+        x = x ^ t ^ (t << shift)
+    """
+
+    def __init__(self, steps, width):
+        self.steps = tuple(steps)
+        self.width = width
+
+    def apply(self, value):
+        """Run the program on an int and return the permuted int."""
+        for shift, mask in self.steps:
+            t = ((value >> shift) ^ value) & mask
+            value ^= t ^ (t << shift)
+        return value
+
+    def to_source(self, name='permute', var='x'):
+        """
+        Emit straight-line Python source for the program.
+
+        Args:
+            name (str): Function name
+            var (str): Variable name
+
+        Returns:
+            str: Source of a one-argument function
+        """
+        lines = [f"def {name}({var}):"]
+        for shift, mask in self.steps:
+            lines.append(f"    t = (({var} >> {shift}) ^ {var}) & 0x{mask:X}")
+            lines.append(f"    {var} ^= t ^ (t << {shift})")
+        lines.append(f"    return {var}")
+        return '\n'.join(lines) + '\n'
+
+    def __len__(self):
+        return len(self.steps)
+
+    def __repr__(self):
+        return f"DeltaSwapProgram({len(self.steps)} swaps on {self.width} bits)"
+
+
+def benes_stages(src):
+    """
+    Route a permutation through a Benes network and return its delta swaps.
+
+    Every ordering of the swap distances gives a valid Benes network; all of
+    them are routed and the one with the fewest non-empty stages is kept.
+
+    Args:
+        src (list): src[o] is the input index feeding output index o
+            (LSB-first indices)
+
+    Returns:
+        list: (shift, mask) pairs with empty stages removed and adjacent
+            non-overlapping stages of equal shift merged
+    """
+    n = 1
+    while n < len(src):
+        n <<= 1
+    # Pad to a power of two with fixed points
+    src = list(src) + list(range(len(src), n))
+    if n == 1:
+        return []
+
+    levels = n.bit_length() - 1
+    best = None
+    for order in itertools.permutations(range(levels)):
+        steps = _simplify(_route_with_order(src, order))
+        if best is None or len(steps) < len(best):
+            best = steps
+    return best
+
+
+def _relabel(index, order):
+    """Move bit order[t] of index to bit (len(order) - 1 - t)."""
+    levels = len(order)
+    out = 0
+    for t, bit in enumerate(order):
+        out |= ((index >> bit) & 1) << (levels - 1 - t)
+    return out
+
+
+def _route_with_order(src, order):
+    """Route with swap distances 2**order[0], 2**order[1], ... (and back)."""
+    n = len(src)
+    forward = [_relabel(i, order) for i in range(n)]
+    backward = [0] * n
+    for i, j in enumerate(forward):
+        backward[j] = i
+
+    relabelled = [0] * n
+    for out_pos, in_pos in enumerate(src):
+        relabelled[forward[out_pos]] = forward[in_pos]
+
+    stages = []
+    for shift, mask in _route(relabelled):
+        level = shift.bit_length() - 1
+        orig_mask = 0
+        j = mask
+        while j:
+            low = j & -j
+            orig_mask |= 1 << backward[low.bit_length() - 1]
+            j ^= low
+        stages.append((1 << order[len(order) - 1 - level], orig_mask))
+    return stages
+
+
+def _simplify(stages):
+    """Drop empty stages and merge adjacent disjoint stages of equal shift."""
+    steps = []
+    for shift, mask in stages:
+        if not mask:
+            continue
+        if steps and steps[-1][0] == shift:
+            prev = steps[-1][1]
+            if not (prev | (prev << shift)) & (mask | (mask << shift)):
+                steps[-1] = (shift, prev | mask)
+                continue
+        steps.append((shift, mask))
+    return steps
+
+
+def _route(src):
+    """Recursive Benes routing (looping algorithm) for a power-of-two size."""
+    n = len(src)
+    if n == 2:
+        return [(1, 1 if src[0] == 1 else 0)]
+
+    half = n // 2
+    dst = [0] * n
+    for out_pos, in_pos in enumerate(src):
+        dst[in_pos] = out_pos
+
+    # Assign every input element to the lower (0) or upper (1) subnetwork so
+    # that each input pair and each output pair is split across both
+    subnet = [None] * n
+    for start in range(n):
+        if subnet[start] is not None:
+            continue
+        i = start
+        while subnet[i] is None:
+            subnet[i] = 0
+            partner = i ^ half
+            subnet[partner] = 1
+            i = src[dst[partner] ^ half]
+
+    first_mask = 0
+    last_mask = 0
+    for i in range(half):
+        if subnet[i] == 1:
+            first_mask |= 1 << i
+        if subnet[src[i]] == 1:
+            last_mask |= 1 << i
+
+    lower = [0] * half
+    upper = [0] * half
+    for k in range(half):
+        a, b = src[k], src[k + half]
+        from_lower, from_upper = (a, b) if subnet[a] == 0 else (b, a)
+        lower[k] = from_lower % half
+        upper[k] = from_upper % half
+
+    inner = [(shift, low | (high << half))
+             for (shift, low), (_, high) in zip(_route(lower), _route(upper))]
+    return [(half, first_mask)] + inner + [(half, last_mask)]
+
+
+def fuse(*maps):
+    """
+    Fuse a chain of maps applied left to right into a single map.
+
+    Args:
+        *maps (BitMap): Maps in application order
+
+    Returns:
+        BitMap: Equivalent single map
+    """
+    result = maps[0]
+    for bit_map in maps[1:]:
+        result = result.then(bit_map)
+    return result
+
+
+# Standard DES maps
+IP_MAP = BitMap(IP)
+FP_MAP = BitMap(FP)
+E_MAP = BitMap(E, 32)
+P_MAP = BitMap(P)
+PC1_MAP = BitMap(PC1, 64)
+PC2_MAP = BitMap(PC2, 56)
+
+# The R||L swap and FP at the end of des_encrypt_2rounds as one permutation
+SWAP_FP_MAP = BitMap.swap_halves(64).then(FP_MAP)
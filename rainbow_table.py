@@ -0,0 +1,481 @@
+"""
+Rainbow Tables for Restricted Key-Space N-Round DES
+Time-memory trade-off for chosen-plaintext key recovery when only some key
+bits are unknown (the keys that agree with a base key outside a mask, as in
+des_key_search.py).
+
+The k unknown bits number the keys 0..2^k - 1. For a fixed chosen
+plaintext P, a chain step encrypts P under key x and reduces the ciphertext
+back to a key index with a column-dependent reduction (multiply-shift hash
+of C ^ tweak), so chains that collide in different columns do not merge:
+
+    x_0 -> R_0(E_x0(P)) = x_1 -> ... -> R_{t-1}(E_x(t-1)(P)) = x_t
+
+- Chains are built in parallel: the start points are cut into chunks that
+  run on a process pool, each computing its chains column by column for the
+  whole chunk with des_batch (one key schedule per block), and writing its
+  (end, start) records straight into the memory-mapped table file.
+- The file is then sorted by endpoint in place and chains with a repeated
+  endpoint (merges) are dropped. Records are fixed width: two little-endian
+  uint32 (k <= 32) or uint64 fields, end then start. A JSON header next to
+  the file (<path>.json) describes the key space and the table.
+- Lookups map the file read-only and binary-search the endpoints, or use an
+  optional in-memory index of where each endpoint prefix starts (index_bits
+  per run), which trades memory for fewer reads of the mapped file.
+- Memory versus online time is chosen per run with the chain length t, the
+  number of chains m and the number of tables: stored records grow with m,
+  online work with t^2 / 2 encryptions per table.
+
+Usage:
+
+    python rainbow_table.py --demo-bits 24 --log-chains 16 --chain-length 512 \\
+        --tables 2 --index-bits 14 --prefix des2
+
+    python rainbow_table.py --base-key 201EE25FD6FDFF --mask FFFFFF \\
+        --plaintext 0000000000000000 --ciphertext 1D4C3F4C6E8D2B1A
+
+Requires NumPy.
+"""
+
+import argparse
+import json
+import os
+import random
+import time
+from multiprocessing import Pool
+
+import numpy as np
+
+import des_2round
+import des_batch
+import des_engine
+from des_key_search import MASK_56, deposit, mask_bits
+
+
+FORMAT_VERSION = 1
+
+# Odd 64-bit constant of the multiply-shift reduction
+HASH_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+
+
+def header_path(path):
+    """Return the path of the JSON header of a table."""
+    return path + '.json'
+
+
+def record_dtype(unknown_bits):
+    """Return the fixed-width (end, start) record type for a key space."""
+    width = '<u4' if unknown_bits <= 32 else '<u8'
+    return np.dtype([('end', width), ('start', width)])
+
+
+class KeySpace:
+    """
+    The keys that match base_key outside mask, numbered by their unknown bits.
+
+    Args:
+        base_key (int): 56-bit key; bits inside mask are ignored
+        mask (int): 56-bit mask of unknown key bits
+        plaintext (int): Chosen 64-bit plaintext
+        rounds (int): Number of rounds
+    """
+
+    def __init__(self, base_key, mask, plaintext, rounds=2):
+        self.mask = mask & MASK_56
+        self.bits = mask_bits(self.mask)
+        if not self.bits:
+            raise ValueError("The mask has no unknown key bits")
+        self.base_key = base_key & ~self.mask & MASK_56
+        self.plaintext = plaintext
+        self.rounds = rounds
+        self.size_bits = len(self.bits)
+        self.size = 1 << self.size_bits
+        # Chunk table scattering each byte of an index into its key bits
+        self._in_bits = 8 * -(-self.size_bits // 8)
+        self._deposit = np.array([[deposit(v << (self._in_bits - 8 - 8 * chunk), self.bits)
+                                   for v in range(256)]
+                                  for chunk in range(self._in_bits // 8)], dtype=np.uint64)
+
+    def describe(self):
+        """Return the key space fields stored in table headers."""
+        return {
+            'base_key': f"{self.base_key:014X}",
+            'mask': f"{self.mask:014X}",
+            'plaintext': f"{self.plaintext:016X}",
+            'rounds': self.rounds,
+        }
+
+    def keys(self, indices):
+        """Return the 56-bit keys (uint64) of an array of key indices."""
+        return np.uint64(self.base_key) | des_batch.apply_chunk_table(
+            indices, self._deposit, self._in_bits)
+
+    def encrypt(self, indices):
+        """Encrypt the chosen plaintext under each key index."""
+        indices = np.asarray(indices, dtype=np.uint64)
+        blocks = np.full(indices.shape, self.plaintext, dtype=np.uint64)
+        return des_batch.des_encrypt_array(
+            blocks, des_batch.generate_round_keys(self.keys(indices), self.rounds))
+
+    def reduce(self, ciphertexts, column, table=0):
+        """Map ciphertexts to key indices with the reduction of one column."""
+        tweak = np.uint64((table << 32) | column)
+        return ((np.asarray(ciphertexts, dtype=np.uint64) ^ tweak) * HASH_MULTIPLIER
+                ) >> np.uint64(64 - self.size_bits)
+
+    def step(self, indices, column, table=0):
+        """Advance chain positions by one column."""
+        return self.reduce(self.encrypt(indices), column, table)
+
+
+def expected_coverage(space_size, stored, chain_length):
+    """
+    Estimated probability that a random key is in at least one table.
+
+    Chains whose endpoints are unique cannot have merged, so each of the
+    t columns of a table holds as many distinct keys as the table stores
+    chains, and P = 1 - prod_j (1 - m_j / N)^t over the tables.
+
+    Args:
+        space_size (int): Number of keys N
+        stored (iterable): Chains stored per table m_j (after merges are dropped)
+        chain_length (int): Chain length t
+
+    Returns:
+        float: Estimated success probability
+    """
+    missed = 1.0
+    for count in stored:
+        missed *= (1 - count / space_size) ** chain_length
+    return 1 - missed
+
+
+def write_header(path, header):
+    """Atomically write the JSON header of a table."""
+    tmp_path = header_path(path) + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(header, f, indent=2)
+    os.replace(tmp_path, header_path(path))
+
+
+def read_header(path):
+    """Read the JSON header of a table."""
+    with open(header_path(path)) as f:
+        return json.load(f)
+
+
+def _chain_job(args):
+    """
+    Compute one chunk of chains and write it into the mapped table file (runs in a worker).
+
+    Args:
+        args (tuple): (path, space, table, chain_length, count, first, size)
+
+    Returns:
+        int: Chains written
+    """
+    path, space, table, chain_length, count, first, size = args
+    starts = np.arange(first, first + size, dtype=np.uint64)
+    x = starts
+    for column in range(chain_length):
+        x = space.step(x, column, table)
+
+    data = np.memmap(path, dtype=record_dtype(space.size_bits), mode='r+', shape=(count,))
+    data['end'][first:first + size] = x
+    data['start'][first:first + size] = starts
+    data.flush()
+    del data
+    return size
+
+
+def build_table(path, space, chain_length, chains, table=0, workers=None, chunk_size=1 << 14):
+    """
+    Build one rainbow table file.
+
+    Args:
+        path (str): Table file path (the header goes to path + '.json')
+        space (KeySpace): Key space and chosen plaintext
+        chain_length (int): Chain length t
+        chains (int): Chains to generate m (at most the key space size)
+        table (int): Table number, selecting its reduction functions
+        workers (int): Worker processes (defaults to the CPU count)
+        chunk_size (int): Chains per job
+
+    Returns:
+        dict: The table header, with 'build_seconds'
+    """
+    if chains > space.size:
+        raise ValueError(f"At most {space.size} chains fit a {space.size_bits}-bit key space")
+    dtype = record_dtype(space.size_bits)
+    start = time.perf_counter()
+
+    data = np.memmap(path, dtype=dtype, mode='w+', shape=(chains,))
+    data.flush()
+    del data
+    jobs = [(path, space, table, chain_length, chains, first, min(chunk_size, chains - first))
+            for first in range(0, chains, chunk_size)]
+    with Pool(workers) as pool:
+        for _ in pool.imap_unordered(_chain_job, jobs):
+            pass
+
+    # Sort by endpoint in place and keep one chain per endpoint
+    data = np.memmap(path, dtype=dtype, mode='r+', shape=(chains,))
+    data.sort(order='end')
+    ends = data['end']
+    keep = np.ones(chains, dtype=bool)
+    keep[1:] = ends[1:] != ends[:-1]
+    unique = int(keep.sum())
+    data[:unique] = data[keep]
+    data.flush()
+    del data
+    os.truncate(path, unique * dtype.itemsize)
+
+    header = {
+        'format_version': FORMAT_VERSION,
+        **space.describe(),
+        'table': table,
+        'chain_length': chain_length,
+        'chains_built': chains,
+        'count': unique,
+        'record': f"end, start ({dtype['end'].str})",
+        'build_seconds': time.perf_counter() - start,
+    }
+    write_header(path, header)
+    return header
+
+
+class RainbowTable:
+    """
+    A table file mapped read-only for lookups.
+
+    Args:
+        path (str): Table file path
+        space (KeySpace): Key space the table must have been built for
+        index_bits (int): Size of the in-memory endpoint prefix index
+            (0 for plain binary search of the mapped file)
+    """
+
+    def __init__(self, path, space, index_bits=0):
+        header = read_header(path)
+        if header['format_version'] != FORMAT_VERSION:
+            raise ValueError(f"{path} has format version {header['format_version']}")
+        if any(header[k] != v for k, v in space.describe().items()):
+            raise ValueError(f"{path} was built for a different key space")
+        self.header = header
+        self.space = space
+        self.table = header['table']
+        self.chain_length = header['chain_length']
+        self.count = header['count']
+        data = np.memmap(path, dtype=record_dtype(space.size_bits), mode='r', shape=(self.count,))
+        self.ends = data['end']
+        self.starts = data['start']
+        self.index_bits = min(index_bits, space.size_bits)
+        self.index = None
+        if self.index_bits:
+            shift = space.size_bits - self.index_bits
+            prefixes = np.arange((1 << self.index_bits) + 1, dtype=np.uint64) << np.uint64(shift)
+            self.index = np.searchsorted(self.ends, prefixes)
+
+    def find(self, endpoints):
+        """
+        Find the chains ending at each endpoint.
+
+        Args:
+            endpoints (numpy.ndarray): uint64 endpoints
+
+        Returns:
+            tuple: (positions in endpoints that matched, start indices of their chains)
+        """
+        endpoints = np.asarray(endpoints, dtype=np.uint64)
+        if self.index is None:
+            slots = np.minimum(np.searchsorted(self.ends, endpoints), max(self.count - 1, 0))
+            found = np.flatnonzero(self.ends[slots] == endpoints) if self.count else slots[:0]
+            return found, self.starts[slots[found]].astype(np.uint64)
+
+        # Compare against every record of the endpoint's prefix bucket
+        bucket = (endpoints >> np.uint64(self.space.size_bits - self.index_bits)).astype(np.intp)
+        lo = self.index[bucket]
+        width = int((self.index[bucket + 1] - lo).max(initial=0))
+        slots = lo[:, None] + np.arange(width)
+        valid = slots < self.index[bucket + 1][:, None]
+        slots = np.where(valid, slots, 0)
+        hit = valid & (self.ends[slots.ravel()].reshape(slots.shape) == endpoints[:, None])
+        found, which = np.nonzero(hit)
+        return found, self.starts[slots[found, which]].astype(np.uint64)
+
+    def lookup(self, ciphertext):
+        """
+        Recover the keys of this table that encrypt the chosen plaintext to ciphertext.
+
+        Args:
+            ciphertext (int): Ciphertext of the chosen plaintext
+
+        Returns:
+            tuple: (list of key indices, false alarms, encryptions)
+        """
+        space, table, t = self.space, self.table, self.chain_length
+        # y_j: endpoint if the key sits in column j
+        c = np.full(t, ciphertext, dtype=np.uint64)
+        y = np.array([space.reduce(c[j:j + 1], j, table)[0] for j in range(t)], dtype=np.uint64)
+        encryptions = 0
+        for column in range(1, t):
+            y[:column] = space.step(y[:column], column, table)
+            encryptions += column
+
+        positions, starts = self.find(y)
+        # Walk each matching chain from its start to the candidate column
+        x = starts
+        for column in range(int(positions.max(initial=0))):
+            active = positions > column
+            x[active] = space.step(x[active], column, table)
+            encryptions += int(active.sum())
+        matches = space.encrypt(x) == np.uint64(ciphertext) if len(x) else np.zeros(0, dtype=bool)
+        encryptions += len(x)
+        keys = sorted({int(k) for k in x[matches]})
+        return keys, int((~matches).sum()), encryptions
+
+
+def table_paths(prefix, tables):
+    """Return the file paths of a set of tables."""
+    return [f"{prefix}.{i}.rt" for i in range(tables)]
+
+
+def recover_key(tables, ciphertext):
+    """
+    Look a ciphertext up in each table until a key is found.
+
+    Args:
+        tables (list): RainbowTable objects over the same key space
+        ciphertext (int): Ciphertext of the chosen plaintext
+
+    Returns:
+        dict: 'keys' (56-bit keys), 'false_alarms', 'encryptions', 'elapsed'
+    """
+    start = time.perf_counter()
+    false_alarms = encryptions = 0
+    keys = []
+    for table in tables:
+        found, alarms, work = table.lookup(ciphertext)
+        false_alarms += alarms
+        encryptions += work
+        if found:
+            keys = [int(k) for k in table.space.keys(np.array(found, dtype=np.uint64))]
+            break
+    return {
+        'keys': keys,
+        'false_alarms': false_alarms,
+        'encryptions': encryptions,
+        'elapsed': time.perf_counter() - start,
+    }
+
+
+def encrypt_reference(plaintext, key, rounds):
+    """Encrypt with des_2round for 2 rounds (des_engine otherwise)."""
+    if rounds == 2:
+        return des_engine.bits_to_int(des_2round.des_encrypt_2rounds(
+            des_engine.int_to_bits(plaintext, 64), des_engine.int_to_bits(key, 56)))
+    return des_engine.des_encrypt_block(plaintext, des_engine.generate_round_keys(key, rounds))
+
+
+def main():
+    """Build (or reuse) rainbow tables and recover keys from them."""
+    parser = argparse.ArgumentParser(description="Rainbow tables for restricted-key DES")
+    parser.add_argument('--base-key', help="56-bit base key in hex")
+    parser.add_argument('--mask', help="56-bit mask of unknown key bits in hex")
+    parser.add_argument('--plaintext', default='0000000000000000', help="Chosen plaintext in hex")
+    parser.add_argument('--ciphertext', action='append', default=[],
+                        help="Ciphertext of the chosen plaintext to look up (repeatable)")
+    parser.add_argument('--demo-bits', type=int,
+                        help="Use a random mask of this many bits and look up random keys")
+    parser.add_argument('--trials', type=int, default=20, help="Random keys to look up in the demo")
+    parser.add_argument('--rounds', type=int, default=2)
+    parser.add_argument('--chain-length', type=int, default=512)
+    parser.add_argument('--log-chains', type=int, default=16, help="2^N chains per table")
+    parser.add_argument('--tables', type=int, default=1)
+    parser.add_argument('--index-bits', type=int, default=0,
+                        help="In-memory endpoint index size (0 = binary search only)")
+    parser.add_argument('--prefix', default='rainbow', help="Table file prefix")
+    parser.add_argument('--rebuild', action='store_true', help="Rebuild existing table files")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    plaintext = int(args.plaintext, 16)
+    if args.demo_bits is not None:
+        mask = deposit((1 << args.demo_bits) - 1, rng.sample(range(56), args.demo_bits))
+        base_key = rng.getrandbits(56)
+    else:
+        if not (args.base_key and args.mask):
+            parser.error("--base-key and --mask are required without --demo-bits")
+        base_key, mask = int(args.base_key, 16), int(args.mask, 16)
+    space = KeySpace(base_key, mask, plaintext, args.rounds)
+    chains = 1 << args.log_chains
+
+    print("\n" + "="*80)
+    print(f"RAINBOW TABLES - {args.rounds}-ROUND DES, {space.size_bits} UNKNOWN BITS")
+    print("="*80)
+
+    tables = []
+    for i, path in enumerate(table_paths(args.prefix, args.tables)):
+        header = None
+        if not args.rebuild and os.path.exists(path) and os.path.exists(header_path(path)):
+            header = read_header(path)
+            if (any(header.get(k) != v for k, v in space.describe().items())
+                    or header['chain_length'] != args.chain_length
+                    or header['chains_built'] != chains):
+                header = None
+        if header is None:
+            header = build_table(path, space, args.chain_length, chains, i, args.workers)
+            status = f"built in {header['build_seconds']:.2f} s"
+        else:
+            status = "reused"
+        tables.append(RainbowTable(path, space, args.index_bits))
+        print(f"{path}: {header['count']} of {chains} chains after merges, "
+              f"{os.path.getsize(path)} bytes, {status}")
+
+    stored = sum(t.count for t in tables)
+    build = sum(t.header['build_seconds'] for t in tables)
+    print(f"\nKey space:           2^{space.size_bits} keys")
+    print(f"Chain length:        {args.chain_length}")
+    print(f"Stored chains:       {stored} ({stored * record_dtype(space.size_bits).itemsize} bytes)")
+    print(f"Build encryptions:   {args.tables * chains * args.chain_length} "
+          f"({args.tables * chains * args.chain_length / build:.0f}/s over {build:.2f} s)")
+    print(f"Est. coverage:       "
+          f"{expected_coverage(space.size, (t.count for t in tables), args.chain_length):.1%} "
+          f"(from the stored chains)")
+    print(f"Lookup index:        "
+          f"{f'{args.index_bits} bits' if args.index_bits else 'binary search'}")
+
+    if args.demo_bits is not None:
+        secrets = [base_key & ~mask | deposit(rng.getrandbits(space.size_bits), space.bits)
+                   for _ in range(args.trials)]
+        ciphertexts = [encrypt_reference(plaintext, k, args.rounds) for k in secrets]
+    else:
+        secrets = [None] * len(args.ciphertext)
+        ciphertexts = [int(c, 16) for c in args.ciphertext]
+
+    if ciphertexts:
+        print(f"\n{'Ciphertext':<18} {'Key found':<16} {'Alarms':<8} {'Encryptions':<12} {'Time':<10}")
+        print("-" * 80)
+    recovered = 0
+    elapsed = 0.0
+    for secret, ciphertext in zip(secrets, ciphertexts):
+        result = recover_key(tables, ciphertext)
+        elapsed += result['elapsed']
+        found = ' '.join(f"{k:014X}" for k in result['keys']) or '-'
+        if secret is not None:
+            recovered += secret in result['keys']
+            found += ' ✓' if secret in result['keys'] else ' ✗'
+        print(f"{ciphertext:016X}   {found:<16} {result['false_alarms']:<8} "
+              f"{result['encryptions']:<12} {result['elapsed'] * 1000:.1f} ms")
+    if ciphertexts:
+        print(f"\nMean lookup time:    {elapsed / len(ciphertexts) * 1000:.1f} ms")
+    if args.demo_bits is not None and ciphertexts:
+        print(f"Recovered:           {recovered}/{len(ciphertexts)} "
+              f"({recovered / len(ciphertexts):.0%})")
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,632 @@
+"""
+Streaming Randomness Tests
+A subset of the NIST SP 800-22 statistical tests (frequency, block
+frequency, runs, longest run of ones in a block, serial, approximate entropy
+and cumulative sums) for keystreams and ciphertext streams of N-round DES
+and AES.
+
+Every test keeps only running counts, so a stream is consumed one chunk at a
+time and never has to fit in memory:
+
+- Each chunk is unpacked to bits once, and every test updates from the same
+  bit array with whole-array NumPy operations.
+- Block tests carry the bits of an unfinished block over to the next chunk.
+- The serial and approximate entropy tests share one table of overlapping
+  m-bit pattern counts. The wrap-around patterns are counted from the first
+  and last m - 1 bits when p-values are requested, and the counts for
+  shorter patterns are folded from the longest ones.
+- The cumulative sums test tracks the running sum and its extremes.
+
+Streams are generated by the des_batch.py/aes_batch.py array engines: a
+counter-mode keystream, or the ECB encryption of low-density plaintexts
+(blocks of Hamming weight 0, 1, 2, ...) or of a file.
+
+Usage:
+
+    battery = RandomnessBattery()
+    for chunk in keystream('aes', 3, key, 1 << 24):
+        battery.update(chunk)
+    p_values = battery.p_values()
+
+    python randomness_tests.py --cipher des --rounds 1 2 3 4 16 --bits 1048576
+
+Requires NumPy.
+"""
+
+import argparse
+import itertools
+import math
+import random
+import time
+
+import numpy as np
+
+import aes_batch
+import aes_engine
+import des_batch
+import des_engine
+
+
+# Bytes per chunk of a generated stream
+CHUNK_BYTES = 1 << 20
+
+# Significance level of the pass marks
+ALPHA = 0.01
+
+# Per cipher: (block bytes, key bits)
+CIPHER_SIZES = {
+    'des': (8, 56),
+    'aes': (16, 128),
+}
+
+TEST_NAMES = ('frequency', 'block_frequency', 'runs', 'longest_run', 'serial_1', 'serial_2',
+              'approximate_entropy', 'cusum_forward', 'cusum_backward')
+
+# Longest run of ones, per block length: (class bounds, class probabilities,
+# minimum stream length). The first class is "at most bounds[0]" and the
+# last "at least bounds[-1]".
+LONGEST_RUN_CLASSES = {
+    8: ((1, 2, 3, 4), (0.2148, 0.3672, 0.2305, 0.1875), 128),
+    128: ((4, 5, 6, 7, 8, 9), (0.1174, 0.2430, 0.2493, 0.1752, 0.1027, 0.1124), 6272),
+    10000: ((10, 11, 12, 13, 14, 15, 16),
+            (0.0882, 0.2092, 0.2483, 0.1933, 0.1208, 0.0675, 0.0727), 750000),
+}
+
+# Convergence limits of the incomplete gamma function
+EPSILON = 1e-15
+TINY = 1e-300
+MAX_ITERATIONS = 1000000
+
+
+def igamc(a, x):
+    """
+    Regularized upper incomplete gamma function Q(a, x).
+
+    Uses the power series of P(a, x) below x = a + 1 and a continued
+    fraction (modified Lentz) above it.
+
+    Args:
+        a (float): Shape, > 0
+        x (float): Argument
+
+    Returns:
+        float: Q(a, x)
+    """
+    if x <= 0:
+        return 1.0
+    scale = math.exp(-x + a * math.log(x) - math.lgamma(a))
+    if x < a + 1:
+        term = total = 1.0 / a
+        denominator = a
+        for _ in range(MAX_ITERATIONS):
+            denominator += 1
+            term *= x / denominator
+            total += term
+            if term < total * EPSILON:
+                break
+        return max(0.0, 1.0 - total * scale)
+
+    b = x + 1 - a
+    c = 1 / TINY
+    d = 1 / b
+    h = d
+    for i in range(1, MAX_ITERATIONS):
+        an = -i * (i - a)
+        b += 2
+        d = an * d + b
+        if abs(d) < TINY:
+            d = TINY
+        c = b + an / c
+        if abs(c) < TINY:
+            c = TINY
+        d = 1 / d
+        delta = d * c
+        h *= delta
+        if abs(delta - 1) < EPSILON:
+            break
+    return scale * h
+
+
+def normal_cdf(x):
+    """Standard normal cumulative distribution function."""
+    return 0.5 * math.erfc(-x / math.sqrt(2))
+
+
+class FrequencyTest:
+    """Frequency (monobit) test: the proportion of ones in the whole stream."""
+
+    def __init__(self):
+        self.n = 0
+        self.ones = 0
+
+    def update(self, bits):
+        self.n += len(bits)
+        self.ones += int(np.count_nonzero(bits))
+
+    def p_values(self):
+        if not self.n:
+            return {'frequency': None}
+        s = abs(2 * self.ones - self.n) / math.sqrt(self.n)
+        return {'frequency': math.erfc(s / math.sqrt(2))}
+
+
+class BlockFrequencyTest:
+    """
+    Frequency test within non-overlapping blocks of m bits.
+
+    Args:
+        m (int): Block length in bits
+    """
+
+    def __init__(self, m=128):
+        self.m = m
+        self.blocks = 0
+        # Sum over blocks of (2 * ones - m)^2, kept integral
+        self.sum_squares = 0
+        self._carry = np.empty(0, dtype=np.uint8)
+
+    def update(self, bits):
+        bits = np.concatenate((self._carry, bits))
+        whole = len(bits) - len(bits) % self.m
+        self._carry = bits[whole:]
+        ones = bits[:whole].reshape(-1, self.m).sum(axis=1, dtype=np.int64)
+        self.blocks += len(ones)
+        self.sum_squares += int(((2 * ones - self.m) ** 2).sum())
+
+    def p_values(self):
+        if not self.blocks:
+            return {'block_frequency': None}
+        chi_squared = self.sum_squares / self.m
+        return {'block_frequency': igamc(self.blocks / 2, chi_squared / 2)}
+
+
+class RunsTest:
+    """Runs test: the number of runs of identical bits."""
+
+    def __init__(self):
+        self.n = 0
+        self.ones = 0
+        self.transitions = 0
+        self._last = None
+
+    def update(self, bits):
+        if not len(bits):
+            return
+        self.n += len(bits)
+        self.ones += int(np.count_nonzero(bits))
+        self.transitions += int(np.count_nonzero(bits[1:] != bits[:-1]))
+        if self._last is not None and bits[0] != self._last:
+            self.transitions += 1
+        self._last = bits[-1]
+
+    def p_values(self):
+        if not self.n:
+            return {'runs': None}
+        pi = self.ones / self.n
+        spread = pi * (1 - pi)
+        # Frequency prerequisite: the runs test is not applicable (p = 0). A
+        # constant stream shorter than 16 bits passes it but has no spread
+        if abs(pi - 0.5) >= 2 / math.sqrt(self.n) or spread == 0:
+            return {'runs': 0.0}
+        runs = self.transitions + 1
+        return {'runs': math.erfc(abs(runs - 2 * self.n * spread)
+                                  / (2 * math.sqrt(2 * self.n) * spread))}
+
+
+class LongestRunTest:
+    """
+    Longest run of ones within non-overlapping blocks.
+
+    The longest run of every block in a chunk is classified at once: after
+    step t, runs[:, i] is set where bits i .. i + t - 1 of the block are all
+    ones, so a block reaches class bound t if any entry is still set.
+
+    Args:
+        m (int): Block length, 8, 128 or 10000 bits
+    """
+
+    def __init__(self, m=10000):
+        if m not in LONGEST_RUN_CLASSES:
+            raise ValueError(f"Block length must be one of {sorted(LONGEST_RUN_CLASSES)}")
+        self.m = m
+        bounds, self.probabilities, self.min_bits = LONGEST_RUN_CLASSES[m]
+        self.low = bounds[0]
+        self.high = bounds[-1]
+        self.counts = np.zeros(len(bounds), dtype=np.int64)
+        self._carry = np.empty(0, dtype=np.uint8)
+
+    def update(self, bits):
+        bits = np.concatenate((self._carry, bits))
+        whole = len(bits) - len(bits) % self.m
+        self._carry = bits[whole:]
+        blocks = bits[:whole].reshape(-1, self.m).astype(bool)
+        classes = np.zeros(len(blocks), dtype=np.int64)
+        runs = blocks
+        for length in range(2, self.high + 1):
+            runs = runs[:, :-1] & blocks[:, length - 1:]
+            if length > self.low:
+                found = runs.any(axis=1)
+                if not found.any():
+                    break
+                classes += found
+        self.counts += np.bincount(classes, minlength=len(self.counts))
+
+    def p_values(self):
+        blocks = int(self.counts.sum())
+        if blocks * self.m < self.min_bits:
+            return {'longest_run': None}
+        expected = blocks * np.array(self.probabilities)
+        chi_squared = float((((self.counts - expected) ** 2) / expected).sum())
+        return {'longest_run': igamc((len(self.counts) - 1) / 2, chi_squared / 2)}
+
+
+class OverlappingPatterns:
+    """
+    Counts of overlapping m-bit patterns of a stream read as a circle.
+
+    Args:
+        m (int): Longest pattern length
+    """
+
+    def __init__(self, m):
+        self.m = m
+        self.n = 0
+        self._counts = np.zeros(1 << m, dtype=np.int64)
+        self._head = np.empty(0, dtype=np.uint8)
+        self._tail = np.empty(0, dtype=np.uint8)
+
+    def _count(self, bits):
+        """Count the m-bit patterns starting in bits[:len(bits) - m + 1]."""
+        width = len(bits) - self.m + 1
+        counts = np.zeros(1 << self.m, dtype=np.int64)
+        if width > 0:
+            values = np.zeros(width, dtype=np.uint32)
+            for j in range(self.m):
+                values <<= 1
+                values |= bits[j:j + width]
+            counts += np.bincount(values, minlength=1 << self.m)
+        return counts
+
+    def update(self, bits):
+        self.n += len(bits)
+        if len(self._head) < self.m - 1:
+            self._head = np.concatenate((self._head, bits[:self.m - 1 - len(self._head)]))
+        bits = np.concatenate((self._tail, bits))
+        self._counts += self._count(bits)
+        self._tail = bits[len(bits) - min(len(bits), self.m - 1):]
+
+    def counts(self, m):
+        """
+        Circular pattern counts.
+
+        Args:
+            m (int): Pattern length, at most the length given to the constructor
+
+        Returns:
+            numpy.ndarray: (2^m,) int64 counts indexed by pattern value (first bit most significant)
+        """
+        counts = self._counts + self._count(np.concatenate((self._tail, self._head)))
+        for _ in range(self.m - m):
+            counts = counts.reshape(-1, 2).sum(axis=1)
+        return counts
+
+
+def _psi_squared(patterns, m):
+    if m <= 0:
+        return 0.0
+    sum_squares = sum(c * c for c in patterns.counts(m).tolist())
+    return (1 << m) * sum_squares / patterns.n - patterns.n
+
+
+def serial_p_values(patterns, m):
+    """
+    Serial test: uniformity of the overlapping m-bit patterns.
+
+    Returns:
+        dict: 'serial_1' and 'serial_2' p-values
+    """
+    if patterns.n < m:
+        return {'serial_1': None, 'serial_2': None}
+    psi = [_psi_squared(patterns, m - i) for i in range(3)]
+    return {'serial_1': igamc(2 ** (m - 2), (psi[0] - psi[1]) / 2),
+            'serial_2': igamc(2 ** (m - 3), (psi[0] - 2 * psi[1] + psi[2]) / 2)}
+
+
+def _phi(patterns, m):
+    if m <= 0:
+        return 0.0
+    counts = patterns.counts(m)
+    frequencies = counts[counts > 0] / patterns.n
+    return float((frequencies * np.log(frequencies)).sum())
+
+
+def approximate_entropy_p_value(patterns, m):
+    """
+    Approximate entropy test: frequency of m-bit against (m + 1)-bit patterns.
+
+    Returns:
+        dict: 'approximate_entropy' p-value
+    """
+    if patterns.n <= m:
+        return {'approximate_entropy': None}
+    entropy = _phi(patterns, m) - _phi(patterns, m + 1)
+    chi_squared = 2 * patterns.n * (math.log(2) - entropy)
+    return {'approximate_entropy': igamc(2 ** (m - 1), chi_squared / 2)}
+
+
+def cusum_p_value(n, z):
+    """
+    P-value of a maximum partial sum excursion z of an n-step +/-1 walk.
+
+    Terms of the two sums beyond |x| > 10 standard deviations are below
+    double precision and are skipped, which bounds the work for small z.
+    """
+    root = math.sqrt(n)
+    limit = int((10 * root / z + 3) / 4) + 1
+    total = 1.0
+    for k in range(max(int((-n / z + 1) / 4), -limit), min(int((n / z - 1) / 4), limit) + 1):
+        total -= normal_cdf((4 * k + 1) * z / root) - normal_cdf((4 * k - 1) * z / root)
+    for k in range(max(int((-n / z - 3) / 4), -limit), min(int((n / z - 1) / 4), limit) + 1):
+        total += normal_cdf((4 * k + 3) * z / root) - normal_cdf((4 * k + 1) * z / root)
+    return total
+
+
+class CumulativeSumsTest:
+    """Cumulative sums test, forward and backward, of the +/-1 walk of the bits."""
+
+    def __init__(self):
+        self.n = 0
+        self.total = 0
+        # Extremes of the partial sums S_0 = 0, S_1, ..., S_n
+        self.high = 0
+        self.low = 0
+
+    def update(self, bits):
+        if not len(bits):
+            return
+        sums = np.cumsum(2 * bits.astype(np.int64) - 1) + self.total
+        self.high = max(self.high, int(sums.max()))
+        self.low = min(self.low, int(sums.min()))
+        self.total = int(sums[-1])
+        self.n += len(bits)
+
+    def p_values(self):
+        if not self.n:
+            return {'cusum_forward': None, 'cusum_backward': None}
+        forward = max(self.high, -self.low)
+        backward = max(self.total - self.low, self.high - self.total)
+        return {'cusum_forward': cusum_p_value(self.n, forward),
+                'cusum_backward': cusum_p_value(self.n, backward)}
+
+
+class RandomnessBattery:
+    """
+    All tests of the module, updated together from one stream.
+
+    The SP 800-22 recommendations for the parameters are n >= 100 * m for
+    block frequency, m < log2(n) - 2 for serial and m < log2(n) - 5 for
+    approximate entropy; the defaults suit streams of 10^6 bits and more.
+
+    Args:
+        block_frequency_m (int): Block length of the block frequency test
+        longest_run_m (int): Block length of the longest run test (8, 128 or 10000)
+        serial_m (int): Pattern length of the serial test
+        entropy_m (int): Pattern length of the approximate entropy test
+    """
+
+    def __init__(self, block_frequency_m=128, longest_run_m=10000, serial_m=16, entropy_m=10):
+        self.serial_m = serial_m
+        self.entropy_m = entropy_m
+        self.tests = [FrequencyTest(), BlockFrequencyTest(block_frequency_m), RunsTest(),
+                      LongestRunTest(longest_run_m), CumulativeSumsTest()]
+        self.patterns = OverlappingPatterns(max(serial_m, entropy_m + 1))
+
+    @property
+    def n(self):
+        """Number of bits consumed."""
+        return self.patterns.n
+
+    def update(self, data):
+        """Consume a chunk of bytes (bits most significant first)."""
+        self.update_bits(np.unpackbits(np.frombuffer(data, dtype=np.uint8)))
+
+    def update_bits(self, bits):
+        """Consume a uint8 array of 0/1 bits."""
+        bits = np.asarray(bits, dtype=np.uint8)
+        for test in self.tests:
+            test.update(bits)
+        self.patterns.update(bits)
+
+    def p_values(self):
+        """
+        Compute the p-values of the bits consumed so far.
+
+        Returns:
+            dict: p-value per name in TEST_NAMES, None where the stream is too short
+        """
+        results = {}
+        for test in self.tests:
+            results.update(test.p_values())
+        results.update(serial_p_values(self.patterns, self.serial_m))
+        results.update(approximate_entropy_p_value(self.patterns, self.entropy_m))
+        return {name: results[name] for name in TEST_NAMES}
+
+
+def block_encryptor(cipher, rounds, key):
+    """
+    Return a function that ECB-encrypts whole blocks of bytes with the array engines.
+
+    Args:
+        cipher (str): 'des' or 'aes'
+        rounds (int): Number of rounds
+        key (int): 56-bit DES or 128-bit AES key
+
+    Returns:
+        callable: bytes -> bytes, for a whole number of blocks
+    """
+    if cipher == 'des':
+        round_keys = des_engine.generate_round_keys(key, rounds)
+
+        def encrypt(data):
+            blocks = np.frombuffer(data, dtype='>u8').astype(np.uint64)
+            return des_batch.des_encrypt_array(blocks, round_keys).astype('>u8').tobytes()
+    elif cipher == 'aes':
+        key_bytes = aes_batch.round_key_bytes(aes_engine.expand_key(key, rounds))
+
+        def encrypt(data):
+            states = np.frombuffer(data, dtype=np.uint8).reshape(-1, 16)
+            return aes_batch.aes_encrypt_array(states, key_bytes).tobytes()
+    else:
+        raise ValueError(f"Unknown cipher {cipher!r}")
+    return encrypt
+
+
+def keystream(cipher, rounds, key, total_bytes, counter=0, chunk_bytes=CHUNK_BYTES):
+    """
+    Generate a counter-mode keystream E_K(counter), E_K(counter + 1), ...
+
+    Args:
+        cipher (str): 'des' or 'aes'
+        rounds (int): Number of rounds
+        key (int): 56-bit DES or 128-bit AES key
+        total_bytes (int): Stream length
+        counter (int): Initial counter block
+        chunk_bytes (int): Approximate bytes per chunk
+
+    Yields:
+        bytes: Keystream chunks
+    """
+    encrypt = block_encryptor(cipher, rounds, key)
+    block_bytes = CIPHER_SIZES[cipher][0]
+    per_chunk = max(chunk_bytes // block_bytes, 1)
+    high, low = counter >> 64, counter & ((1 << 64) - 1)
+    produced = 0
+    while produced < total_bytes:
+        count = min(per_chunk, -(-(total_bytes - produced) // block_bytes))
+        low_words = np.uint64(low) + np.arange(count, dtype=np.uint64)
+        if cipher == 'des':
+            blocks = low_words.astype('>u8').tobytes()
+        else:
+            words = np.empty((count, 2), dtype='>u8')
+            words[:, 0] = np.uint64(high & ((1 << 64) - 1)) + (low_words < np.uint64(low))
+            words[:, 1] = low_words
+            blocks = words.tobytes()
+        chunk = encrypt(blocks)[:total_bytes - produced]
+        produced += len(chunk)
+        low += count
+        high += low >> 64
+        low &= (1 << 64) - 1
+        yield chunk
+
+
+def encrypt_stream(cipher, rounds, key, chunks):
+    """
+    ECB-encrypt a stream of byte chunks; a final partial block is dropped.
+
+    Yields:
+        bytes: Ciphertext chunks
+    """
+    encrypt = block_encryptor(cipher, rounds, key)
+    block_bytes = CIPHER_SIZES[cipher][0]
+    carry = b''
+    for chunk in chunks:
+        data = carry + chunk
+        whole = len(data) - len(data) % block_bytes
+        carry = data[whole:]
+        if whole:
+            yield encrypt(data[:whole])
+
+
+def low_density_plaintexts(block_bytes, total_bytes, chunk_bytes=CHUNK_BYTES):
+    """
+    Generate plaintext blocks of increasing Hamming weight: the zero block,
+    every block with one bit set, every block with two bits set, ...
+
+    Yields:
+        bytes: Plaintext chunks
+    """
+    block_bits = 8 * block_bytes
+    out = bytearray()
+    remaining = total_bytes
+    for weight in range(block_bits + 1):
+        for positions in itertools.combinations(range(block_bits), weight):
+            out += sum(1 << p for p in positions).to_bytes(block_bytes, 'big')
+            if len(out) >= min(chunk_bytes, remaining):
+                chunk = bytes(out[:remaining])
+                remaining -= len(chunk)
+                out.clear()
+                yield chunk
+                if not remaining:
+                    return
+    if out:
+        yield bytes(out)
+
+
+def read_chunks(path, chunk_bytes=CHUNK_BYTES):
+    """Read a file one chunk at a time."""
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_bytes)
+            if not chunk:
+                return
+            yield chunk
+
+
+def main():
+    """Run the battery over DES or AES streams for several round counts."""
+    parser = argparse.ArgumentParser(description="Streaming NIST SP 800-22 test subset")
+    parser.add_argument('--cipher', choices=sorted(CIPHER_SIZES), default='des')
+    parser.add_argument('--rounds', type=int, nargs='+', default=None)
+    parser.add_argument('--bits', type=int, default=1 << 20, help="Stream length (multiple of 8)")
+    parser.add_argument('--source', choices=('keystream', 'low-density', 'file'), default='keystream')
+    parser.add_argument('--input', default=None, help="Plaintext file for --source file")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    if args.bits % 8:
+        parser.error("--bits must be a multiple of 8")
+    if args.source == 'file' and not args.input:
+        parser.error("--source file needs --input")
+    rounds_list = args.rounds or ([1, 2, 3, 4, 16] if args.cipher == 'des' else [1, 2, 3, 4, 10])
+    block_bytes, key_bits = CIPHER_SIZES[args.cipher]
+    key = random.Random(args.seed).getrandbits(key_bits)
+    total_bytes = args.bits // 8
+
+    print("\n" + "="*80)
+    print(f"RANDOMNESS TESTS - {args.cipher.upper()} {args.source.upper()}, {args.bits} BITS")
+    print("="*80)
+
+    results = {}
+    print(f"\n{'Rounds':<8} {'Bits':<12} {'Seconds':<10} {'Mbit/s':<10}")
+    print("-" * 80)
+    for rounds in rounds_list:
+        if args.source == 'keystream':
+            stream = keystream(args.cipher, rounds, key, total_bytes)
+        elif args.source == 'low-density':
+            stream = encrypt_stream(args.cipher, rounds, key,
+                                    low_density_plaintexts(block_bytes, total_bytes))
+        else:
+            stream = encrypt_stream(args.cipher, rounds, key, read_chunks(args.input))
+        battery = RandomnessBattery()
+        start = time.perf_counter()
+        for chunk in stream:
+            battery.update(chunk)
+        results[rounds] = battery.p_values()
+        elapsed = time.perf_counter() - start
+        print(f"{rounds:<8} {battery.n:<12} {elapsed:<10.2f} {battery.n / elapsed / 1e6:<10.2f}")
+
+    print(f"\n{'Test':<22}" + ''.join(f"{f'{r} rounds':<11}" for r in rounds_list))
+    print("-" * 80)
+    for name in TEST_NAMES:
+        row = f"{name:<22}"
+        for rounds in rounds_list:
+            p = results[rounds][name]
+            cell = 'n/a' if p is None else f"{p:.4f}{'' if p >= ALPHA else '*'}"
+            row += f"{cell:<11}"
+        print(row)
+    print(f"\n* p-value below {ALPHA}: the stream fails the test")
+    print()
+
+
+if __name__ == "__main__":
+    main()
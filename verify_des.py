@@ -8,6 +8,7 @@ from des_2round import (
     f_function, generate_round_keys, binary_to_hex
 )
 from des_tables import IP, FP, E, P, PC1, PC2, S_BOXES
+from permutations import IP_MAP, FP_MAP
 
 
 def test_permutation():
@@ -33,7 +34,17 @@ def test_permutation():
     print(f"Original:       {test_input}")
     print(f"FP(IP) = Input: {'✓ PASS' if result_fp == test_input else '✗ FAIL'}")
     
-    return result_ip == expected_ip and result_fp == test_input
+    # Check FP against IP structurally rather than by running data through both
+    fp_is_inverse = FP_MAP == IP_MAP.inverse()
+    print(f"FP = IP^-1:     {'✓ PASS' if fp_is_inverse else '✗ FAIL'}")
+    
+    # The compiled delta-swap form of IP must agree with the table lookup
+    program = IP_MAP.compile()
+    result_swaps = format(program.apply(int(test_input, 2)), '064b')
+    print(f"IP as {len(program)} delta swaps: {'✓ PASS' if result_swaps == expected_ip else '✗ FAIL'}")
+    
+    return (result_ip == expected_ip and result_fp == test_input
+            and fp_is_inverse and result_swaps == expected_ip)
 
 
 def test_expansion():